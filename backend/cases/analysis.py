@@ -0,0 +1,534 @@
+"""Case analysis pipeline: prompt building, Gemini call, normalization and persistence.
+
+Shared by the API views and the background analysis workers.
+"""
+import json
+import logging
+import time
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core import gemini
+from . import analysis_cache, analysis_schema, facets, search, similarity, singleflight, throttling
+from .local_analyzer import get_local_analyzer
+from .models import Case, CaseAnalysisResult
+
+logger = logging.getLogger(__name__)
+
+API_KEY_MISSING = 'Gemini API key not configured'
+GEMINI_MODEL = gemini.DEFAULT_MODEL
+# Bump whenever the prompt or normalization changes so cached results are not reused
+PROMPT_VERSION = '2026-10-18.2'
+
+# Accepted values for the analyze endpoints' ``state`` and ``language`` options
+INDIAN_STATES = frozenset({
+    'andhra pradesh','arunachal pradesh','assam','bihar','chhattisgarh','goa','gujarat','haryana','himachal pradesh','jharkhand','karnataka','kerala','madhya pradesh','maharashtra','manipur','meghalaya','mizoram','nagaland','odisha','punjab','rajasthan','sikkim','tamil nadu','telangana','tripura','uttar pradesh','uttarakhand','west bengal','andaman and nicobar islands','chandigarh','dadra and nagar haveli and daman and diu','delhi','jammu and kashmir','ladakh','lakshadweep','puducherry'
+})
+ANALYSIS_LANGUAGES = frozenset({'English','Hindi','Bengali','Tamil','Telugu','Marathi','Gujarati','Kannada','Malayalam','Punjabi'})
+
+# The prompt asks for a confidence per case category, the same keys the normalizer scores
+PROMPT_CATEGORIES = ', '.join(Case.Category.values)
+PROMPT_CATEGORY_SCHEMA = ',\n'.join(f'            "{category}": 0.0' for category in Case.Category.values)
+
+
+def _ignore(field):
+    pass
+
+
+def normalize_analysis(analysis_data, country, state, city, pincode, repairs=None):
+    """Coerce a model or fallback payload to ``analysis_schema.ANALYSIS_SCHEMA``.
+
+    Returns a new dict; payloads carrying ``raw`` (unparseable replies) are
+    returned as they are. Pass a list as ``repairs`` to receive the names of
+    the fields that had to be fixed up.
+    """
+    if analysis_data is None:
+        return {'raw': '', 'error': 'No analysis data'}
+    if not isinstance(analysis_data, dict) or 'raw' in analysis_data:
+        return analysis_data
+    return analysis_schema.normalize(
+        analysis_data, country, state, city, pincode, repairs.append if repairs is not None else _ignore,
+    )
+
+
+# Normalized analysis keys stored on CaseAnalysisResult, with their empty values
+RESULT_FIELDS = {
+    'country': '',
+    'state': '',
+    'city': '',
+    'pincode': '',
+    'language': '',
+    'keywords': [],
+    'sentiment': 0.0,
+    'category_confidence': {},
+    'summary': '',
+    'legal_sections': [],
+    'sanction_recommendations': [],
+    'filing_viability': {},
+    'filing_authorities': [],
+    'next_steps': [],
+    'evidence_priority': [],
+    'timeline_estimate': '',
+}
+META_FIELDS = ('model_name', 'prompt_version', 'latency_ms', 'prompt_tokens', 'output_tokens')
+
+
+def apply_analysis_to_case(case, analysis_data, meta=None):
+    """Append a CaseAnalysisResult for ``case`` and point the case at it.
+
+    Earlier runs are kept; only the case's ``latest_analysis``/``analyzed_at``
+    pointer columns are updated. Results without a ``model_name`` in ``meta``
+    came from the offline fallback and are stored as ``analysis_source='local'``.
+    """
+    if not isinstance(analysis_data, dict):
+        return None
+    values = {}
+    for name, empty in RESULT_FIELDS.items():
+        value = analysis_data.get(name, empty)
+        values[name] = str(value or '') if isinstance(empty, str) else (value if value is not None else empty)
+    values['timeline_estimate'] = values['timeline_estimate'][:200]
+    values.update({k: v for k, v in (meta or {}).items() if k in META_FIELDS and v is not None})
+    values['analysis_source'] = (
+        CaseAnalysisResult.Source.AI if values.get('model_name') else CaseAnalysisResult.Source.LOCAL
+    )
+    now = timezone.now()
+    with transaction.atomic():
+        # Writing the case row first locks it (and takes SQLite's write lock up
+        # front), so concurrent runs get distinct versions without deadlocking
+        Case.objects.filter(pk=case.pk).update(updated_at=now)
+        last = CaseAnalysisResult.objects.filter(case=case).aggregate(v=Max('version'))['v'] or 0
+        result = CaseAnalysisResult.objects.create(case=case, version=last + 1, created_at=now, **values)
+        Case.objects.filter(pk=case.pk).update(latest_analysis=result, analyzed_at=now, updated_at=now)
+        search.index_analysis(case, result)
+        facets.sync_case_terms(case, result)
+        similarity.record_case(case, result)
+        transaction.on_commit(facets.invalidate)
+    case.latest_analysis = result
+    case.analyzed_at = now
+    case.updated_at = now
+    return result
+
+
+def is_api_key_missing(analysis_data):
+    """True when generation was skipped because no Gemini key is configured."""
+    return (
+        isinstance(analysis_data, dict)
+        and 'raw' not in analysis_data
+        and analysis_data.get('error') == API_KEY_MISSING
+    )
+
+
+def save_analysis(case, analysis_data, meta=None):
+    """Persist a normalized analysis as a new result row for ``case``.
+
+    This is the only write: the legacy ``analysis`` payload is derived from
+    the same row by ``CaseSerializer``. ``meta`` is the dict filled in by
+    ``generate_analysis``.
+    """
+    return apply_analysis_to_case(case, analysis_data if isinstance(analysis_data, dict) else {}, meta)
+
+
+def save_local_analysis(case, country='', state='', city='', pincode='', language='English'):
+    """Store a ``LocalAnalyzer`` result for ``case`` straight away.
+
+    Called when a case is created so it has keywords and a summary before the
+    queued model run replaces them.
+    """
+    analysis_data = build_fallback(
+        case.title, case.description, country or 'India', state, city, pincode, language, 'pending_ai'
+    )
+    return save_analysis(case, analysis_data, {'model_name': '', 'prompt_version': PROMPT_VERSION})
+
+
+def build_case_text(title, description, country, state, city, pincode, accused_name=''):
+    case_text = f"""
+    Title: {title}
+    Description: {description}
+    Country/Jurisdiction: {country or 'Not specified'}
+    State/Region: {state or 'Not specified'}
+    City: {city or 'Not specified'}
+    PIN/Postal Code: {pincode or 'Not specified'}
+    """
+    if accused_name:
+        case_text += f"\nAccused: {accused_name}"
+    return case_text
+
+
+def build_prompt(case_text, files_context, country, state, city, pincode, language):
+    prompt = f"""
+    You are an expert legal advocate and case advisor specializing in Indian law (IPC, CrPC, IT Act, POCSO, SC/ST Act, DV Act, etc.). 
+COMPREHENSIVE CASE ANALYSIS REPORT - Provide detailed guidance on ALL these aspects:
+1 JUSTICE: Case validity, cognizable offense?, legal remedy, expected outcome, victim rights
+2 POLICE ACTION: Jurisdiction, FIR vs NCR, what to tell police, police obligations, if refused
+3 FIR FILING: Can file?, sections apply, where/how/when to file, sample draft
+4 PROTECTION: Safety steps, legal protection, court orders, emergency contacts
+5 LEGAL GUIDANCE: Applicable laws, procedure flow, rights, do/donts, lawyer timing
+6 COMPENSATION: Schemes CrPC 357A, application process, amount, timeline
+7 CASE STRENGTH: Current strength, evidence priority, missing evidence
+Analysis Requirements (All in {language or 'English'}):
+    1) Extract top 5-7 keywords relevant to the legal case
+    2) Provide sentiment score in [-1.0, 1.0] (severity assessment)
+    3) Category confidence for every one of: {PROMPT_CATEGORIES} (values in [0,1])
+    4) Write a clear 2-3 sentence summary as an advocate would present it
+    5) Legal sections (statutes/acts) applicable in the given country relevant to the facts
+      6) Sanction recommendations (section/code, description, confidence) based on the country’s legal framework
+      7) Filing viability assessment: whether evidence is sufficient to file a case now; list missing evidence if any; and recommended next actions
+      8) Filing authorities for the specified location (where to file). If country is India, include appropriate authority with helpline and official portal:
+          - Police Station (local jurisdiction)
+          - State Cyber Crime Cell and the national portal https://cybercrime.gov.in
+          - Emergency helpline 112; financial cyber fraud helpline 1930
+          For other countries, provide equivalent authorities and official portals. Do NOT fabricate specific addresses. If exact address is unknown, leave it blank and provide steps to find the nearest office.
+                9) Provide an ordered list of 5-10 next_steps (concise actionable directives) each in target language.
+                10) Provide evidence_priority list (each item with item, rationale, priority high|medium|low).
+                11) Provide a concise timeline_estimate string describing expected phases (investigation, filing, preliminary hearing) with rough durations.
+
+    Case Details:
+    {case_text}
+
+    Files Provided:
+    {files_context}
+
+    Strict JSON output only (no markdown, no comments). Use this schema:
+    {{
+        "country": "{country}",
+        "state": "{state}",
+        "city": "{city}",
+        "pincode": "{pincode}",
+        "language": "{language}",
+        "keywords": ["keyword1", "keyword2", "keyword3"],
+        "sentiment": 0.0,
+        "category_confidence": {{
+{PROMPT_CATEGORY_SCHEMA}
+        }},
+        "summary": "Clear incident summary as an advocate would present it",
+        "legal_sections": [
+            {{ "section": "Act/Code §number", "description": "what it covers and why it applies", "citation": "if applicable" }}
+        ],
+        "sanction_recommendations": [
+            {{ "code": "section or charge code", "name": "offence name", "description": "why this charge applies", "confidence": 0.0 }}
+        ],
+        "filing_viability": {{
+            "viable": false,
+            "rationale": "advocate's assessment of case strength",
+            "missing_evidence": ["specific document A", "witness statement B", "digital evidence C"],
+            "recommended_actions": ["File FIR at local police station within 24 hours", "Preserve all digital evidence immediately", "Get medical examination if applicable", "Notify bank/financial institution", "Document all losses with receipts"]
+        }},
+        "filing_authorities": [
+            {{
+                "authority_type": "Police Station | Cyber Crime Cell | Magistrate Court | Other",
+                "name": "official name if known",
+                "address": "leave blank if unknown",
+                "phone_numbers": ["112", "1930"],
+                "online_portal": "https://...",
+                "jurisdiction": "area covered",
+                "how_to_file": "steps to file",
+                "notes": "caveats"
+            }}
+        ],
+        "next_steps": ["Action step 1", "Action step 2"],
+        "evidence_priority": [{{"item": "Evidence item", "rationale": "Why important", "priority": "high"}}],
+        "timeline_estimate": "Investigation 2 weeks; filing 1 week; preliminary hearing 1-2 months"
+    }}
+    """
+    return prompt
+
+
+def parse_json_response(response_text):
+    """Parse the model's JSON reply, tolerating code fences and surrounding prose."""
+    response_text = (response_text or '').strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[len('```json'):]
+    if response_text.startswith('```'):
+        response_text = response_text[len('```'):]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    response_text = response_text.strip()
+
+    analysis_data = None
+    try:
+        analysis_data = json.loads(response_text)
+    except Exception:
+        try:
+            start = response_text.find('{')
+            end = response_text.rfind('}')
+            if start != -1 and end != -1 and end > start:
+                analysis_data = json.loads(response_text[start:end+1])
+        except Exception:
+            pass
+    return analysis_data
+
+
+def is_rate_limit_error(error):
+    # google.api_core raises ResourceExhausted (code 429); older SDKs only say so in the message
+    if getattr(error, 'code', None) == 429 or type(error).__name__ == 'ResourceExhausted':
+        return True
+    msg = str(error).lower() if error else ''
+    return '429' in msg or 'resource exhausted' in msg or 'rate limit' in msg or 'quota' in msg
+
+
+def _usage_counts(response):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return None, None
+    return getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None)
+
+
+def build_fallback(title, description, country, state, city, pincode, language, reason):
+    """Analysis from ``LocalAnalyzer`` for when the model cannot be used.
+
+    ``reason`` (``pending_ai``, ``circuit_open``, ``rate_limited``,
+    ``ai_error``, ``no_ai_module``) is kept in ``fallback_reason`` and the filing rationale.
+    """
+    local = get_local_analyzer().analyze(title, description)
+    analysis_data = {
+        'country': country,
+        'state': state,
+        'city': city,
+        'pincode': pincode,
+        'language': language,
+        'keywords': local['keywords'],
+        'sentiment': local['sentiment'],
+        'category_confidence': local['category_confidence'],
+        'summary': local['summary'] or 'No description provided.',
+        'legal_sections': [],
+        'sanction_recommendations': [],
+        'filing_viability': {
+            'viable': False,
+            'rationale': (
+                'Preliminary offline analysis; the full AI analysis is queued.' if reason == 'pending_ai'
+                else f'Fallback used ({reason}). Provide more evidence and retry once AI availability improves.'
+            ),
+            'missing_evidence': ['supporting documents', 'witness statements'],
+            'recommended_actions': ['compile documents', 'note chronology of events']
+        },
+        'filing_authorities': [],
+        'next_steps': ['Gather all available evidence', 'Prepare a chronological event log', 'Consult legal counsel for refinement'],
+        'evidence_priority': [
+            {'item': 'Primary digital evidence', 'rationale': 'Directly supports core allegation', 'priority': 'high'},
+            {'item': 'Witness statements', 'rationale': 'Corroborates incident timeline', 'priority': 'medium'}
+        ],
+        'timeline_estimate': 'Initial preparation 1-2 weeks; filing thereafter'
+    }
+    if (country or '').strip().lower() == 'india':
+        analysis_data['legal_sections'] = [
+            {'section': 'IT Act, 2000', 'description': 'General provisions related to cyber offences', 'citation': ''}
+        ]
+        analysis_data['filing_authorities'] = [
+            {
+                'authority_type': 'Cyber Crime Portal',
+                'name': 'National Cyber Crime Reporting Portal',
+                'address': '',
+                'phone_numbers': ['1930', '112'],
+                'online_portal': 'https://cybercrime.gov.in',
+                'jurisdiction': 'Pan-India',
+                'how_to_file': 'File a complaint on the portal; attach evidence.',
+                'notes': 'Fallback data shown while AI is unavailable.'
+            }
+        ]
+    # Include a hint about fallback reason without breaking existing UI
+    analysis_data['fallback_reason'] = reason
+    return normalize_analysis(analysis_data, country, state, city, pincode)
+
+
+def generate_analysis(title, accused_name, description, country, state, city, pincode, files_summary, language,
+                      enforce_india=True, meta=None, wait_for_slot=False):
+    """Return the normalized analysis dict for the given case inputs.
+
+    Pass a dict as ``meta`` to receive run details for CaseAnalysisResult:
+    ``model_name`` (empty for the fallback), ``prompt_version``, ``latency_ms``
+    and the ``prompt_tokens``/``output_tokens`` reported by the model.
+
+    Over the model rate limit the call answers with the ``rate_limited``
+    fallback at once, so a request thread never sleeps on the limiter. The
+    analysis workers pass ``wait_for_slot=True`` to wait up to
+    ``ANALYSIS_RATE_LIMIT_TIMEOUT`` for a slot instead.
+    """
+    if meta is None:
+        meta = {}
+    meta.update(model_name='', prompt_version=PROMPT_VERSION)
+    started = time.monotonic()
+
+    # Shared Gemini client (SDK imported lazily); fallback if missing
+    has_gemini = gemini.sdk_available()
+
+    # Identical inputs give an identical prompt: reuse the stored result
+    cache_key = analysis_cache.analysis_cache_key(
+        GEMINI_MODEL,
+        PROMPT_VERSION,
+        title=title,
+        description=description,
+        accused_name=accused_name,
+        state=state,
+        city=city,
+        pincode=pincode,
+        language=language,
+        files_summary=files_summary,
+    )
+    cached = analysis_cache.get_cached(cache_key)
+    if cached is not None:
+        meta.update(model_name=GEMINI_MODEL, latency_ms=int((time.monotonic() - started) * 1000))
+        return cached
+
+    def run():
+        run_meta = {'model_name': '', 'prompt_version': PROMPT_VERSION}
+        analysis_data = _run_analysis(
+            run_meta, cache_key, started, has_gemini, title, accused_name, description, country, state, city,
+            pincode, files_summary, language, enforce_india, wait_for_slot,
+        )
+        return analysis_data, run_meta
+
+    # Identical requests in flight at the same time (double clicks, duplicate
+    # uploads) share one run instead of each calling the model
+    analysis_data, run_meta = singleflight.do(
+        f"{cache_key}:{(country or '').strip().lower()}:{int(bool(enforce_india))}", run
+    )
+    meta.update(run_meta)
+    return analysis_data
+
+
+def _run_analysis(meta, cache_key, started, has_gemini, title, accused_name, description, country, state, city,
+                  pincode, files_summary, language, enforce_india, wait_for_slot):
+    """The uncached part of ``generate_analysis``; fills ``meta`` like it does."""
+    if not has_gemini:
+        return build_fallback(title, description, country, state, city, pincode, language, 'no_ai_module')
+
+    # Configured model for the current API key, reused across requests
+    model = gemini.get_model(GEMINI_MODEL)
+    if model is None:
+        return {'error': API_KEY_MISSING}
+
+    files_context = "\n".join(files_summary) if files_summary else "No files attached"
+
+    # Enforce India-only analysis if requested
+    if enforce_india and (country or '').strip().lower() != 'india':
+        return {'error': 'Only India jurisdiction supported for AI analysis currently.'}
+
+    case_text = build_case_text(title, description, country, state, city, pincode, accused_name)
+    prompt = build_prompt(case_text, files_context, country, state, city, pincode, language)
+
+    # While the provider is refusing calls, answer locally without waiting on the network
+    breaker = throttling.get_circuit_breaker()
+    if not breaker.allow():
+        return build_fallback(title, description, country, state, city, pincode, language, 'circuit_open')
+    if not throttling.acquire_model_slot(timeout=None if wait_for_slot else 0):
+        breaker.release()
+        return build_fallback(title, description, country, state, city, pincode, language, 'rate_limited')
+    try:
+        response = model.generate_content(prompt)
+        response_text = getattr(response, 'text', None) or str(response)
+        response_text = response_text.strip()
+        prompt_tokens, output_tokens = _usage_counts(response)
+        meta.update(
+            model_name=GEMINI_MODEL,
+            latency_ms=int((time.monotonic() - started) * 1000),
+            prompt_tokens=prompt_tokens,
+            output_tokens=output_tokens,
+        )
+    except Exception as e:
+        rate_limited = is_rate_limit_error(e)
+        breaker.record_failure(e, retry_after=throttling.retry_delay(e), trip=rate_limited)
+        if rate_limited:
+            return build_fallback(title, description, country, state, city, pincode, language, 'rate_limited')
+        # Network or API errors: graceful fallback as well
+        return build_fallback(title, description, country, state, city, pincode, language, 'ai_error')
+    breaker.record_success()
+    analysis_data = parse_json_response(response_text)
+    if analysis_data is None:
+        analysis_data = {'raw': response_text, 'error': 'Response was not structured JSON'}
+    repairs = []
+    analysis_data = normalize_analysis(analysis_data, country, state, city, pincode, repairs)
+    if repairs:
+        logger.info('Repaired fields in %s reply: %s', GEMINI_MODEL, ', '.join(repairs))
+    if isinstance(analysis_data, dict) and 'raw' not in analysis_data and 'error' not in analysis_data:
+        analysis_cache.store(cache_key, analysis_data)
+    return analysis_data
+
+
+def generate_packed_analysis(items, country, state, city, pincode, language, meta=None):
+    """Analyze several short cases with one model request.
+
+    ``items`` is a list of dicts with ``key``, ``title``, ``description`` and
+    ``files_summary``. Returns ``{key: normalized analysis}`` for every case
+    answered from the cache or the packed reply; cases missing from the result
+    should be analyzed on their own with ``generate_analysis``. ``meta`` gets
+    the shared run details with token counts split evenly across the pack.
+    """
+    if meta is None:
+        meta = {}
+    meta.update(model_name=GEMINI_MODEL, prompt_version=PROMPT_VERSION)
+    started = time.monotonic()
+    results = {}
+    pending = []
+    for item in items:
+        cache_key = analysis_cache.analysis_cache_key(
+            GEMINI_MODEL,
+            PROMPT_VERSION,
+            title=item['title'],
+            description=item['description'],
+            accused_name='',
+            state=state,
+            city=city,
+            pincode=pincode,
+            language=language,
+            files_summary=item.get('files_summary'),
+        )
+        cached = analysis_cache.get_cached(cache_key)
+        if cached is not None:
+            results[item['key']] = cached
+        else:
+            pending.append((item, cache_key))
+    if not pending or not gemini.sdk_available():
+        return results
+    model = gemini.get_model(GEMINI_MODEL)
+    breaker = throttling.get_circuit_breaker()
+    if model is None or not breaker.allow():
+        return results
+    if not throttling.acquire_model_slot():
+        breaker.release()
+        return results
+
+    sections = []
+    for item, _ in pending:
+        files = '; '.join(item.get('files_summary') or []) or 'No files attached'
+        sections.append(
+            f"=== CASE {item['key']} ===\n"
+            + build_case_text(item['title'], item['description'], country, state, city, pincode)
+            + f"\n    Files: {files}"
+        )
+    prompt = build_prompt('\n'.join(sections), 'Listed under each case', country, state, city, pincode, language)
+    prompt += f"""
+    Batch mode: the Case Details above contain {len(pending)} independent cases, each introduced by a
+    line "=== CASE <key> ===". Analyze every case on its own and return ONE JSON object whose keys are
+    those case keys (as strings) and whose values each follow the schema above.
+    """
+    try:
+        response = model.generate_content(prompt)
+        response_text = (getattr(response, 'text', None) or str(response)).strip()
+    except Exception as e:
+        breaker.record_failure(e, retry_after=throttling.retry_delay(e), trip=is_rate_limit_error(e))
+        return results
+    breaker.record_success()
+    prompt_tokens, output_tokens = _usage_counts(response)
+    meta.update(
+        latency_ms=int((time.monotonic() - started) * 1000),
+        prompt_tokens=prompt_tokens // len(pending) if prompt_tokens is not None else None,
+        output_tokens=output_tokens // len(pending) if output_tokens is not None else None,
+    )
+
+    packed = parse_json_response(response_text)
+    if not isinstance(packed, dict):
+        return results
+    for item, cache_key in pending:
+        analysis_data = packed.get(str(item['key']))
+        if not isinstance(analysis_data, dict):
+            continue
+        repairs = []
+        analysis_data = normalize_analysis(analysis_data, country, state, city, pincode, repairs)
+        if repairs:
+            logger.info('Repaired fields in %s packed reply for %s: %s', GEMINI_MODEL, item['key'], ', '.join(repairs))
+        if 'raw' not in analysis_data and 'error' not in analysis_data:
+            analysis_cache.store(cache_key, analysis_data)
+            results[item['key']] = analysis_data
+    return results
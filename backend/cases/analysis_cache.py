@@ -0,0 +1,274 @@
+"""Content-addressed cache for normalized analysis results.
+
+Results are keyed on a hash of the normalized prompt inputs plus the model
+name and prompt version, so re-analyzing the same text (repeat clicks on
+``analyze``, duplicate ``analyze_upload`` submissions) skips the model call.
+
+The backend is chosen with ``settings.ANALYSIS_CACHE['BACKEND']``:
+
+* ``django`` - a Django cache alias (``LOCATION``, default ``default``)
+* ``file``   - JSON files in the ``LOCATION`` directory
+* ``db``     - the ``AnalysisCacheEntry`` table
+
+All backends honour ``TTL`` (seconds) and ``MAX_ENTRIES``; the file and DB
+backends evict least-recently-used entries themselves, the Django backend
+relies on the cache's own culling. The Django alias is usually shared with
+other state (circuit breaker, rate limits, facets), so its entries carry a
+version token and ``clear`` replaces the token instead of flushing the alias.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+KEY_FIELDS = ('title', 'description', 'accused_name', 'state', 'city', 'pincode', 'language', 'files_summary')
+
+
+def _clean(value):
+    return ' '.join(str(value or '').split())
+
+
+def analysis_cache_key(model_name, prompt_version, **inputs):
+    """Hash the normalized prompt inputs into a stable cache key."""
+    normalized = {name: _clean(inputs.get(name)) for name in KEY_FIELDS if name != 'files_summary'}
+    for name in ('state', 'city', 'pincode', 'language'):
+        normalized[name] = normalized[name].lower()
+    normalized['files_summary'] = sorted(_clean(f) for f in (inputs.get('files_summary') or []))
+    normalized['model'] = model_name
+    normalized['prompt_version'] = prompt_version
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for the running process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.stores = 0
+            self.errors = 0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'errors': self.errors,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class DjangoCacheBackend:
+    VERSION_KEY = 'analysis:version'
+
+    def __init__(self, ttl, max_entries, location=None):
+        self.ttl = ttl
+        self.alias = location or 'default'
+
+    def _key(self, cache, key):
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            cache.add(self.VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(self.VERSION_KEY)
+        return f"analysis:{version}:{key}"
+
+    def get(self, key):
+        cache = caches[self.alias]
+        return cache.get(self._key(cache, key))
+
+    def set(self, key, value):
+        cache = caches[self.alias]
+        cache.set(self._key(cache, key), value, self.ttl)
+
+    def clear(self):
+        """Orphan every analysis entry; they expire after ``ttl``. Other keys in the alias are untouched."""
+        caches[self.alias].set(self.VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class FileCacheBackend:
+    """One JSON file per key; file mtime doubles as the LRU timestamp."""
+
+    def __init__(self, ttl, max_entries, location=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.location = str(location or os.path.join(settings.BASE_DIR, 'analysis_cache'))
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.location, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get('created', 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get('value')
+
+    def set(self, key, value):
+        os.makedirs(self.location, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'created': time.time(), 'value': value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.location) if e.name.endswith('.json')]
+            except OSError:
+                return
+            overflow = len(entries) - self.max_entries
+            if overflow <= 0:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[:overflow]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        for entry in os.scandir(self.location) if os.path.isdir(self.location) else []:
+            if entry.name.endswith('.json'):
+                os.remove(entry.path)
+
+
+class DatabaseCacheBackend:
+    """Rows in AnalysisCacheEntry; ``last_used_at`` drives LRU eviction."""
+
+    def __init__(self, ttl, max_entries, location=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get(self, key):
+        from .models import AnalysisCacheEntry
+
+        now = timezone.now()
+        entry = AnalysisCacheEntry.objects.filter(key=key).only('payload', 'created_at').first()
+        if entry is None:
+            return None
+        if entry.created_at < now - timedelta(seconds=self.ttl):
+            AnalysisCacheEntry.objects.filter(pk=entry.pk).delete()
+            return None
+        AnalysisCacheEntry.objects.filter(pk=entry.pk).update(last_used_at=now, hits=F('hits') + 1)
+        return entry.payload
+
+    def set(self, key, value):
+        from .models import AnalysisCacheEntry
+
+        now = timezone.now()
+        AnalysisCacheEntry.objects.update_or_create(
+            key=key, defaults={'payload': value, 'created_at': now, 'last_used_at': now}
+        )
+        overflow = AnalysisCacheEntry.objects.count() - self.max_entries
+        if overflow > 0:
+            stale = list(
+                AnalysisCacheEntry.objects.order_by('last_used_at').values_list('pk', flat=True)[:overflow]
+            )
+            AnalysisCacheEntry.objects.filter(pk__in=stale).delete()
+
+    def clear(self):
+        from .models import AnalysisCacheEntry
+
+        AnalysisCacheEntry.objects.all().delete()
+
+
+BACKENDS = {
+    'django': DjangoCacheBackend,
+    'file': FileCacheBackend,
+    'db': DatabaseCacheBackend,
+}
+
+stats = CacheStats()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide backend configured by ``settings.ANALYSIS_CACHE``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                conf = getattr(settings, 'ANALYSIS_CACHE', {}) or {}
+                name = conf.get('BACKEND', 'django')
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown ANALYSIS_CACHE backend: {name}")
+                _backend = BACKENDS[name](
+                    ttl=int(conf.get('TTL', 86400)),
+                    max_entries=int(conf.get('MAX_ENTRIES', 1000)),
+                    location=conf.get('LOCATION'),
+                )
+    return _backend
+
+
+def is_enabled():
+    return (getattr(settings, 'ANALYSIS_CACHE', {}) or {}).get('ENABLED', True)
+
+
+def get_cached(key):
+    """Return the stored analysis dict for ``key`` or None, counting hits/misses."""
+    if not is_enabled():
+        return None
+    try:
+        value = get_backend().get(key)
+    except Exception:
+        logger.exception('Analysis cache lookup failed')
+        stats.incr('errors')
+        return None
+    stats.incr('hits' if value is not None else 'misses')
+    return value
+
+
+def store(key, analysis_data):
+    """Store a normalized analysis dict; cache failures never break analysis."""
+    if not is_enabled():
+        return
+    try:
+        get_backend().set(key, analysis_data)
+        stats.incr('stores')
+    except Exception:
+        logger.exception('Analysis cache store failed')
+        stats.incr('errors')
+
+
+def get_stats():
+    conf = getattr(settings, 'ANALYSIS_CACHE', {}) or {}
+    return {'backend': conf.get('BACKEND', 'django'), 'enabled': is_enabled(), **stats.as_dict()}
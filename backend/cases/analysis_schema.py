@@ -0,0 +1,535 @@
+"""Declarative schema for the normalized analysis payload.
+
+``ANALYSIS_SCHEMA`` lists every key of a normalized analysis with a field
+spec (``Text``, ``Number``, ``Flag``, ``List``, ``Record``, ``Scores``). At
+import each spec is compiled into two plain closures: ``check(value)``,
+true when the value already fits, and ``clean(value, fixed)``, which
+coerces, clamps, fills in or drops what does not, appending its spec to
+``fixed``. Every spec that had to change something reports its top-level
+field as repaired.
+
+Most replies are valid, so ``normalize`` only runs the checks and keeps
+valid values as they are: the result is a new dict, but nested lists and
+dicts that passed are shared with the input rather than copied. The checks
+use the cheapest test available: ``''.join`` type-checks a run of strings in
+one C call, and a record picks its text fields with one ``itemgetter``.
+
+Missing keys and ``null`` are treated alike. Keys outside the schema
+(``fallback_reason``, ...) are passed through unchanged.
+"""
+from operator import itemgetter
+
+from .models import Case
+
+_DROP = object()  # a list item that cannot be repaired and is left out
+
+_TRUE_WORDS = frozenset({'true', 'yes', 'y', '1'})
+_join = ''.join  # raises TypeError unless every item is a string
+
+
+def _number(value, low, high, default):
+    scale = 1.0
+    if isinstance(value, str):
+        value = value.strip()
+        if value.endswith('%'):
+            value, scale = value[:-1], 0.01
+    try:
+        number = float(value) * scale
+    except (TypeError, ValueError):
+        return default
+    if number != number:  # NaN
+        return default
+    return low if number < low else high if number > high else number
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE_WORDS
+    return bool(value)
+
+
+class Field:
+    """Base spec. ``optional`` fields are filled in silently when missing.
+
+    Subclasses define ``empty()``, a fresh value for when nothing can be
+    salvaged, ``check()``, which returns ``check(value)``, and ``compile()``,
+    which returns ``clean(value, fixed)``.
+    """
+
+    def __init__(self, optional=False):
+        self.optional = optional
+
+    def children(self):
+        """Nested specs, for mapping a repair back to its top-level field."""
+        return ()
+
+    def check_all(self):
+        """``check_all(values, start)``: index of the first item from ``start`` on that fails ``check()``.
+
+        ``len(values)`` when they all pass.
+        """
+        check = self.check()
+
+        def check_all(values, start=0):
+            for index in range(start, len(values)):
+                if not check(values[index]):
+                    return index
+            return len(values)
+        return check_all
+
+    def repair(self):
+        """``clean(value, fixed)`` for a value known to fail ``check()``."""
+        return self.compile()
+
+
+class Text(Field):
+    """A string, optionally cut to ``max_length``."""
+
+    def __init__(self, max_length=None, optional=False):
+        super().__init__(optional=optional)
+        self.max_length = max_length
+
+    def empty(self):
+        return ''
+
+    def check(self):
+        max_length = self.max_length
+        if max_length is None:
+            return str.__instancecheck__
+        return lambda value: type(value) is str and len(value) <= max_length
+
+    def check_all(self):
+        if self.max_length is not None:
+            return super().check_all()
+
+        def check_all(values, start=0):
+            try:
+                _join(values[start:] if start else values)
+            except TypeError:
+                for index in range(start, len(values)):
+                    if type(values[index]) is not str:
+                        return index
+            return len(values)
+        return check_all
+
+    def compile(self):
+        max_length, report_missing = self.max_length, not self.optional
+
+        def clean(value, fixed):
+            if type(value) is str and (max_length is None or len(value) <= max_length):
+                return value
+            if value is None:
+                if report_missing:
+                    fixed.append(self)
+                return ''
+            fixed.append(self)
+            value = str(value)
+            return value[:max_length] if max_length else value
+        return clean
+
+
+class Number(Field):
+    """A float clamped to ``[low, high]``; unparseable values become ``default``."""
+
+    def __init__(self, low, high, default=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.low, self.high, self.default = float(low), float(high), float(default)
+
+    def empty(self):
+        return self.default
+
+    def check(self):
+        low, high = self.low, self.high
+        return lambda value: type(value) is float and low <= value <= high
+
+    def compile(self):
+        low, high, default, report_missing = self.low, self.high, self.default, not self.optional
+
+        def clean(value, fixed):
+            if type(value) is float and low <= value <= high:
+                return value
+            if type(value) is int and low <= value <= high:
+                return float(value)
+            if value is None:
+                if report_missing:
+                    fixed.append(self)
+                return default
+            fixed.append(self)
+            return _number(value, low, high, default)
+        return clean
+
+
+class Flag(Field):
+    """A boolean; ``"false"``/``"no"`` strings read as False."""
+
+    def empty(self):
+        return False
+
+    def check(self):
+        return bool.__instancecheck__
+
+    def compile(self):
+        report_missing = not self.optional
+
+        def clean(value, fixed):
+            if type(value) is bool:
+                return value
+            if value is None:
+                if report_missing:
+                    fixed.append(self)
+                return False
+            fixed.append(self)
+            return _flag(value)
+        return clean
+
+
+class List(Field):
+    """A list of ``item`` specs, at most ``limit`` long.
+
+    ``scalar`` says what to do with a lone value: ``'wrap'`` it in a list,
+    ``'split'`` a string on commas, or (None) discard it.
+    """
+
+    def __init__(self, item, limit=None, scalar=None, **kwargs):
+        super().__init__(**kwargs)
+        self.item, self.limit, self.scalar = item, limit, scalar
+
+    def empty(self):
+        return []
+
+    def children(self):
+        return (self.item,)
+
+    def check(self):
+        limit = self.limit
+        if type(self.item) is Text and not self.item.max_length:
+            def check(value):
+                if type(value) is not list or limit and len(value) > limit:
+                    return False
+                try:
+                    _join(value)
+                except TypeError:
+                    return False
+                return True
+            return check
+        check_all = self.item.check_all()
+        return lambda value: (
+            type(value) is list and not (limit and len(value) > limit) and check_all(value) == len(value)
+        )
+
+    def compile(self):
+        check_all, item_clean, item_repair = self.item.check_all(), self.item.compile(), self.item.repair()
+        limit, scalar, report_missing = self.limit, self.scalar, not self.optional
+        strings = type(self.item) is Text and not self.item.max_length
+
+        def clean(value, fixed):
+            if type(value) is list:
+                size = len(value)
+                if strings:
+                    try:
+                        _join(value)
+                        valid = size
+                    except TypeError:
+                        valid = check_all(value)
+                else:
+                    valid = check_all(value)
+                if valid == size:
+                    items = value
+                else:
+                    # Keep the runs of valid items and repair the ones in between
+                    items = value[:valid]
+                    while valid < size:
+                        item = item_repair(value[valid], fixed)
+                        if item is not _DROP:
+                            items.append(item)
+                        start = valid + 1
+                        valid = check_all(value, start)
+                        items += value[start:valid]
+                if limit and len(items) > limit:
+                    fixed.append(self)
+                    items = items[:limit]
+                return items
+            if value is None:
+                if report_missing:
+                    fixed.append(self)
+                return []
+            fixed.append(self)
+            if scalar == 'split' and type(value) is str:
+                return [part.strip() for part in value.split(',') if part.strip()]
+            if scalar == 'wrap' and value != '' and type(value) is not dict:
+                item = item_clean(value, fixed)
+                return [] if item is _DROP else [item]
+            return []
+        return clean
+
+
+class Record(Field):
+    """A dict with exactly ``fields``; extra keys are dropped.
+
+    A non-dict value becomes ``{scalar: str(value)}`` when ``scalar`` names a
+    field. Otherwise the closure returns ``_DROP``: lists leave the item out,
+    everywhere else it is replaced by ``empty()``.
+    """
+
+    def __init__(self, fields, scalar=None, **kwargs):
+        super().__init__(**kwargs)
+        self.fields, self.scalar = fields, scalar
+
+    def empty(self):
+        return {name: spec.empty() for name, spec in self.fields.items()}
+
+    def children(self):
+        return tuple(self.fields.values())
+
+    def _checks(self):
+        """``(size, pick_text, other)`` for the checks below.
+
+        A valid record has ``size`` keys, only strings in ``pick_text(value)``
+        (when there is a ``pick_text``) and passes ``check(value[name])`` for
+        each ``(name, check)`` in ``other``.
+        """
+        # Any string is a valid unbounded Text; a lone one is cheaper to check on its own
+        text = tuple(name for name, spec in self.fields.items() if type(spec) is Text and not spec.max_length)
+        if len(text) < 2:
+            text = ()
+        other = tuple((name, spec.check()) for name, spec in self.fields.items() if name not in text)
+        return len(self.fields), itemgetter(*text) if text else None, other
+
+    def check(self):
+        size, pick_text, other = self._checks()
+
+        def check(value):
+            try:
+                if len(value) != size:
+                    return False
+                if pick_text:
+                    _join(pick_text(value))
+                for name, check_field in other:
+                    if not check_field(value[name]):
+                        return False
+            except (TypeError, KeyError):
+                return False
+            return True
+        return check
+
+    def check_all(self):
+        size, pick_text, other = self._checks()
+
+        # Only a dict can be indexed by the field names, so the lookups double as the type check
+        if other:
+            def check_all(values, start=0):
+                index = start
+                try:
+                    for value in values[start:] if start else values:
+                        if len(value) != size:
+                            break
+                        if pick_text:
+                            _join(pick_text(value))
+                        for name, check in other:
+                            if not check(value[name]):
+                                return index
+                        index += 1
+                except (TypeError, KeyError):  # a non-string text, or another key instead of a field
+                    pass
+                return index
+        else:
+            def check_all(values, start=0):
+                index = start
+                try:
+                    for value in values[start:] if start else values:
+                        if len(value) != size:
+                            break
+                        if pick_text:
+                            _join(pick_text(value))
+                        index += 1
+                except (TypeError, KeyError):
+                    pass
+                return index
+        return check_all
+
+    def compile(self):
+        check, repair = self.check(), self.repair()
+
+        def clean(value, fixed):
+            if type(value) is dict and check(value):
+                return value
+            return repair(value, fixed)
+        return clean
+
+    def repair(self):
+        fields = tuple((name, spec.check(), spec.compile()) for name, spec in self.fields.items())
+        cleaners = tuple((name, field_clean) for name, _, field_clean in fields)
+        names, scalar, empty, report_missing = frozenset(self.fields), self.scalar, self.empty, not self.optional
+        nested = [name for name, spec in self.fields.items() if type(spec) is Record]
+        if scalar and not any(isinstance(value, (list, dict)) for value in empty().values()):
+            empty = empty().copy  # nothing mutable to share
+
+        def repair(value, fixed):
+            if type(value) is dict:
+                if value.keys() == names:  # the right keys: only clean the values that fail
+                    out = value.copy()
+                    for name, check, field_clean in fields:
+                        item = out[name]
+                        if not check(item):
+                            out[name] = field_clean(item, fixed)
+                else:
+                    if not names.issuperset(value):
+                        fixed.append(self)
+                    get = value.get
+                    out = {name: field_clean(get(name), fixed) for name, field_clean in cleaners}
+                for name in nested:  # a nested record that could not be salvaged
+                    if out[name] is _DROP:
+                        out[name] = self.fields[name].empty()
+                return out
+            if value is not None or report_missing:
+                fixed.append(self)
+            if scalar and value is not None and type(value) is not list:
+                out = empty()
+                out[scalar] = str(value)
+                return out
+            return _DROP
+        return repair
+
+
+class Scores(Field):
+    """``{label: confidence in [0, 1]}`` covering every label in ``keys`` (0.0 when not given).
+
+    Labels that are not keys are matched loosely ("Identity Theft" ->
+    ``identity_theft``) or dropped.
+    """
+
+    def __init__(self, keys, **kwargs):
+        super().__init__(**kwargs)
+        self.keys = tuple(keys)
+        self._template = dict.fromkeys(self.keys, 0.0)
+
+    def empty(self):
+        return self._template.copy()
+
+    def check(self):
+        keys, size = frozenset(self.keys), len(self.keys)
+
+        def check(value):
+            if type(value) is not dict or len(value) != size or value.keys() != keys:
+                return False
+            for score in value.values():
+                if type(score) is not float or not 0.0 <= score <= 1.0:
+                    return False
+            return True
+        return check
+
+    def compile(self):
+        check, template, report_missing = self.check(), self._template, not self.optional
+
+        def clean(value, fixed):
+            if type(value) is not dict:
+                if value is not None or report_missing:
+                    fixed.append(self)
+                return template.copy()
+            if check(value):
+                return value
+            out = template.copy()
+            for key, score in value.items():
+                if key not in out:
+                    fixed.append(self)
+                    key = str(key).strip().lower().replace('-', '_').replace(' ', '_')
+                    if key not in out:
+                        continue
+                if type(score) is float and 0.0 <= score <= 1.0:
+                    out[key] = score
+                else:
+                    out[key] = _number(score, 0.0, 1.0, 0.0)
+                    if not (type(score) is int and 0 <= score <= 1):
+                        fixed.append(self)
+            return out
+        return clean
+
+
+# Taken from the request's location when the model leaves them out
+LOCATION_FIELDS = ('country', 'state', 'city', 'pincode')
+
+ANALYSIS_SCHEMA = {
+    'country': Text(optional=True),
+    'state': Text(optional=True),
+    'city': Text(optional=True),
+    'pincode': Text(optional=True),
+    'language': Text(optional=True),
+    'keywords': List(Text(), scalar='split'),
+    'sentiment': Number(-1.0, 1.0),
+    'category_confidence': Scores(Case.Category.values),
+    'summary': Text(),
+    'legal_sections': List(
+        Record({'section': Text(), 'description': Text(), 'citation': Text(optional=True)}, scalar='section'),
+    ),
+    'sanction_recommendations': List(Record({
+        'code': Text(optional=True),
+        'name': Text(optional=True),
+        'description': Text(),
+        'confidence': Number(0.0, 1.0),
+    })),
+    'filing_viability': Record({
+        'viable': Flag(),
+        'rationale': Text(),
+        'missing_evidence': List(Text(), scalar='wrap'),
+        'recommended_actions': List(Text(), scalar='wrap'),
+    }),
+    'filing_authorities': List(Record({
+        'authority_type': Text(),
+        'name': Text(),
+        'address': Text(optional=True),
+        'phone_numbers': List(Text(), scalar='wrap', optional=True),
+        'online_portal': Text(optional=True),
+        'jurisdiction': Text(optional=True),
+        'how_to_file': Text(optional=True),
+        'notes': Text(optional=True),
+    })),
+    'next_steps': List(Text(), limit=15),
+    'evidence_priority': List(Record({'item': Text(), 'rationale': Text(), 'priority': Text()}, scalar='item'), limit=20),
+    'timeline_estimate': Text(max_length=200),
+}
+
+def _owners(schema):
+    """``{spec: top-level field}`` for every spec nested in ``schema``."""
+    owners = {}
+    for name, spec in schema.items():
+        pending = [spec]
+        while pending:
+            spec = pending.pop()
+            owners[spec] = name
+            pending.extend(spec.children())
+    return owners
+
+
+_OWNER = _owners(ANALYSIS_SCHEMA)
+_LOCATION = tuple((name, ANALYSIS_SCHEMA[name].compile()) for name in LOCATION_FIELDS)
+_CLEANERS = tuple((name, spec.compile()) for name, spec in ANALYSIS_SCHEMA.items() if name not in LOCATION_FIELDS)
+
+
+def normalize(data, country, state, city, pincode, repaired):
+    """Coerce the dict ``data`` to ``ANALYSIS_SCHEMA`` without modifying it.
+
+    Returns a new dict; lists and dicts that were already valid are shared
+    with ``data``. ``repaired(name)`` is called once for each top-level
+    field that had to be fixed up.
+    """
+    get = data.get
+    fixed = []
+    out = data.copy()  # keys outside the schema pass through
+    if data.keys().isdisjoint(LOCATION_FIELDS):  # usual for model replies
+        out['country'], out['state'], out['city'], out['pincode'] = country or '', state or '', city or '', pincode or ''
+    else:
+        for (name, clean), default in zip(_LOCATION, (country, state, city, pincode)):
+            value = get(name)
+            if type(value) is not str:
+                out[name] = default or '' if value is None else clean(value, fixed)
+    for name, clean in _CLEANERS:
+        out[name] = clean(get(name), fixed)
+    last = None
+    for spec in fixed:  # fields are cleaned one by one, so a field's repairs are adjacent
+        name = _OWNER[spec]
+        if name != last:
+            last = name
+            if out[name] is _DROP:
+                out[name] = ANALYSIS_SCHEMA[name].empty()
+            repaired(name)
+    return out
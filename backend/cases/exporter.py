@@ -0,0 +1,141 @@
+"""Streaming export of cases as CSV or JSONL.
+
+Used by ``GET /api/cases/export/`` and ``manage.py export_cases``. Rows are
+read with keyset pagination on ``id`` (``id > last`` ... ``LIMIT chunk``) and
+``values_list`` so no model instances are built and each query only holds one
+chunk. ``QuerySet.iterator()`` alone is not enough here: MySQL drivers buffer
+the whole result set client-side.
+"""
+import csv
+import datetime
+import decimal
+import io
+import json
+
+from rest_framework import serializers
+from rest_framework.renderers import BaseRenderer
+
+from .models import Case, CaseAnalysisResult
+from .serializers import CaseSerializer, LatestAnalysisField
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 2000
+
+# Case payload names served from latest_analysis (analysis_summary -> latest_analysis__summary)
+ANALYSIS_COLUMNS = {
+    name: f'latest_analysis__{field.attr}'
+    for name, field in CaseSerializer._declared_fields.items()
+    if isinstance(field, LatestAnalysisField)
+}
+# Every flat column the API exposes, in serializer order
+EXPORT_COLUMNS = tuple(
+    name for name in CaseSerializer.Meta.fields
+    if name in ANALYSIS_COLUMNS or (name in {f.attname for f in Case._meta.concrete_fields} | {'created_by', 'assigned_to'})
+)
+_EMPTY_ANALYSIS = {
+    name: (
+        CaseAnalysisResult._meta.get_field(lookup.split('__', 1)[1]).get_default()
+        if CaseSerializer._declared_fields[name].empty is serializers.empty
+        else CaseSerializer._declared_fields[name].empty
+    )
+    for name, lookup in ANALYSIS_COLUMNS.items()
+}
+
+
+def parse_columns(value):
+    """Return ``id`` plus the requested columns in the order given; all of them when ``value`` is empty.
+
+    Raises ValueError naming any unknown column.
+    """
+    requested = [c.strip() for c in (value or '').split(',') if c.strip()]
+    if not requested:
+        return list(EXPORT_COLUMNS)
+    unknown = [c for c in requested if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export column(s): {', '.join(unknown)}")
+    return ['id'] + [c for c in requested if c != 'id']
+
+
+def iter_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """Yield one tuple per case for ``columns`` in ``id`` order, ``chunk_size`` rows per query.
+
+    ``columns`` must start with ``id`` (``parse_columns`` guarantees it).
+    """
+    lookups = [ANALYSIS_COLUMNS.get(c, c) for c in columns]
+    analysis_idx = [(i, c) for i, c in enumerate(columns) if c in ANALYSIS_COLUMNS]
+    base = queryset.order_by('id').values_list(*lookups)
+    last_id = 0
+    while True:
+        chunk = list(base.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        for row in chunk:
+            if analysis_idx and row[analysis_idx[0][0]] is None:
+                # Never analyzed: export the same empty values the API returns
+                row = list(row)
+                for i, name in analysis_idx:
+                    if row[i] is None:
+                        row[i] = _EMPTY_ANALYSIS[name]
+            yield row
+        if len(chunk) < chunk_size:
+            return
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, datetime.timedelta)):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def iter_csv(rows, columns):
+    """Yield CSV text: the header line, then one line per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_cell(v) for v in row])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(rows, columns):
+    """Yield one JSON object per line."""
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + '\n'
+
+
+def iter_export(queryset, fmt, columns, chunk_size=CHUNK_SIZE):
+    rows = iter_rows(queryset, columns, chunk_size)
+    return iter_csv(rows, columns) if fmt == 'csv' else iter_jsonl(rows, columns)
+
+
+class CSVExportRenderer(BaseRenderer):
+    """Lets ``?format=csv`` select the export; the view streams the body itself."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only reached for error responses
+        return json.dumps(data, default=str).encode(self.charset)
+
+
+class JSONLExportRenderer(CSVExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
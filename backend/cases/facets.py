@@ -0,0 +1,119 @@
+"""Keyword / legal-section side tables and the ``GET /api/cases/facets/`` payload.
+
+``CaseKeyword`` and ``CaseLegalSection`` hold one row per keyword / cited
+section of each case's latest analysis, so "all cases citing IT Act 66D"
+(``?legal_section=``) and "top keywords this month" are indexed lookups and
+GROUP BYs instead of scans over JSON columns.
+
+Facet payloads are cached per visibility scope and query. Every entry's key
+includes a shared version token. Analysis writes and case saves/deletes
+replace the token, which invalidates all cached payloads at once without
+having to enumerate their keys.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+
+from .models import CaseKeyword, CaseLegalSection
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+VERSION_KEY = 'cases:facets:version'
+
+
+def normalize_keyword(value):
+    return ' '.join(str(value or '').split()).lower()[:100]
+
+
+def normalize_section(value):
+    """Section text from a ``legal_sections`` item (dict or string)."""
+    if isinstance(value, dict):
+        value = value.get('section', '')
+    return ' '.join(str(value or '').split()).strip(' ,;.')[:200]
+
+
+def _unique(values):
+    # Case-insensitive so MySQL's *_ci collations never see a duplicate
+    seen = {}
+    for value in values:
+        if value and value.lower() not in seen:
+            seen[value.lower()] = value
+    return list(seen.values())
+
+
+def sync_case_terms(case, result):
+    """Replace ``case``'s keyword and section rows with those of ``result``."""
+    CaseKeyword.objects.filter(case=case).delete()
+    CaseLegalSection.objects.filter(case=case).delete()
+    CaseKeyword.objects.bulk_create([
+        CaseKeyword(case=case, keyword=keyword)
+        for keyword in _unique(normalize_keyword(k) for k in result.keywords or [])
+    ])
+    CaseLegalSection.objects.bulk_create([
+        CaseLegalSection(case=case, section=section)
+        for section in _unique(normalize_section(s) for s in result.legal_sections or [])
+    ])
+
+
+def compute_facets(queryset, limit=DEFAULT_LIMIT):
+    """Count keywords, legal sections, categories and statuses over ``queryset``."""
+    case_ids = queryset.order_by().values('pk')
+
+    def top_terms(model, field):
+        rows = (
+            model.objects.filter(case_id__in=case_ids)
+            .values_list(field).annotate(count=Count('case_id')).order_by('-count', field)[:limit]
+        )
+        return [{'value': value, 'count': count} for value, count in rows]
+
+    def counts(field):
+        rows = queryset.order_by().values_list(field).annotate(count=Count('id')).order_by('-count', field)
+        return [{'value': value, 'count': count} for value, count in rows]
+
+    status = counts('status')
+    return {
+        'total': sum(row['count'] for row in status),
+        'keywords': top_terms(CaseKeyword, 'keyword'),
+        'legal_sections': top_terms(CaseLegalSection, 'section'),
+        'category': counts('category'),
+        'status': status,
+    }
+
+
+def _cache():
+    return caches[getattr(settings, 'CASE_FACETS_CACHE', 'default')]
+
+
+def invalidate():
+    """Drop every cached facet payload."""
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def cached_facets(queryset, scope, params, limit=DEFAULT_LIMIT):
+    """``compute_facets`` through the cache.
+
+    ``scope`` names whose cases ``queryset`` holds ('all', 'user:<id>') and
+    ``params`` the filters applied to it; together they identify the payload.
+    """
+    cache = _cache()
+    digest = hashlib.sha256(
+        json.dumps([scope, sorted(params.items()), limit], default=str).encode('utf-8')
+    ).hexdigest()
+    key = f'cases:facets:{_version(cache)}:{digest}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = compute_facets(queryset, limit)
+        cache.set(key, payload, getattr(settings, 'CASE_FACETS_CACHE_TTL', 300))
+    return payload
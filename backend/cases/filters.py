@@ -0,0 +1,40 @@
+from django.db.models.functions import Upper
+
+from .facets import normalize_keyword, normalize_section
+from .models import Case, CaseKeyword, CaseLegalSection
+
+
+def visible_cases(user):
+    """Cases ``user`` may see: everything for staff, own cases otherwise."""
+    queryset = Case.objects.all()
+    if not user.is_staff:
+        queryset = queryset.filter(created_by=user)
+    return queryset
+
+
+def apply_case_filters(queryset, params):
+    """Apply the ``status``/``category``/``case_id``/``keyword``/``legal_section`` query parameters."""
+    status = params.get('status', None)
+    category = params.get('category', None)
+    case_id = params.get('case_id', None)
+    keyword = params.get('keyword', None)
+    legal_section = params.get('legal_section', None)
+
+    if status:
+        queryset = queryset.filter(status=status)
+    if category:
+        queryset = queryset.filter(category=category)
+    if case_id:
+        # Case-insensitive match through the UPPER(case_id) expression index;
+        # `case_id__iexact` would compile to UPPER()/LIKE and scan the table.
+        queryset = queryset.alias(case_id_upper=Upper('case_id')).filter(case_id_upper=case_id.strip().upper())
+    if keyword:
+        # Subqueries on the side tables' (value, case) indexes; a join could repeat cases
+        queryset = queryset.filter(
+            pk__in=CaseKeyword.objects.filter(keyword=normalize_keyword(keyword)).values('case_id')
+        )
+    if legal_section:
+        queryset = queryset.filter(
+            pk__in=CaseLegalSection.objects.filter(section=normalize_section(legal_section)).values('case_id')
+        )
+    return queryset
@@ -0,0 +1,193 @@
+"""Streaming bulk import of cases from CSV or JSONL.
+
+Used by ``POST /api/cases/bulk_import/`` and ``manage.py import_cases``. Rows
+are read one at a time, validated with a single ``CaseSerializer`` instance,
+and written with ``bulk_create`` one chunk at a time, so memory use depends on
+``chunk_size`` rather than on the file size.
+"""
+import csv
+import io
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import facets, stats
+from .jobs import enqueue_batch
+from .models import Case
+from .search import index_cases
+from .serializers import CaseSerializer
+
+FORMATS = ('csv', 'jsonl')
+MAX_REPORTED_ERRORS = 100
+
+# CSV cells for these columns may hold JSON ("[...]" / "{...}")
+JSON_FIELDS = frozenset(f.name for f in Case._meta.get_fields() if isinstance(f, models.JSONField))
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def _csv_records(text):
+    for line_no, row in enumerate(csv.DictReader(text), start=2):  # line 1 is the header
+        record = {}
+        for key, value in row.items():
+            if key is None or value is None:
+                continue
+            key, value = key.strip(), value.strip()
+            if value == '':
+                continue  # CSV cannot tell empty from missing; let model defaults apply
+            if key in JSON_FIELDS and value[:1] in ('[', '{'):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            record[key] = value
+        yield line_no, record
+
+
+def _jsonl_records(text):
+    for line_no, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, ValidationError({'non_field_errors': [f'Invalid JSON: {e}']})
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValidationError({'non_field_errors': ['Each line must be a JSON object.']})
+            continue
+        yield line_no, record
+
+
+def iter_records(binary_file, fmt):
+    """Yield ``(line_no, record)`` from a binary file object without reading it all.
+
+    Unparseable JSONL lines yield a ValidationError in place of the record.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported import format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    try:
+        yield from (_csv_records(text) if fmt == 'csv' else _jsonl_records(text))
+    finally:
+        text.detach()  # leave closing the underlying file to its owner
+
+
+def allocate_case_ids(count):
+    """Return ``count`` new unique ``CASE-XXXXXXXX`` ids with one lookup per round."""
+    ids = set()
+    while len(ids) < count:
+        candidates = {f"CASE-{uuid.uuid4().hex[:8].upper()}" for _ in range(count - len(ids))} - ids
+        taken = set(Case.objects.filter(case_id__in=candidates).values_list('case_id', flat=True))
+        ids |= candidates - taken
+    return list(ids)
+
+
+class CaseImporter:
+    """Validate and insert case records in chunks, optionally queueing analysis.
+
+    ``analyze`` queues one AnalysisJob per imported case under a single
+    ``batch_id``; ``analysis_rate`` (jobs per second, default
+    ``ANALYSIS_RATE_LIMIT``) staggers their ``run_after`` so the workers are
+    fed at the rate the model quota allows.
+    """
+
+    def __init__(self, user, chunk_size=500, analyze=False, analysis_options=None, analysis_rate=None,
+                 on_chunk=None):
+        self.user = user
+        self.on_chunk = on_chunk  # called with summary() after each inserted chunk
+        self.chunk_size = max(1, chunk_size)
+        self.analyze = analyze
+        self.analysis_options = analysis_options or {}
+        self.analysis_rate = analysis_rate if analysis_rate is not None else getattr(settings, 'ANALYSIS_RATE_LIMIT', 0)
+        self.serializer = CaseSerializer()
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.batch_id = None
+        self._queued = 0
+        self._queue_start = None
+
+    def _error(self, line_no, detail):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_no, 'errors': detail})
+
+    def _validate(self, line_no, record):
+        if isinstance(record, ValidationError):
+            self._error(line_no, record.detail)
+            return None
+        try:
+            return self.serializer.run_validation(record)
+        except ValidationError as e:
+            self._error(line_no, e.detail)
+            return None
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        case_ids = allocate_case_ids(len(rows))
+        cases = [
+            Case(**validated, case_id=case_id, created_by=self.user)
+            for validated, case_id in zip(rows, case_ids)
+        ]
+        with transaction.atomic():
+            Case.objects.bulk_create(cases, batch_size=self.chunk_size)
+            # bulk_create skips the post_save signals that maintain the search index and stats
+            index_cases(Case.objects.filter(case_id__in=case_ids))
+            stats.record_created(cases)
+        facets.invalidate()
+        self.created += len(cases)
+        if self.analyze:
+            # bulk_create does not set pks on every backend (MySQL); look them up
+            saved = list(Case.objects.filter(case_id__in=case_ids).only('id'))
+            if self._queue_start is None:
+                self._queue_start = timezone.now()
+            rate = self.analysis_rate or None
+            # Continue the stagger where the previous chunk left off
+            offset = timedelta(seconds=self._queued / rate) if rate else timedelta(0)
+            self.batch_id, _ = enqueue_batch(
+                saved,
+                user=self.user,
+                batch_id=self.batch_id,
+                rate=rate,
+                not_before=self._queue_start + offset,
+                **self.analysis_options,
+            )
+            self._queued += len(saved)
+        if self.on_chunk is not None:
+            self.on_chunk(self.summary())
+
+    def run(self, records):
+        """Import ``(line_no, record)`` pairs; return a summary dict."""
+        rows = []
+        for line_no, record in records:
+            validated = self._validate(line_no, record)
+            if validated is not None:
+                rows.append(validated)
+            if len(rows) >= self.chunk_size:
+                self._flush(rows)
+                rows = []
+        self._flush(rows)
+        return self.summary()
+
+    def summary(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'batch_id': self.batch_id,
+        }
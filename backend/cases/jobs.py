@@ -0,0 +1,293 @@
+"""Durable analysis job queue backed by the AnalysisJob table.
+
+Producers call ``enqueue_analysis``; ``manage.py run_analysis_workers`` runs a
+bounded pool of threads that ``claim_next_job`` and ``run_job`` until stopped.
+No broker is involved, only the project database.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from . import throttling
+from .analysis import generate_analysis, generate_packed_analysis, is_api_key_missing, save_analysis
+from .models import AnalysisJob, Case, CaseAnalysisResult
+
+logger = logging.getLogger(__name__)
+
+OPTION_KEYS = ('country', 'state', 'city', 'pincode', 'language', 'files_summary')
+
+
+def enqueue_analysis(case, user=None, **options):
+    """Queue an analysis run for ``case`` and return the AnalysisJob."""
+    return AnalysisJob.objects.create(
+        case=case,
+        created_by=user,
+        options={k: v for k, v in options.items() if k in OPTION_KEYS},
+        max_attempts=getattr(settings, 'ANALYSIS_JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+def enqueue_batch(cases, user=None, files_by_case=None, batch_id=None, rate=None, not_before=None, **options):
+    """Queue one job per case under a shared ``batch_id``; return ``(batch_id, jobs)``.
+
+    ``files_by_case`` maps case pk to that case's ``files_summary``. Pass the
+    returned ``batch_id`` back in to add more cases to the same batch. With
+    ``rate`` (jobs per second) the jobs' ``run_after`` is staggered from
+    ``not_before`` (default now) so a large batch trickles into the workers.
+    """
+    batch_id = batch_id or uuid.uuid4()
+    files_by_case = files_by_case or {}
+    options = {k: v for k, v in options.items() if k in OPTION_KEYS}
+    max_attempts = getattr(settings, 'ANALYSIS_JOB_MAX_ATTEMPTS', 3)
+    start = not_before or timezone.now()
+    jobs = []
+    for i, case in enumerate(cases):
+        jobs.append(AnalysisJob(
+            case=case,
+            batch_id=batch_id,
+            created_by=user,
+            options={**options, 'files_summary': files_by_case.get(case.pk, [])},
+            max_attempts=max_attempts,
+            run_after=start + timedelta(seconds=i / rate) if rate else start,
+        ))
+    AnalysisJob.objects.bulk_create(jobs)
+    # Re-read rather than trust bulk_create pks, which MySQL does not return
+    return batch_id, list(
+        AnalysisJob.objects.filter(batch_id=batch_id, case__in=[case.pk for case in cases])
+        .select_related('case')
+        .order_by('id')
+    )
+
+
+def _lease_cutoff(now):
+    return now - timedelta(seconds=getattr(settings, 'ANALYSIS_JOB_LEASE_SECONDS', 300))
+
+
+def fail_expired_jobs():
+    """Mark running jobs whose lease expired after their last attempt as failed."""
+    now = timezone.now()
+    return AnalysisJob.objects.filter(
+        state=AnalysisJob.State.RUNNING,
+        locked_at__lt=_lease_cutoff(now),
+        attempts__gte=F('max_attempts'),
+    ).update(state=AnalysisJob.State.FAILED, error='Worker lease expired', finished_at=now, updated_at=now)
+
+
+def claim_next_job(worker_id):
+    """Atomically take the next runnable job, or return None if there is none.
+
+    Candidates are queued jobs that are due plus running jobs whose lease
+    expired (their worker died). ``SKIP LOCKED`` keeps concurrent workers from
+    blocking on each other; the conditional UPDATE makes the claim safe on
+    backends without row locks (SQLite).
+    """
+    now = timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        job = (
+            AnalysisJob.objects.select_for_update(skip_locked=skip_locked)
+            .filter(
+                Q(state=AnalysisJob.State.QUEUED, run_after__lte=now)
+                | Q(state=AnalysisJob.State.RUNNING, locked_at__lt=_lease_cutoff(now), attempts__lt=F('max_attempts'))
+            )
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = AnalysisJob.objects.filter(pk=job.pk, state=job.state, attempts=job.attempts).update(
+            state=AnalysisJob.State.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_by=worker_id,
+            locked_at=now,
+            started_at=now,
+            updated_at=now,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def claim_pack(job, worker_id):
+    """Claim queued jobs from ``job``'s batch that can share one prompt with it.
+
+    Only short cases (title + description up to ``ANALYSIS_PACK_MAX_CHARS``)
+    are packed, at most ``ANALYSIS_PACK_MAX_CASES`` per request. Returns the
+    claimed jobs, starting with ``job`` itself.
+    """
+    max_cases = getattr(settings, 'ANALYSIS_PACK_MAX_CASES', 5)
+    max_chars = getattr(settings, 'ANALYSIS_PACK_MAX_CHARS', 1500)
+    if job.batch_id is None or max_cases <= 1:
+        return [job]
+    short = AnalysisJob.objects.annotate(
+        case_chars=Length('case__title') + Length('case__description')
+    ).filter(case_chars__lte=max_chars)
+    if not short.filter(pk=job.pk).exists():
+        return [job]
+    now = timezone.now()
+    candidates = short.filter(
+        batch_id=job.batch_id, state=AnalysisJob.State.QUEUED, run_after__lte=now
+    ).exclude(pk=job.pk).order_by('id').values_list('pk', 'attempts')[:max_cases - 1]
+    claimed = [job]
+    for pk, attempts in candidates:
+        # Same conditional UPDATE as claim_next_job: losing a race just skips the job
+        if AnalysisJob.objects.filter(pk=pk, state=AnalysisJob.State.QUEUED, attempts=attempts).update(
+            state=AnalysisJob.State.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_by=worker_id,
+            locked_at=now,
+            started_at=now,
+            updated_at=now,
+        ):
+            claimed.append(AnalysisJob.objects.get(pk=pk))
+    return claimed
+
+
+def _finish(job, state, error=''):
+    now = timezone.now()
+    AnalysisJob.objects.filter(pk=job.pk).update(state=state, error=error, finished_at=now, updated_at=now)
+
+
+def _retry_or_fail(job, error, min_delay=0):
+    if job.attempts >= job.max_attempts:
+        _finish(job, AnalysisJob.State.FAILED, error)
+        return
+    # Linear backoff between attempts keeps a flapping provider from being hammered
+    delay = max(getattr(settings, 'ANALYSIS_JOB_RETRY_DELAY', 30) * job.attempts, min_delay)
+    now = timezone.now()
+    AnalysisJob.objects.filter(pk=job.pk).update(
+        state=AnalysisJob.State.QUEUED,
+        error=error,
+        run_after=now + timedelta(seconds=delay),
+        locked_by='',
+        locked_at=None,
+        updated_at=now,
+    )
+
+
+def _has_local_analysis(case):
+    return case.latest_analysis_id is not None and CaseAnalysisResult.objects.filter(
+        pk=case.latest_analysis_id, analysis_source=CaseAnalysisResult.Source.LOCAL
+    ).exists()
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome on the row."""
+    options = job.options or {}
+    try:
+        case = Case.objects.get(pk=job.case_id)
+        meta = {}
+        analysis_data = generate_analysis(
+            title=case.title,
+            accused_name='',
+            description=case.description,
+            country=options.get('country') or 'India',
+            state=options.get('state', ''),
+            city=options.get('city', ''),
+            pincode=options.get('pincode', ''),
+            files_summary=options.get('files_summary') or [],
+            language=options.get('language') or 'English',
+            meta=meta,
+            wait_for_slot=True,
+        )
+        if is_api_key_missing(analysis_data):
+            # Retrying cannot help until an admin configures the key
+            _finish(job, AnalysisJob.State.FAILED, analysis_data['error'])
+            return
+        if isinstance(analysis_data, dict) and 'error' in analysis_data and 'raw' not in analysis_data:
+            _finish(job, AnalysisJob.State.FAILED, str(analysis_data['error']))
+            return
+        if not meta.get('model_name') and _has_local_analysis(case):
+            # The model could not be used: keep the local result rather than
+            # store another one, and try again while attempts remain
+            reason = analysis_data.get('fallback_reason', '')
+            if reason == 'no_ai_module':
+                _finish(job, AnalysisJob.State.FAILED, 'AI module unavailable; local analysis kept')
+            else:
+                # Not before the circuit breaker lets calls through again
+                _retry_or_fail(
+                    job, f'AI unavailable ({reason}); local analysis kept',
+                    min_delay=throttling.get_circuit_breaker().retry_in(),
+                )
+            return
+        save_analysis(case, analysis_data, meta)
+    except Case.DoesNotExist:
+        _finish(job, AnalysisJob.State.FAILED, 'Case no longer exists')
+    except Exception as e:
+        logger.exception('Analysis job %s failed (attempt %s)', job.pk, job.attempts)
+        _retry_or_fail(job, str(e) or e.__class__.__name__)
+    else:
+        _finish(job, AnalysisJob.State.DONE)
+
+
+def run_jobs(jobs):
+    """Run claimed jobs, sending short cases from the same batch as one packed request.
+
+    Cases the packed reply does not cover are run on their own with ``run_job``.
+    """
+    if len(jobs) == 1:
+        run_job(jobs[0])
+        return
+    options = jobs[0].options or {}
+    remaining = list(jobs)
+    try:
+        cases = Case.objects.in_bulk([job.case_id for job in jobs])
+        meta = {}
+        results = generate_packed_analysis(
+            [
+                {
+                    'key': job.case_id,
+                    'title': cases[job.case_id].title,
+                    'description': cases[job.case_id].description,
+                    'files_summary': (job.options or {}).get('files_summary') or [],
+                }
+                for job in jobs if job.case_id in cases
+            ],
+            country=options.get('country') or 'India',
+            state=options.get('state', ''),
+            city=options.get('city', ''),
+            pincode=options.get('pincode', ''),
+            language=options.get('language') or 'English',
+            meta=meta,
+        )
+        for job in jobs:
+            if job.case_id in results:
+                save_analysis(cases[job.case_id], results[job.case_id], meta)
+                _finish(job, AnalysisJob.State.DONE)
+                remaining.remove(job)
+    except Exception:
+        logger.exception('Packed analysis of jobs %s failed', [job.pk for job in jobs])
+    for job in remaining:
+        run_job(job)
+
+
+def recent_job_latency(sample=20, default=10.0):
+    """Mean run time in seconds of the last ``sample`` finished jobs."""
+    rows = (
+        AnalysisJob.objects.filter(state=AnalysisJob.State.DONE, started_at__isnull=False, finished_at__isnull=False)
+        .order_by('-finished_at')
+        .values_list('started_at', 'finished_at')[:sample]
+    )
+    durations = [(finished - started).total_seconds() for started, finished in rows]
+    return sum(durations) / len(durations) if durations else default
+
+
+def estimate_eta(job):
+    """Rough seconds until ``job`` finishes, from queue depth and recent latency."""
+    if job.state in (AnalysisJob.State.DONE, AnalysisJob.State.FAILED):
+        return 0
+    latency = recent_job_latency()
+    if job.state == AnalysisJob.State.RUNNING:
+        return round(latency)
+    ahead = AnalysisJob.objects.filter(
+        Q(state=AnalysisJob.State.RUNNING) | Q(state=AnalysisJob.State.QUEUED, run_after__lte=job.run_after, pk__lt=job.pk)
+    ).count()
+    workers = max(1, getattr(settings, 'ANALYSIS_WORKERS', 2))
+    return round((ahead // workers + 1) * latency)
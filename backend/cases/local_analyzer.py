@@ -0,0 +1,254 @@
+"""Offline case analysis: the fallback when Gemini is unavailable or rate limited.
+
+``LocalAnalyzer`` is trained from the most recent cases (``LOCAL_ANALYZER``
+settings) and gives, in about a millisecond:
+
+* ``keywords`` - the words scoring highest on TF-IDF against that corpus, so
+  words every case uses ("complaint", "police") rank low
+* ``category_confidence`` - a multinomial naive Bayes classifier over
+  ``Case.Category``, trained on the categories users gave their cases plus a
+  small seed vocabulary per category so it works on an empty database
+* ``sentiment`` - a small lexicon score
+* ``summary`` - the lead sentences of the description
+
+Request paths train on a small corpus (``REQUEST_CORPUS_SIZE``) when the
+analyzer is missing or older than ``MAX_AGE`` seconds; the analysis workers
+train on the full ``CORPUS_SIZE`` off the request path. Every pattern is
+compiled at import.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .models import Case
+
+_WORD_RE = re.compile(r"[a-z][a-z0-9']{2,}")
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+STOP_WORDS = frozenset('''
+about above after again against all also among and any are around because been before being below
+between both but can cannot could did does doing down during each even ever every few for from further
+had has have having her here hers herself him himself his how however into its itself just last later
+like made make many may more most much must near need never next now off once one only other our ours
+out over own same says said she should since some such than that the their theirs them themselves then
+there these they this those though three through two under until upon very was were what when where
+whether which while who whom whose why will with within without would yet you your yours yourself
+day days time times also got get gets went came come take took told tell asked per via etc
+complaint complainant case filed file report reported police station sir madam kindly please request
+'''.split())
+
+# Seed vocabulary per category: lets the classifier give sensible confidences
+# before users have labelled enough cases, and is outweighed once they have.
+SEED_TERMS = {
+    Case.Category.GENERAL: 'dispute quarrel neighbour noise nuisance property argument misbehaviour',
+    Case.Category.FRAUD: 'fraud cheated cheating scam scammer fake deceived lottery prize refund otp '
+                         'upi payment advance job offer investment duped',
+    Case.Category.SECURITY: 'hacked hacking unauthorized access intrusion malware ransomware virus '
+                            'password compromised attack firewall',
+    Case.Category.COMPLIANCE: 'compliance violation audit policy norms guidelines breach contract '
+                              'obligation procedure noncompliance',
+    Case.Category.FINANCIAL: 'bank loan account transaction money embezzlement funds credit debit '
+                             'cheque salary dues misappropriation',
+    Case.Category.CYBERCRIME: 'online cyber social media harassment instagram facebook whatsapp morphed '
+                              'phishing email website stalking',
+    Case.Category.IDENTITY_THEFT: 'identity aadhaar pan impersonation impersonated kyc sim swap forged '
+                                  'documents profile cloned',
+    Case.Category.INTELLECTUAL_PROPERTY: 'copyright trademark patent piracy counterfeit infringement '
+                                         'pirated brand design plagiarism',
+    Case.Category.CORRUPTION: 'bribe bribery corruption kickback official demanded bribe public servant '
+                              'favour tender',
+    Case.Category.MONEY_LAUNDERING: 'laundering hawala shell company layering benami proceeds crime '
+                                    'cash deposits structuring',
+    Case.Category.DATA_BREACH: 'leaked leak data breach database exposed personal records customer '
+                               'information dump',
+    Case.Category.REGULATORY: 'regulator sebi rbi trai licence license notice penalty regulatory '
+                              'authority registration',
+}
+SEED_WEIGHT = 3  # each seed term counts as this many occurrences in its category
+
+NEGATIVE_WORDS = frozenset(
+    'threat threatened threatening stolen theft fraud cheated scam harassment harassed abuse abused '
+    'assault attacked injured loss lost victim fear blackmail extortion extorted forged leaked '
+    'hacked violence murder kidnapped missing robbed robbery deceived'.split()
+)
+POSITIVE_WORDS = frozenset(
+    'recovered resolved refunded returned settled safe apologized compensated arrested rescued '
+    'found cooperated'.split()
+)
+
+
+def tokenize(text):
+    """Lowercased words of three or more characters, stop words removed."""
+    return [w for w in _WORD_RE.findall((text or '').lower()) if w not in STOP_WORDS]
+
+
+class LocalAnalyzer:
+    """TF-IDF keywords and naive Bayes category scores from a corpus of past cases.
+
+    ``documents`` is an iterable of ``(text, category)``; ``category`` may be
+    empty for documents that should only feed document frequencies.
+    """
+
+    def __init__(self, documents=(), alpha=1.0):
+        self.categories = [c.value for c in Case.Category]
+        index = {c: i for i, c in enumerate(self.categories)}
+        doc_freq = Counter()
+        term_counts = [Counter() for _ in self.categories]
+        class_docs = [0] * len(self.categories)
+        self.corpus_size = 0
+        for text, category in documents:
+            tokens = tokenize(text)
+            self.corpus_size += 1
+            doc_freq.update(set(tokens))
+            if category in index:
+                class_docs[index[category]] += 1
+                term_counts[index[category]].update(tokens)
+        for category, terms in SEED_TERMS.items():
+            for term in terms.split():
+                term_counts[index[category]][term] += SEED_WEIGHT
+
+        # idf = log((1 + N) / (1 + df)) + 1; unseen words get the maximum
+        n = self.corpus_size
+        self.idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in doc_freq.items()}
+        self.max_idf = math.log(1 + n) + 1
+
+        # Log-probabilities stored per term as one row over all categories,
+        # so scoring a text is one dict lookup per distinct word
+        vocabulary = set().union(*term_counts)
+        totals = [sum(c.values()) + alpha * len(vocabulary) for c in term_counts]
+        self.term_rows = {
+            term: tuple(math.log((counts[term] + alpha) / total) for counts, total in zip(term_counts, totals))
+            for term in vocabulary
+        }
+        labelled = sum(class_docs)
+        self.log_priors = tuple(
+            math.log((docs + 1) / (labelled + len(self.categories))) for docs in class_docs
+        )
+
+    def keywords(self, text, n=7, tokens=None):
+        counts = Counter(tokenize(text) if tokens is None else tokens)
+        scored = sorted(
+            counts.items(),
+            key=lambda item: (-(1 + math.log(item[1])) * self.idf.get(item[0], self.max_idf), item[0]),
+        )
+        return [term for term, _ in scored[:n]]
+
+    def category_confidence(self, text, tokens=None):
+        """Posterior probability of every category, tempered so long texts do not saturate at 1.0."""
+        counts = Counter(tokenize(text) if tokens is None else tokens)
+        scores = list(self.log_priors)
+        for term, count in counts.items():
+            row = self.term_rows.get(term)
+            if row is None:
+                continue  # never seen in any category: no evidence either way
+            for i, log_p in enumerate(row):
+                scores[i] += count * log_p
+        temperature = max(1.0, math.sqrt(sum(counts.values())))
+        top = max(scores)
+        weights = [math.exp((s - top) / temperature) for s in scores]
+        total = sum(weights)
+        return {category: round(w / total, 4) for category, w in zip(self.categories, weights)}
+
+    @staticmethod
+    def sentiment(tokens):
+        negative = sum(1 for t in tokens if t in NEGATIVE_WORDS)
+        positive = sum(1 for t in tokens if t in POSITIVE_WORDS)
+        return round((positive - negative) / (positive + negative + 2), 3)
+
+    @staticmethod
+    def summarize(description, limit=280):
+        text = ' '.join((description or '').split())
+        if len(text) <= limit:
+            return text
+        summary = ''
+        for sentence in _SENTENCE_RE.split(text):
+            if len(summary) + len(sentence) + 1 > limit:
+                break
+            summary = f'{summary} {sentence}'.strip()
+        return summary or text[:limit].rsplit(' ', 1)[0] + '…'
+
+    def analyze(self, title, description):
+        """Keywords, category confidences, sentiment and summary for one case."""
+        tokens = tokenize(f'{title}\n{description}')
+        return {
+            'keywords': self.keywords('', tokens=tokens),
+            'category_confidence': self.category_confidence('', tokens=tokens),
+            'sentiment': self.sentiment(tokens),
+            'summary': self.summarize(description),
+        }
+
+    @classmethod
+    def from_recent_cases(cls, limit):
+        rows = Case.objects.order_by('-id').values_list('title', 'description', 'category')[:limit]
+        return cls((f'{title}\n{description}', category) for title, description, category in rows)
+
+
+_analyzer = None
+_trained_at = 0.0
+_corpus_limit = 0  # CORPUS_SIZE the current analyzer was trained with
+_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, 'LOCAL_ANALYZER', {})
+
+
+def _is_fresh(config, corpus_limit=0):
+    return (
+        _analyzer is not None
+        and _corpus_limit >= corpus_limit
+        and time.monotonic() - _trained_at <= config.get('MAX_AGE', 3600)
+    )
+
+
+def _train(corpus_limit):
+    global _analyzer, _trained_at, _corpus_limit
+    try:
+        _analyzer = LocalAnalyzer.from_recent_cases(corpus_limit)
+    except Exception:
+        # No database yet (e.g. during migrate): seed vocabulary only
+        _analyzer = _analyzer or LocalAnalyzer()
+    _trained_at = time.monotonic()
+    _corpus_limit = corpus_limit
+
+
+def get_local_analyzer():
+    """The process-wide analyzer.
+
+    A caller that finds none, or one older than ``MAX_AGE``, trains it on the
+    ``REQUEST_CORPUS_SIZE`` newest cases, so a request never reads more than
+    that. The analysis workers keep a full ``CORPUS_SIZE`` build fresh with
+    ``train_local_analyzer``.
+    """
+    config = _config()
+    if not _is_fresh(config):
+        with _lock:
+            if not _is_fresh(config):
+                _train(config.get('REQUEST_CORPUS_SIZE', 200))
+    return _analyzer
+
+
+def train_local_analyzer():
+    """Train on the ``CORPUS_SIZE`` newest cases unless a fresh build that size exists.
+
+    Called by ``run_analysis_workers`` on every poll; cheap when nothing is due.
+    """
+    config = _config()
+    corpus_limit = config.get('CORPUS_SIZE', 2000)
+    if not _is_fresh(config, corpus_limit):
+        with _lock:
+            if not _is_fresh(config, corpus_limit):
+                _train(corpus_limit)
+    return _analyzer
+
+
+def reset():
+    """Forget the trained analyzer so the next call retrains it."""
+    global _analyzer, _corpus_limit
+    with _lock:
+        _analyzer = None
+        _corpus_limit = 0
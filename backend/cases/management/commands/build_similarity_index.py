@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cases import similarity
+from cases.models import Case, CaseSimilarityVector
+
+
+class Command(BaseCommand):
+    help = ("Build the memory-mapped TF-IDF snapshot behind GET /api/cases/{id}/similar/ and fold in "
+            "the vectors stored by analysis runs since the previous build.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Cases read per query')
+
+    def rows(self, chunk_size):
+        base = Case.objects.order_by('id').values_list('id', 'title', 'description', 'latest_analysis__keywords')
+        last_id = 0
+        while True:
+            chunk = list(base.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                return
+            last_id = chunk[-1][0]
+            yield from chunk
+
+    def handle(self, *args, **options):
+        if not similarity.similarity_available():
+            raise CommandError('numpy and scipy are required: pip install numpy scipy')
+        started_at = timezone.now()
+        started = time.monotonic()
+        name, count = similarity.build_snapshot(self.rows(max(1, options['chunk_size'])))
+        # Vectors stored after the build started stay: they may be newer than the snapshot
+        folded, _ = CaseSimilarityVector.objects.filter(updated_at__lt=started_at).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Built similarity snapshot {name}: {count} cases in {time.monotonic() - started:.1f}s "
+            f"({folded} stored vectors folded in)"
+        ))
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cases import query_plans
+
+
+class Command(BaseCommand):
+    help = ("EXPLAIN the CaseViewSet list queries and fail if any of them falls back to a "
+            "full table scan of cases_case or misses its index.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the non-staff user to build owner queries for '
+                                           '(default: any user)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every query plan')
+
+    def handle(self, *args, **options):
+        if not query_plans.is_supported():
+            raise CommandError(f"No full-scan detection for database vendor '{connection.vendor}'")
+
+        User = get_user_model()
+        users = User.objects.filter(email=options['user']) if options['user'] else User.objects.all()
+        user_id = users.values_list('pk', flat=True).first() or 0
+
+        failures = []
+        for name, (queryset, indexes) in query_plans.case_list_queries(user_id).items():
+            plan = query_plans.explain(queryset)
+            if options['verbose_plans']:
+                self.stdout.write(f"--- {name}\n{plan}")
+            problem = query_plans.plan_problem(plan, indexes)
+            if problem:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{problem.upper():<12} {name}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{'index':<12} {name}"))
+
+        if connection.vendor == 'mysql':
+            self.stdout.write('Note: MySQL may still choose a full scan on very small tables; '
+                              'run against realistic data volumes.')
+        if failures:
+            raise CommandError(f"{len(failures)} case queries do not use their indexes: {', '.join(failures)}")
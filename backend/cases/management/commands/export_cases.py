@@ -0,0 +1,45 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cases.exporter import CHUNK_SIZE, FORMATS, iter_export, parse_columns
+from cases.filters import apply_case_filters, visible_cases
+from cases.models import Case
+
+
+class Command(BaseCommand):
+    help = "Stream cases to a CSV or JSONL file (or stdout) with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--columns', help='Comma-separated columns (default: all)')
+        parser.add_argument('--status', help='Only cases with this status')
+        parser.add_argument('--category', help='Only cases in this category')
+        parser.add_argument('--user', help='Export only what this user (email) can see (default: every case)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows fetched per query')
+
+    def handle(self, *args, **options):
+        try:
+            columns = parse_columns(options['columns'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['user']:
+            user = get_user_model().objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+            queryset = visible_cases(user)
+        else:
+            queryset = Case.objects.all()
+        queryset = apply_case_filters(queryset, {'status': options['status'], 'category': options['category']})
+
+        out = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for part in iter_export(queryset, options['format'], columns, max(1, options['chunk_size'])):
+                out.write(part)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cases.analysis import ANALYSIS_LANGUAGES, INDIAN_STATES
+from cases.importer import FORMATS, CaseImporter, detect_format, iter_records
+
+
+class Command(BaseCommand):
+    help = "Stream cases from a CSV or JSONL file into the database with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (header row) or JSONL file to import')
+        parser.add_argument('--user', required=True, help='Email of the user recorded as created_by')
+        parser.add_argument('--format', choices=FORMATS, help='File format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=getattr(settings, 'CASE_IMPORT_CHUNK_SIZE', 500),
+                            help='Rows validated and inserted per batch')
+        parser.add_argument('--analyze', action='store_true', help='Queue an analysis job for every imported case')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Analysis jobs released per second (default: ANALYSIS_RATE_LIMIT)')
+        parser.add_argument('--state', default='')
+        parser.add_argument('--city', default='')
+        parser.add_argument('--pincode', default='')
+        parser.add_argument('--language', default='English')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['user']}")
+        if options['state'] and options['state'].lower() not in INDIAN_STATES:
+            raise CommandError('Invalid Indian state provided.')
+        if options['language'] not in ANALYSIS_LANGUAGES:
+            raise CommandError('Unsupported language. Choose from: ' + ', '.join(sorted(ANALYSIS_LANGUAGES)))
+
+        importer = CaseImporter(
+            user,
+            chunk_size=options['chunk_size'],
+            analyze=options['analyze'],
+            analysis_rate=options['rate'],
+            analysis_options={
+                'country': 'India',
+                'state': options['state'],
+                'city': options['city'],
+                'pincode': options['pincode'],
+                'language': options['language'],
+            },
+            on_chunk=lambda summary: self.stdout.write(
+                f"  {summary['created']} imported, {summary['failed']} invalid so far"
+            ),
+        )
+        fmt = options['format'] or detect_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as f:
+                summary = importer.run(iter_records(f, fmt))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in summary['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if summary['failed'] > len(summary['errors']):
+            self.stderr.write(f"... and {summary['failed'] - len(summary['errors'])} more invalid rows")
+        self.stdout.write(self.style.SUCCESS(f"Imported {summary['created']} case(s), {summary['failed']} invalid row(s)"))
+        if summary['batch_id']:
+            self.stdout.write(f"Queued analysis batch {summary['batch_id']}; run `manage.py run_analysis_workers` to process it")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from cases.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Recompute the CaseStatsDaily counters behind GET /api/cases/stats/ from the cases "
+            "table. Only needed after writes that bypass the ORM; signals keep them current.")
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt case stats: {rows} counters"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from cases.models import Case
+from cases.search import index_cases
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the full-text search documents for every case. Only needed after writes "
+            "that bypass the ORM (raw SQL, restores); saves keep the index current.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Cases indexed per query')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        ids = Case.objects.order_by('id').values_list('id', flat=True)
+        last_id = 0
+        total = 0
+        while True:
+            chunk = list(ids.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1]
+            total += index_cases(Case.objects.filter(id__in=chunk))
+            self.stdout.write(f"Indexed {total} cases")
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt for {total} cases"))
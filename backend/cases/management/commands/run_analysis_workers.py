@@ -0,0 +1,85 @@
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from cases.jobs import claim_next_job, claim_pack, fail_expired_jobs, run_jobs
+from cases.local_analyzer import train_local_analyzer
+
+
+class Command(BaseCommand):
+    help = "Run a bounded pool of workers that process queued case analysis jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'ANALYSIS_WORKERS', 2),
+                            help='Number of worker threads (default: ANALYSIS_WORKERS)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is drained instead of polling forever')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        once = options['once']
+        stop = threading.Event()
+        errors = []
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping workers after their current job...')
+            stop.set()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                signal.signal(sig, shutdown)
+            except ValueError:  # pragma: no cover - not in main thread
+                pass
+
+        def work(worker_id):
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    fail_expired_jobs()
+                    # Fallback analyses here use the full corpus; requests only train on a slice of it
+                    train_local_analyzer()
+                    job = claim_next_job(worker_id)
+                    if job is None:
+                        if once:
+                            break
+                        stop.wait(poll_interval)
+                        continue
+                    jobs = claim_pack(job, worker_id)
+                    self.stdout.write(
+                        f"[{worker_id}] running job(s) {', '.join(str(j.pk) for j in jobs)} "
+                        f"for case(s) {', '.join(str(j.case_id) for j in jobs)}"
+                    )
+                    run_jobs(jobs)
+                except Exception as e:
+                    self.stderr.write(f"[{worker_id}] worker error: {e}")
+                    if once:
+                        # A one-shot run (cron, CI) reports the failure instead of retrying forever
+                        errors.append(e)
+                        stop.set()
+                        break
+                    stop.wait(poll_interval)
+            close_old_connections()
+
+        threads = [
+            threading.Thread(target=work, args=(f"{prefix}:{i}",), name=f"analysis-worker-{i}")
+            for i in range(workers)
+        ]
+        for t in threads:
+            t.start()
+        self.stdout.write(self.style.SUCCESS(f"Started {workers} analysis worker(s)"))
+        # Join with a timeout so the main thread keeps receiving signals
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=0.5)
+        if errors:
+            raise CommandError(f"Analysis workers stopped after an error: {errors[0]}")
+        self.stdout.write(self.style.SUCCESS('Analysis workers stopped'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-18 20:50
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0008_analysiscacheentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['created_by', '-created_at'], name='case_owner_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['status', 'category', '-created_at'], name='case_status_cat_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['-created_at', 'id'], name='case_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(django.db.models.functions.text.Upper('case_id'), name='case_case_id_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0 on 2026-10-18 20:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0009_case_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseAnalysisResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('model_name', models.CharField(blank=True, max_length=100)),
+                ('prompt_version', models.CharField(blank=True, max_length=50)),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('output_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('pincode', models.CharField(blank=True, max_length=20)),
+                ('language', models.CharField(blank=True, max_length=50)),
+                ('keywords', models.JSONField(default=list)),
+                ('sentiment', models.FloatField(blank=True, null=True)),
+                ('category_confidence', models.JSONField(default=dict)),
+                ('summary', models.TextField(blank=True)),
+                ('legal_sections', models.JSONField(default=list)),
+                ('sanction_recommendations', models.JSONField(default=list)),
+                ('filing_viability', models.JSONField(default=dict)),
+                ('filing_authorities', models.JSONField(default=list)),
+                ('next_steps', models.JSONField(default=list)),
+                ('evidence_priority', models.JSONField(default=list)),
+                ('timeline_estimate', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_results', to='cases.case')),
+            ],
+            options={
+                'ordering': ['-version'],
+            },
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='latest_analysis',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cases.caseanalysisresult'),
+        ),
+        migrations.AddConstraint(
+            model_name='caseanalysisresult',
+            constraint=models.UniqueConstraint(fields=('case', 'version'), name='caseanalysisresult_case_version_uniq'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+# (old Case column, CaseAnalysisResult field)
+FIELD_MAP = [
+    ('analysis_country', 'country'),
+    ('analysis_state', 'state'),
+    ('analysis_city', 'city'),
+    ('analysis_pincode', 'pincode'),
+    ('analysis_language', 'language'),
+    ('analysis_keywords', 'keywords'),
+    ('analysis_sentiment', 'sentiment'),
+    ('analysis_category_confidence', 'category_confidence'),
+    ('analysis_summary', 'summary'),
+    ('analysis_legal_sections', 'legal_sections'),
+    ('analysis_sanction_recommendations', 'sanction_recommendations'),
+    ('analysis_filing_viability', 'filing_viability'),
+    ('analysis_filing_authorities', 'filing_authorities'),
+    ('analysis_next_steps', 'next_steps'),
+    ('analysis_evidence_priority', 'evidence_priority'),
+    ('analysis_timeline_estimate', 'timeline_estimate'),
+]
+BATCH_SIZE = 500
+
+
+def move_to_results(apps, schema_editor):
+    """Copy each analyzed case's inline results into a version 1 result row."""
+    Case = apps.get_model('cases', 'Case')
+    CaseAnalysisResult = apps.get_model('cases', 'CaseAnalysisResult')
+    columns = ['pk', 'analyzed_at'] + [old for old, _ in FIELD_MAP]
+    cases = Case.objects.filter(analyzed_at__isnull=False, latest_analysis__isnull=True).values(*columns)
+
+    def flush(batch):
+        created = CaseAnalysisResult.objects.bulk_create(batch)
+        for result in created:
+            if result.pk is None:  # Backends that cannot return ids from bulk inserts
+                result.pk = CaseAnalysisResult.objects.get(case_id=result.case_id, version=1).pk
+            Case.objects.filter(pk=result.case_id).update(latest_analysis_id=result.pk)
+
+    batch = []
+    for row in cases.iterator(chunk_size=BATCH_SIZE):
+        batch.append(CaseAnalysisResult(
+            case_id=row['pk'],
+            version=1,
+            created_at=row['analyzed_at'],
+            **{new: row[old] for old, new in FIELD_MAP if row[old] is not None},
+        ))
+        if len(batch) >= BATCH_SIZE:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+
+def move_to_case(apps, schema_editor):
+    Case = apps.get_model('cases', 'Case')
+    for case in Case.objects.filter(latest_analysis__isnull=False).select_related('latest_analysis').iterator():
+        result = case.latest_analysis
+        for old, new in FIELD_MAP:
+            setattr(case, old, getattr(result, new))
+        case.save(update_fields=[old for old, _ in FIELD_MAP])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0010_caseanalysisresult'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_results, move_to_case),
+    ]
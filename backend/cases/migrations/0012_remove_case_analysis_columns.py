@@ -0,0 +1,77 @@
+# Generated by Django 5.0 on 2026-10-18 20:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0011_move_case_analysis'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_category_confidence',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_city',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_country',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_evidence_priority',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_filing_authorities',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_filing_viability',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_keywords',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_language',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_legal_sections',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_next_steps',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_pincode',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_sanction_recommendations',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_sentiment',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_state',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_summary',
+        ),
+        migrations.RemoveField(
+            model_name='case',
+            name='analysis_timeline_estimate',
+        ),
+    ]
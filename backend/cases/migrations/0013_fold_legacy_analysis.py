@@ -0,0 +1,53 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def fold_into_results(apps, schema_editor):
+    """Keep legacy Analysis rows that have no CaseAnalysisResult counterpart.
+
+    Cases analyzed through the current pipeline already carry the same
+    values on ``latest_analysis``; only orphans need a result row.
+    """
+    Analysis = apps.get_model('cases', 'Analysis')
+    Case = apps.get_model('cases', 'Case')
+    CaseAnalysisResult = apps.get_model('cases', 'CaseAnalysisResult')
+    orphans = Analysis.objects.filter(case__latest_analysis__isnull=True)
+    for legacy in orphans.iterator():
+        last = CaseAnalysisResult.objects.filter(case_id=legacy.case_id).aggregate(v=Max('version'))['v'] or 0
+        result = CaseAnalysisResult.objects.create(
+            case_id=legacy.case_id,
+            version=last + 1,
+            keywords=legacy.keywords,
+            sentiment=legacy.sentiment,
+            category_confidence=legacy.category_confidence,
+            summary=legacy.summary,
+            created_at=legacy.analyzed_at,
+        )
+        Case.objects.filter(pk=legacy.case_id).update(latest_analysis_id=result.pk, analyzed_at=legacy.analyzed_at)
+
+
+def restore_legacy_rows(apps, schema_editor):
+    Analysis = apps.get_model('cases', 'Analysis')
+    Case = apps.get_model('cases', 'Case')
+    for case in Case.objects.filter(latest_analysis__isnull=False).select_related('latest_analysis').iterator():
+        result = case.latest_analysis
+        Analysis.objects.update_or_create(
+            case_id=case.pk,
+            defaults={
+                'keywords': result.keywords,
+                'sentiment': result.sentiment,
+                'category_confidence': result.category_confidence,
+                'summary': result.summary,
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0012_remove_case_analysis_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_into_results, restore_legacy_rows),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0 on 2026-10-18 20:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0013_fold_legacy_analysis'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Analysis',
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.0 on 2026-10-18 21:09
+
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+
+TABLE = 'cases_casesearchdocument'
+FTS = f'{TABLE}_fts'
+PG_VECTOR = (
+    "setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', body), 'B') || "
+    "setweight(to_tsvector('english', analysis), 'C')"
+)
+
+SQLITE_FTS = [
+    f"CREATE VIRTUAL TABLE {FTS} USING fts5(title, body, analysis, "
+    f"content='{TABLE}', content_rowid='case_id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS}(rowid, title, body, analysis) VALUES (new.case_id, new.title, new.body, new.analysis); END",
+    f"CREATE TRIGGER {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, title, body, analysis) "
+    f"VALUES ('delete', old.case_id, old.title, old.body, old.analysis); END",
+    f"CREATE TRIGGER {TABLE}_au AFTER UPDATE ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, title, body, analysis) "
+    f"VALUES ('delete', old.case_id, old.title, old.body, old.analysis); "
+    f"INSERT INTO {FTS}(rowid, title, body, analysis) VALUES (new.case_id, new.title, new.body, new.analysis); END",
+]
+SQLITE_DROP = [f"DROP TRIGGER IF EXISTS {TABLE}_{suffix}" for suffix in ('ai', 'ad', 'au')] + [
+    f"DROP TABLE IF EXISTS {FTS}",
+]
+FULLTEXT_SQL = {
+    'mysql': [f"CREATE FULLTEXT INDEX casesearch_fulltext_idx ON {TABLE} (title, body, analysis)"],
+    'postgresql': [f"CREATE INDEX casesearch_tsv_idx ON {TABLE} USING GIN (({PG_VECTOR}))"],
+}
+FULLTEXT_DROP = {
+    'mysql': [f"DROP INDEX casesearch_fulltext_idx ON {TABLE}"],
+    'postgresql': ["DROP INDEX IF EXISTS casesearch_tsv_idx"],
+}
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for sql in SQLITE_FTS:
+                    schema_editor.execute(sql)
+        except DatabaseError:
+            pass  # SQLite built without FTS5: cases.search falls back to LIKE
+        return
+    for sql in FULLTEXT_SQL.get(vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = SQLITE_DROP if vendor == 'sqlite' else FULLTEXT_DROP.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def build_documents(apps, schema_editor):
+    Case = apps.get_model('cases', 'Case')
+    CaseSearchDocument = apps.get_model('cases', 'CaseSearchDocument')
+    rows = Case.objects.order_by('id').values_list(
+        'id', 'title', 'description', 'motive', 'remarks_notes',
+        'latest_analysis__summary', 'latest_analysis__keywords',
+    )
+    documents = []
+    for pk, title, description, motive, remarks_notes, summary, keywords in rows.iterator(chunk_size=1000):
+        keywords = ' '.join(str(k) for k in (keywords or []) if k)
+        documents.append(CaseSearchDocument(
+            case_id=pk,
+            title=title or '',
+            body='\n'.join(part for part in (description, motive, remarks_notes) if part),
+            analysis='\n'.join(part for part in (summary, keywords) if part),
+        ))
+        if len(documents) >= 1000:
+            CaseSearchDocument.objects.bulk_create(documents)
+            documents = []
+    CaseSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0015_analysisjob_batch_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseSearchDocument',
+            fields=[
+                ('case', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='cases.case')),
+                ('title', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+                ('analysis', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.0 on 2026-10-18 21:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _unique(values):
+    seen = {}
+    for value in values:
+        if value and value.lower() not in seen:
+            seen[value.lower()] = value
+    return list(seen.values())
+
+
+def build_terms(apps, schema_editor):
+    """Fill the side tables from every case's latest analysis."""
+    Case = apps.get_model('cases', 'Case')
+    CaseKeyword = apps.get_model('cases', 'CaseKeyword')
+    CaseLegalSection = apps.get_model('cases', 'CaseLegalSection')
+    rows = Case.objects.filter(latest_analysis__isnull=False).order_by('id').values_list(
+        'id', 'latest_analysis__keywords', 'latest_analysis__legal_sections',
+    )
+    keywords, sections = [], []
+    for pk, case_keywords, case_sections in rows.iterator(chunk_size=1000):
+        keywords += [
+            CaseKeyword(case_id=pk, keyword=k)
+            for k in _unique(' '.join(str(k or '').split()).lower()[:100] for k in case_keywords or [])
+        ]
+        sections += [
+            CaseLegalSection(case_id=pk, section=s)
+            for s in _unique(
+                ' '.join(str(s.get('section', '') if isinstance(s, dict) else s or '').split()).strip(' ,;.')[:200]
+                for s in case_sections or []
+            )
+        ]
+        if len(keywords) + len(sections) >= 1000:
+            CaseKeyword.objects.bulk_create(keywords)
+            CaseLegalSection.objects.bulk_create(sections)
+            keywords, sections = [], []
+    CaseKeyword.objects.bulk_create(keywords)
+    CaseLegalSection.objects.bulk_create(sections)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0016_casesearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100)),
+                ('case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keyword_entries', to='cases.case')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CaseLegalSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=200)),
+                ('case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='legal_section_entries', to='cases.case')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='casekeyword',
+            constraint=models.UniqueConstraint(fields=('keyword', 'case'), name='casekeyword_keyword_case_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='caselegalsection',
+            constraint=models.UniqueConstraint(fields=('section', 'case'), name='caselegalsection_section_case_uniq'),
+        ),
+        migrations.RunPython(build_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-18 21:13
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def build_counters(apps, schema_editor):
+    Case = apps.get_model('cases', 'Case')
+    CaseStatsDaily = apps.get_model('cases', 'CaseStatsDaily')
+    rows = (
+        Case.objects.order_by()
+        .annotate(day=TruncDate('created_at', tzinfo=datetime.timezone.utc))
+        .values('day', 'status', 'category', 'priority')
+        .annotate(count=Count('id'))
+    )
+    CaseStatsDaily.objects.bulk_create([CaseStatsDaily(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0017_case_keyword_legal_section'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseStatsDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('category', models.CharField(max_length=50)),
+                ('priority', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='casestatsdaily',
+            constraint=models.UniqueConstraint(fields=('day', 'status', 'category', 'priority'), name='casestatsdaily_key_uniq'),
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-18 21:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0018_casestatsdaily'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseSimilarityVector',
+            fields=[
+                ('case', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similarity_vector', serialize=False, to='cases.case')),
+                ('indices', models.BinaryField()),
+                ('weights', models.BinaryField()),
+                ('updated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
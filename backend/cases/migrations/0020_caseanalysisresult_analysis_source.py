@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-18 21:22
+
+from django.db import migrations, models
+
+
+def mark_fallback_results(apps, schema_editor):
+    """Results written by the offline fallback have no model name.
+
+    Rows copied from the old inline columns (0011) and the legacy Analysis
+    table (0013) have neither a model name nor a prompt version: they are
+    model results and stay ``ai``.
+    """
+    CaseAnalysisResult = apps.get_model('cases', 'CaseAnalysisResult')
+    CaseAnalysisResult.objects.filter(model_name='').exclude(prompt_version='').update(analysis_source='local')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0019_casesimilarityvector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='caseanalysisresult',
+            name='analysis_source',
+            field=models.CharField(choices=[('local', 'Local'), ('ai', 'AI')], default='ai', max_length=10),
+        ),
+        migrations.RunPython(mark_fallback_results, migrations.RunPython.noop),
+    ]
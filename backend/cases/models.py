@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 class Case(models.Model):
     class Status(models.TextChoices):
@@ -138,24 +140,14 @@ class Case(models.Model):
     review_notes = models.TextField(blank=True)
     last_qa_date = models.DateField(null=True, blank=True)
 
-    # AI Analysis results stored directly on the case
-    analysis_keywords = models.JSONField(default=list)
-    analysis_sentiment = models.FloatField(null=True, blank=True)
-    analysis_category_confidence = models.JSONField(default=dict)
-    analysis_summary = models.TextField(blank=True)
-    analysis_country = models.CharField(max_length=100, blank=True)
-    analysis_state = models.CharField(max_length=100, blank=True)
-    analysis_city = models.CharField(max_length=100, blank=True)
-    analysis_pincode = models.CharField(max_length=20, blank=True)
-    # New extended analysis attributes
-    analysis_language = models.CharField(max_length=50, blank=True)
-    analysis_legal_sections = models.JSONField(default=list)
-    analysis_sanction_recommendations = models.JSONField(default=list)
-    analysis_filing_viability = models.JSONField(default=dict)
-    analysis_filing_authorities = models.JSONField(default=list)
-    analysis_next_steps = models.JSONField(default=list)  # Ordered actionable steps
-    analysis_evidence_priority = models.JSONField(default=list)  # Evidence items ranked
-    analysis_timeline_estimate = models.CharField(max_length=200, blank=True)  # Indicative timeline summary
+    # AI analysis runs live in CaseAnalysisResult; the case keeps a pointer to the newest one
+    latest_analysis = models.ForeignKey(
+        'CaseAnalysisResult',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
     analyzed_at = models.DateTimeField(null=True, blank=True)
     
     created_by = models.ForeignKey(
@@ -175,6 +167,16 @@ class Case(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     closed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        # Shaped after CaseViewSet.get_queryset: owner/status/category filters
+        # ordered newest first, plus case-insensitive case_id lookups.
+        indexes = [
+            models.Index(fields=['created_by', '-created_at'], name='case_owner_recent_idx'),
+            models.Index(fields=['status', 'category', '-created_at'], name='case_status_cat_recent_idx'),
+            models.Index(fields=['-created_at', 'id'], name='case_recent_idx'),
+            models.Index(Upper('case_id'), name='case_case_id_upper_idx'),
+        ]
+
     def __str__(self):
         return f"{self.case_id} - {self.title}"
 
@@ -185,13 +187,130 @@ class Document(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     description = models.CharField(max_length=200, blank=True)
 
-class Analysis(models.Model):
-    case = models.OneToOneField(Case, on_delete=models.CASCADE, related_name='analysis')
+class CaseAnalysisResult(models.Model):
+    """One analysis run for a case. Rows are only ever inserted; ``version``
+    counts runs per case and ``Case.latest_analysis`` points at the newest."""
+    class Source(models.TextChoices):
+        LOCAL = 'local', 'Local'  # LocalAnalyzer, written when the case is created or the model is unavailable
+        AI = 'ai', 'AI'
+
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='analysis_results')
+    version = models.PositiveIntegerField()
+    analysis_source = models.CharField(max_length=10, choices=Source.choices, default=Source.AI)
+    model_name = models.CharField(max_length=100, blank=True)  # Empty for the offline fallback
+    prompt_version = models.CharField(max_length=50, blank=True)
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    output_tokens = models.PositiveIntegerField(null=True, blank=True)
+
+    country = models.CharField(max_length=100, blank=True)
+    state = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    pincode = models.CharField(max_length=20, blank=True)
+    language = models.CharField(max_length=50, blank=True)
     keywords = models.JSONField(default=list)
-    sentiment = models.FloatField(null=True)
+    sentiment = models.FloatField(null=True, blank=True)
     category_confidence = models.JSONField(default=dict)
-    summary = models.TextField()
-    analyzed_at = models.DateTimeField(auto_now=True)
+    summary = models.TextField(blank=True)
+    legal_sections = models.JSONField(default=list)
+    sanction_recommendations = models.JSONField(default=list)
+    filing_viability = models.JSONField(default=dict)
+    filing_authorities = models.JSONField(default=list)
+    next_steps = models.JSONField(default=list)  # Ordered actionable steps
+    evidence_priority = models.JSONField(default=list)  # Evidence items ranked
+    timeline_estimate = models.CharField(max_length=200, blank=True)  # Indicative timeline summary
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-version']
+        constraints = [
+            models.UniqueConstraint(fields=['case', 'version'], name='caseanalysisresult_case_version_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Analysis v{self.version} for case {self.case_id}"
+
+class CaseKeyword(models.Model):
+    """One keyword of a case's latest analysis, for facet counts and ``?keyword=``.
+
+    Rewritten with every analysis run (see ``cases.facets.sync_case_terms``).
+    """
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='keyword_entries')
+    keyword = models.CharField(max_length=100)  # Lowercased, whitespace collapsed
+
+    class Meta:
+        constraints = [
+            # Leading on keyword so facet GROUP BYs and filters read only the index
+            models.UniqueConstraint(fields=['keyword', 'case'], name='casekeyword_keyword_case_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.keyword} ({self.case_id})"
+
+class CaseLegalSection(models.Model):
+    """One legal section cited by a case's latest analysis, e.g. "IT Act 66D"."""
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='legal_section_entries')
+    section = models.CharField(max_length=200)  # Whitespace collapsed, original case
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['section', 'case'], name='caselegalsection_section_case_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.section} ({self.case_id})"
+
+class CaseStatsDaily(models.Model):
+    """Number of cases created on ``day`` (UTC) per status/category/priority.
+
+    Kept current by the Case signals in ``cases.stats``; rebuild with
+    ``manage.py rebuild_case_stats``. ``GET /api/cases/stats/`` reads only
+    this table.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    category = models.CharField(max_length=50)
+    priority = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status', 'category', 'priority'], name='casestatsdaily_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}/{self.category}/{self.priority}: {self.count}"
+
+class CaseSimilarityVector(models.Model):
+    """TF-IDF vector of a case analyzed since the on-disk similarity index was built.
+
+    ``cases.similarity`` reads these on top of the memory-mapped snapshot;
+    ``manage.py build_similarity_index`` folds them into a new snapshot and
+    deletes them.
+    """
+    case = models.OneToOneField(Case, on_delete=models.CASCADE, primary_key=True, related_name='similarity_vector')
+    indices = models.BinaryField()  # int32 hashed feature ids
+    weights = models.BinaryField()  # float32, L2-normalized
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Similarity vector for case {self.case_id}"
+
+class CaseSearchDocument(models.Model):
+    """Denormalized text of a case for full-text search (see ``cases.search``).
+
+    Kept in step with the case by ``cases.search.index_case``; the
+    vendor-specific full-text index over these columns is created in
+    migration 0016.
+    """
+    case = models.OneToOneField(Case, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.TextField(blank=True)
+    body = models.TextField(blank=True)  # description, motive, remarks_notes
+    analysis = models.TextField(blank=True)  # latest analysis summary and keywords
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for case {self.case_id}"
 
 class Comment(models.Model):
     case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='comments')
@@ -201,4 +320,60 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class AnalysisJob(models.Model):
+    """Durable queue entry for a background case analysis.
+
+    Rows are claimed by ``manage.py run_analysis_workers`` with
+    ``SELECT ... FOR UPDATE SKIP LOCKED``; a job whose worker died is picked up
+    again once its lease (``locked_at``) expires.
+    """
+    class State(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='analysis_jobs')
+    batch_id = models.UUIDField(null=True, blank=True, db_index=True)  # Shared by jobs queued via analyze_batch
+    state = models.CharField(max_length=20, choices=State.choices, default=State.QUEUED)
+    options = models.JSONField(default=dict, blank=True)  # {country, state, city, pincode, language, files_summary}
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='analysis_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['state', 'run_after'], name='analysisjob_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"AnalysisJob {self.pk} ({self.state}) for case {self.case_id}"
+
+
+class AnalysisCacheEntry(models.Model):
+    """Stored analysis result for the ``db`` analysis cache backend."""
+    key = models.CharField(max_length=64, unique=True)  # sha256 of the normalized prompt inputs
+    payload = models.JSONField(default=dict)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CaseCursorPagination(CursorPagination):
+    """Keyset pagination for the case list, ordered newest first.
+
+    Opt-in so existing clients that expect a plain JSON array keep working:
+    pagination only kicks in when the request carries ``cursor`` or
+    ``page_size``. The cursor is keyed on ``created_at`` with ``id`` as the
+    tie-breaker, so each page is an index range scan instead of an OFFSET.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,71 @@
+"""EXPLAIN checks for the query shapes behind ``GET /api/cases/``.
+
+Used by the test suite (``cases.tests.CaseQueryPlanTests``) and by
+``manage.py explain_case_queries``, which runs the same checks against a real
+database. A plan fails when it reads the whole ``cases_case`` table or does
+not use one of the indexes the query was designed for.
+"""
+import re
+
+from django.db import connection, transaction
+
+from .filters import apply_case_filters
+from .models import Case
+from .pagination import CaseCursorPagination
+
+# Plan fragments that mean "read the whole cases table"
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (cases_case|case)\b(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on cases_case\b'),
+    'mysql': re.compile(r'"access_type":\s*"ALL"'),
+}
+
+OWNER_INDEX = 'case_owner_recent_idx'
+STATUS_INDEX = 'case_status_cat_recent_idx'
+
+
+def is_supported():
+    return connection.vendor in FULL_SCAN_PATTERNS
+
+
+def case_list_queries(user_id):
+    """``{name: (queryset, acceptable index names)}``, each limited to one list page."""
+    page = CaseCursorPagination.page_size
+    base = Case.objects.all()
+    owned = base.filter(created_by_id=user_id)
+    return {
+        'staff list': (base.order_by('-created_at')[:page], {'case_recent_idx'}),
+        'owner list': (owned.order_by('-created_at')[:page], {OWNER_INDEX}),
+        'status+category': (
+            apply_case_filters(base, {'status': 'open', 'category': 'fraud'}).order_by('-created_at')[:page],
+            {STATUS_INDEX},
+        ),
+        'owner+status': (
+            apply_case_filters(owned, {'status': 'open'}).order_by('-created_at')[:page],
+            {OWNER_INDEX, STATUS_INDEX},
+        ),
+        'case_id search': (apply_case_filters(base, {'case_id': 'case-0000abcd'}), {'case_case_id_upper_idx'}),
+    }
+
+
+def explain(queryset):
+    vendor = connection.vendor
+    if vendor == 'mysql':
+        return queryset.explain(format='json')
+    if vendor == 'postgresql':
+        # On small tables the planner prefers seq scans regardless of
+        # indexes; disabling them checks that an index path exists at all.
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+    return queryset.explain()
+
+
+def plan_problem(plan, indexes):
+    """Why ``plan`` is unacceptable, or None when it uses one of ``indexes``."""
+    if FULL_SCAN_PATTERNS[connection.vendor].search(plan):
+        return 'full table scan'
+    if not any(index in plan for index in indexes):
+        return f"uses none of {', '.join(sorted(indexes))}"
+    return None
@@ -0,0 +1,232 @@
+"""Full-text search over cases (``GET /api/cases/?q=``).
+
+Each case has one ``CaseSearchDocument`` row holding its searchable text:
+``title``, ``body`` (description, motive, remarks_notes) and ``analysis``
+(the latest analysis summary and keywords). Migration 0016 puts a real
+full-text index over it for the database in use:
+
+* SQLite     - an external-content FTS5 table kept in sync by triggers
+* MySQL      - a ``FULLTEXT`` index on the three columns
+* PostgreSQL - a GIN index on a weighted ``tsvector`` expression
+
+Rows are rewritten by ``index_case`` when a case is saved (``signals.py``),
+by ``index_analysis`` when a new analysis lands, and by ``index_cases`` after
+bulk inserts, which skip signals. Databases without a full-text index (or a
+SQLite build without FTS5) fall back to ``LIKE`` matching.
+"""
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import CaseSearchDocument
+
+# Case columns that feed the document; saves touching none of them skip reindexing
+SEARCH_FIELDS = frozenset({'title', 'description', 'motive', 'remarks_notes'})
+MAX_TERMS = 10
+SNIPPET_WORDS = 24
+HIGHLIGHT = ('**', '**')  # wraps matched words in snippets
+
+DOCUMENT_TABLE = CaseSearchDocument._meta.db_table
+SQLITE_FTS_TABLE = f'{DOCUMENT_TABLE}_fts'
+# Must match the expression indexed in migration 0016 for the GIN index to be used
+PG_VECTOR = (
+    "setweight(to_tsvector('english', {t}.title), 'A') || "
+    "setweight(to_tsvector('english', {t}.body), 'B') || "
+    "setweight(to_tsvector('english', {t}.analysis), 'C')"
+)
+
+SearchHit = namedtuple('SearchHit', 'case_id rank snippet')
+
+_TERM_RE = re.compile(r'\w+')
+
+
+def document_values(title, description, motive, remarks_notes, summary='', keywords=None):
+    """Return the CaseSearchDocument column values for one case."""
+    return {
+        'title': title or '',
+        'body': '\n'.join(part for part in (description, motive, remarks_notes) if part),
+        'analysis': analysis_text(summary, keywords),
+    }
+
+
+def analysis_text(summary, keywords):
+    keywords = ' '.join(str(k) for k in (keywords or []) if k)
+    return '\n'.join(part for part in (summary, keywords) if part)
+
+
+def index_case(case):
+    """Create or refresh the search document for ``case``."""
+    result = case.latest_analysis if case.latest_analysis_id else None
+    values = document_values(
+        case.title, case.description, case.motive, case.remarks_notes,
+        result.summary if result else '', result.keywords if result else None,
+    )
+    CaseSearchDocument.objects.update_or_create(case_id=case.pk, defaults=values)
+
+
+def index_analysis(case, result):
+    """Refresh only the analysis text of ``case``'s document after a new run."""
+    updated = CaseSearchDocument.objects.filter(case_id=case.pk).update(
+        analysis=analysis_text(result.summary, result.keywords)
+    )
+    if not updated:
+        index_case(case)
+
+
+def index_cases(queryset):
+    """Rebuild the search documents for every case in ``queryset`` in one pass.
+
+    Used after ``bulk_create`` and by ``manage.py rebuild_search_index``.
+    Returns the number of documents written.
+    """
+    rows = queryset.order_by().values_list(
+        'id', 'title', 'description', 'motive', 'remarks_notes',
+        'latest_analysis__summary', 'latest_analysis__keywords',
+    )
+    documents = [
+        CaseSearchDocument(case_id=pk, **document_values(*values))
+        for pk, *values in rows
+    ]
+    if not documents:
+        return 0
+    with transaction.atomic():
+        CaseSearchDocument.objects.filter(case_id__in=[d.case_id for d in documents]).delete()
+        CaseSearchDocument.objects.bulk_create(documents)
+    return len(documents)
+
+
+def parse_terms(query):
+    """Split a user query into at most MAX_TERMS plain word terms."""
+    return _TERM_RE.findall(query or '')[:MAX_TERMS]
+
+
+def make_snippet(text, terms, words=SNIPPET_WORDS):
+    """Return about ``words`` words of ``text`` around the first match, matches highlighted."""
+    tokens = (text or '').split()
+    if not tokens:
+        return ''
+    prefixes = tuple(t.lower() for t in terms)
+
+    def matches(token):
+        return any(word.lower().startswith(prefixes) for word in _TERM_RE.findall(token))
+
+    first = next((i for i, token in enumerate(tokens) if matches(token)), 0)
+    start = max(0, first - words // 3)
+    window = tokens[start:start + words]
+    parts = [f'{HIGHLIGHT[0]}{t}{HIGHLIGHT[1]}' if matches(t) else t for t in window]
+    snippet = ' '.join(parts)
+    if start > 0:
+        snippet = '… ' + snippet
+    if start + words < len(tokens):
+        snippet += ' …'
+    return snippet
+
+
+def _fts_available():
+    if connection.vendor == 'sqlite':
+        return SQLITE_FTS_TABLE in connection.introspection.table_names()
+    return connection.vendor in ('mysql', 'postgresql')
+
+
+def _visible_ids(queryset):
+    return queryset.order_by().values('pk').query.sql_with_params()
+
+
+def _search_sqlite(terms, visible_sql, visible_params, limit, offset):
+    match = ' '.join(f'"{t}"*' for t in terms)
+    fts = SQLITE_FTS_TABLE
+    sql = (
+        # bm25 weights: title, body, analysis. Lower is better, so negate for rank
+        f"SELECT rowid, -bm25({fts}, 10.0, 1.0, 3.0) AS rank, "
+        f"snippet({fts}, -1, %s, %s, '…', %s) "
+        f"FROM {fts} WHERE {fts} MATCH %s AND rowid IN ({visible_sql}) "
+        f"ORDER BY rank DESC LIMIT %s OFFSET %s"
+    )
+    params = [HIGHLIGHT[0], HIGHLIGHT[1], SNIPPET_WORDS, match, *visible_params, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [SearchHit(pk, float(rank), snippet) for pk, rank, snippet in cursor.fetchall()]
+
+
+def _search_mysql(terms, visible_sql, visible_params, limit, offset):
+    t = DOCUMENT_TABLE
+    match = f"MATCH({t}.title, {t}.body, {t}.analysis)"
+    # Boolean mode requires every term; natural language mode gives the relevance score
+    sql = (
+        f"SELECT {t}.case_id, {match} AGAINST (%s IN NATURAL LANGUAGE MODE) AS score, "
+        f"{t}.title, {t}.body, {t}.analysis FROM {t} "
+        f"WHERE {match} AGAINST (%s IN BOOLEAN MODE) AND {t}.case_id IN ({visible_sql}) "
+        f"ORDER BY score DESC LIMIT %s OFFSET %s"
+    )
+    params = [' '.join(terms), ' '.join(f'+{term}*' for term in terms), *visible_params, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            SearchHit(pk, float(score), make_snippet('\n'.join((title, body, analysis)), terms))
+            for pk, score, title, body, analysis in cursor.fetchall()
+        ]
+
+
+def _search_postgresql(terms, visible_sql, visible_params, limit, offset):
+    t = DOCUMENT_TABLE
+    vector = PG_VECTOR.format(t=t)
+    options = f'StartSel={HIGHLIGHT[0]}, StopSel={HIGHLIGHT[1]}, MaxWords={SNIPPET_WORDS}, MinWords=8'
+    sql = (
+        f"SELECT {t}.case_id, ts_rank({vector}, q.query) AS rank, "
+        f"ts_headline('english', {t}.title || ' ' || {t}.body || ' ' || {t}.analysis, q.query, %s) "
+        f"FROM {t}, to_tsquery('english', %s) AS q(query) "
+        f"WHERE {vector} @@ q.query AND {t}.case_id IN ({visible_sql}) "
+        f"ORDER BY rank DESC LIMIT %s OFFSET %s"
+    )
+    params = [options, ' & '.join(f'{term}:*' for term in terms), *visible_params, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [SearchHit(pk, float(rank), snippet) for pk, rank, snippet in cursor.fetchall()]
+
+
+def _search_like(terms, queryset, limit, offset):
+    # Pages follow case_id (newest first); only the hits within a page are ranked
+    documents = CaseSearchDocument.objects.filter(case__in=queryset.order_by().values('pk'))
+    for term in terms:
+        documents = documents.filter(
+            Q(title__icontains=term) | Q(body__icontains=term) | Q(analysis__icontains=term)
+        )
+    hits = []
+    for pk, title, body, analysis in documents.order_by('-case_id').values_list(
+        'case_id', 'title', 'body', 'analysis'
+    )[offset:offset + limit]:
+        text = '\n'.join((title, body, analysis))
+        rank = sum(text.lower().count(term.lower()) for term in terms) + 2 * sum(
+            title.lower().count(term.lower()) for term in terms
+        )
+        hits.append(SearchHit(pk, float(rank), make_snippet(text, terms)))
+    hits.sort(key=lambda hit: hit.rank, reverse=True)
+    return hits
+
+
+_BACKENDS = {
+    'sqlite': _search_sqlite,
+    'mysql': _search_mysql,
+    'postgresql': _search_postgresql,
+}
+
+
+def search_cases(queryset, query, limit=None, offset=0):
+    """Return up to ``limit`` SearchHits for ``query`` among the cases in ``queryset``, best first.
+
+    Every term must match (as a word prefix) somewhere in the case's title,
+    body or analysis text. ``offset`` skips that many of the best hits, so
+    results past ``CASE_SEARCH_MAX_RESULTS`` can be read page by page.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return []
+    if limit is None:
+        limit = getattr(settings, 'CASE_SEARCH_MAX_RESULTS', 100)
+    if not _fts_available():
+        return _search_like(terms, queryset, limit, offset)
+    visible_sql, visible_params = _visible_ids(queryset)
+    return _BACKENDS[connection.vendor](terms, visible_sql, list(visible_params), limit, offset)
@@ -1,5 +1,8 @@
+import copy
+
 from rest_framework import serializers
-from .models import Case, Document, Analysis, Comment
+from django.db.models import Prefetch
+from .models import Case, Document, Comment, AnalysisJob, CaseAnalysisResult
 
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,10 +11,13 @@ class DocumentSerializer(serializers.ModelSerializer):
         read_only_fields = ('uploaded_by', 'uploaded_at')
 
 class AnalysisSerializer(serializers.ModelSerializer):
+    """Legacy ``analysis`` payload, now read from the case's latest CaseAnalysisResult."""
+    analyzed_at = serializers.DateTimeField(source='created_at', read_only=True)
+
     class Meta:
-        model = Analysis
-        fields = ('keywords', 'sentiment', 'category_confidence', 'summary', 'analyzed_at')
-        read_only_fields = ('analyzed_at',)
+        model = CaseAnalysisResult
+        fields = ('keywords', 'sentiment', 'category_confidence', 'summary', 'analysis_source', 'analyzed_at')
+        read_only_fields = fields
 
 class CommentSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
@@ -21,12 +27,50 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ('id', 'content', 'user', 'user_name', 'created_at', 'updated_at')
         read_only_fields = ('user', 'created_at', 'updated_at')
 
+class LatestAnalysisField(serializers.ReadOnlyField):
+    """Read one attribute of ``case.latest_analysis``, or its empty value before the first run.
+
+    The empty value is the model field's default unless ``empty`` is given.
+    """
+
+    def __init__(self, attr, empty=serializers.empty, **kwargs):
+        self.attr = attr
+        self.empty = empty
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        result = instance.latest_analysis
+        if result is None:
+            if self.empty is not serializers.empty:
+                return self.empty
+            return copy.copy(CaseAnalysisResult._meta.get_field(self.attr).get_default())
+        return getattr(result, self.attr)
+
 class CaseSerializer(serializers.ModelSerializer):
     documents = DocumentSerializer(many=True, read_only=True)
-    analysis = AnalysisSerializer(read_only=True)
+    analysis = AnalysisSerializer(source='latest_analysis', read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     assigned_to_name = serializers.CharField(source='assigned_to.get_full_name', read_only=True)
+    # Latest CaseAnalysisResult, flattened under the old inline column names
+    analysis_keywords = LatestAnalysisField('keywords')
+    analysis_sentiment = LatestAnalysisField('sentiment')
+    analysis_category_confidence = LatestAnalysisField('category_confidence')
+    analysis_summary = LatestAnalysisField('summary')
+    analysis_country = LatestAnalysisField('country')
+    analysis_state = LatestAnalysisField('state')
+    analysis_city = LatestAnalysisField('city')
+    analysis_pincode = LatestAnalysisField('pincode')
+    analysis_language = LatestAnalysisField('language')
+    analysis_legal_sections = LatestAnalysisField('legal_sections')
+    analysis_sanction_recommendations = LatestAnalysisField('sanction_recommendations')
+    analysis_filing_viability = LatestAnalysisField('filing_viability')
+    analysis_filing_authorities = LatestAnalysisField('filing_authorities')
+    analysis_next_steps = LatestAnalysisField('next_steps')
+    analysis_evidence_priority = LatestAnalysisField('evidence_priority')
+    analysis_timeline_estimate = LatestAnalysisField('timeline_estimate')
+    # 'local' until the queued model run replaces the instant local analysis
+    analysis_source = LatestAnalysisField('analysis_source', empty='')
 
     class Meta:
         model = Case
@@ -36,12 +80,13 @@ class CaseSerializer(serializers.ModelSerializer):
             'estimated_value', 'incident_date', 'confidential', 'tags',
             'created_by', 'created_by_name', 'assigned_to', 'assigned_to_name',
             'created_at', 'updated_at', 'closed_at', 'documents', 'analysis', 'comments',
-            # Expose inline analysis fields stored on the case
+            # Latest analysis result
             'analysis_keywords', 'analysis_sentiment', 'analysis_category_confidence', 'analysis_summary',
             'analysis_country', 'analysis_state', 'analysis_city', 'analysis_pincode',
             'analysis_language', 'analysis_legal_sections', 'analysis_sanction_recommendations',
             'analysis_filing_viability', 'analysis_filing_authorities',
-            'analysis_next_steps', 'analysis_evidence_priority', 'analysis_timeline_estimate', 'analyzed_at',
+            'analysis_next_steps', 'analysis_evidence_priority', 'analysis_timeline_estimate', 'analysis_source',
+            'analyzed_at',
             # Robbery / prior extended fields
             'victim_info', 'suspect_info', 'incident_sequence', 'stolen_items', 'evidence_collected',
             'witnesses_info', 'medical_info', 'apprehension_info', 'follow_up_actions',
@@ -62,4 +107,95 @@ class CaseSerializer(serializers.ModelSerializer):
         ):
             if key in data:
                 obj[key] = data.get(key)
-        return obj
\ No newline at end of file
+        return obj
+
+class CaseListSerializer(CaseSerializer):
+    """Slim case representation used by the list endpoint.
+
+    Only ``default_fields`` are sent unless the client picks its own columns
+    with ``?fields=a,b``. Nested relations (documents, comments, analysis) are
+    left out unless named in ``?expand=``. ``optimize_queryset`` applies the
+    same selection to the queryset so unused columns are never fetched.
+    """
+    default_fields = (
+        'id', 'case_id', 'title', 'category', 'status', 'priority', 'severity',
+        'created_by', 'assigned_to', 'created_at', 'updated_at', 'closed_at', 'analyzed_at',
+    )
+    expandable_fields = ('documents', 'comments', 'analysis')
+
+    # Serializer-only fields mapped to the model columns they read
+    related_columns = {
+        'created_by_name': ('created_by__first_name', 'created_by__last_name'),
+        'assigned_to_name': ('assigned_to__first_name', 'assigned_to__last_name'),
+        'analysis': (
+            'latest_analysis__keywords', 'latest_analysis__sentiment', 'latest_analysis__category_confidence',
+            'latest_analysis__summary', 'latest_analysis__analysis_source', 'latest_analysis__created_at',
+        ),
+        **{
+            name: (f'latest_analysis__{field.attr}',)
+            for name, field in CaseSerializer._declared_fields.items()
+            if isinstance(field, LatestAnalysisField)
+        },
+    }
+
+    class Meta(CaseSerializer.Meta):
+        pass
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = self.requested_fields(self.context.get('request'))
+        for name in list(self.fields):
+            if name not in wanted:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Return the set of field names the request asked for."""
+        params = getattr(request, 'query_params', {}) if request is not None else {}
+        available = set(cls.Meta.fields)
+        fields = {f.strip() for f in (params.get('fields') or '').split(',') if f.strip()}
+        wanted = (fields & available) - set(cls.expandable_fields) if fields else set(cls.default_fields)
+        expand = {f.strip() for f in (params.get('expand') or '').split(',') if f.strip()}
+        wanted |= expand & set(cls.expandable_fields)
+        wanted.add('id')
+        return wanted
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        """Restrict ``queryset`` to the columns and relations the response needs."""
+        wanted = cls.requested_fields(request)
+        columns = {'id', 'created_at'}
+        select = []
+        for name in wanted:
+            if name in cls.related_columns:
+                columns.update(cls.related_columns[name])
+                select.append(cls.related_columns[name][0].split('__')[0])
+            elif name not in cls.expandable_fields:
+                columns.add(name)
+        queryset = queryset.select_related(*select).only(*columns) if select else queryset.only(*columns)
+        if 'documents' in wanted:
+            queryset = queryset.prefetch_related('documents')
+        if 'comments' in wanted:
+            queryset = queryset.prefetch_related(
+                Prefetch('comments', queryset=Comment.objects.select_related('user'))
+            )
+        return queryset
+
+
+class CaseAnalysisResultSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CaseAnalysisResult
+        exclude = ('case',)
+        read_only_fields = [f.name for f in CaseAnalysisResult._meta.fields if f.name != 'case']
+
+
+class AnalysisJobSerializer(serializers.ModelSerializer):
+    case_id = serializers.CharField(source='case.case_id', read_only=True)
+
+    class Meta:
+        model = AnalysisJob
+        fields = (
+            'id', 'case', 'case_id', 'batch_id', 'state', 'attempts', 'max_attempts', 'error',
+            'run_after', 'started_at', 'finished_at', 'created_at', 'updated_at',
+        )
+        read_only_fields = fields
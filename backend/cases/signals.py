@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import facets, search, stats
+from .models import Case
+
+
+@receiver(post_save, sender=Case)
+def index_case_for_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not search.SEARCH_FIELDS.intersection(update_fields):
+        return  # e.g. close() only touches status/closed_at
+    search.index_case(instance)
+
+
+@receiver(post_save, sender=Case)
+@receiver(post_delete, sender=Case)
+def invalidate_case_facets(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(facets.invalidate)
+
+
+@receiver(post_init, sender=Case)
+def remember_stats_key(sender, instance, **kwargs):
+    # The counter the case is in right now, so post_save can move it
+    instance._stats_key = stats.stats_key(instance)
+
+
+@receiver(post_save, sender=Case)
+def update_case_stats(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    new_key = stats.stats_key(instance)
+    if created:
+        stats.apply_deltas({new_key: 1})
+    elif update_fields is None or stats.KEY_FIELDS_SET.intersection(update_fields):
+        stats.record_moved(getattr(instance, '_stats_key', None), new_key)
+    instance._stats_key = new_key
+
+
+@receiver(post_delete, sender=Case)
+def remove_case_stats(sender, instance, **kwargs):
+    key = getattr(instance, '_stats_key', None) or stats.stats_key(instance)
+    stats.apply_deltas({key: -1})
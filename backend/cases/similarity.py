@@ -0,0 +1,352 @@
+"""Similar-case lookup (``GET /api/cases/{id}/similar/``) over hashed TF-IDF vectors.
+
+A case's text (title, description and latest analysis keywords) is split
+into word unigrams and bigrams hashed into ``CASE_SIMILARITY_FEATURES``
+buckets, so there is no vocabulary to refit as cases arrive. Weights are
+sublinear tf x idf, L2-normalized, so cosine similarity is a dot product.
+
+Storage:
+
+* ``manage.py build_similarity_index`` writes a snapshot of every case to
+  ``CASE_SIMILARITY_INDEX_DIR`` as CSR arrays (``.npy``) plus the idf
+  vector. Readers open them with ``np.load(mmap_mode='r')``: nothing is
+  parsed on load and worker processes share the pages through the OS cache.
+* Each analysis run stores the case's vector as a ``CaseSimilarityVector``
+  row, weighted with the snapshot's idf. Every process picks new rows up with
+  one indexed query per lookup; the next build folds them into the snapshot.
+
+The snapshot also stores a column-major (inverted) copy, so a top-k query
+only reads the posting lists of the query's own features, then takes the
+best rows with ``argpartition``.
+
+NumPy and SciPy are imported lazily; without them ``similarity_available()``
+is False, analysis runs skip the vector and the endpoint answers 503.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import zlib
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CaseSimilarityVector
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = 'CURRENT'  # names the live snapshot directory
+STOP_WORDS = frozenset(
+    'a an and are as at be been but by for from had has have he her his i in is it its of on or '
+    'she that the their they this to was were which who will with'.split()
+)
+_TOKEN_RE = re.compile(r'\w+')
+
+_UNSET = object()
+_libs = _UNSET
+_lock = threading.RLock()
+_index = None
+
+
+def get_libs():
+    """Return ``(numpy, scipy.sparse)``, or None if they are not installed."""
+    global _libs
+    if _libs is _UNSET:
+        with _lock:
+            if _libs is _UNSET:
+                try:
+                    import numpy
+                    from scipy import sparse
+                    _libs = (numpy, sparse)
+                except ImportError:
+                    _libs = None
+    return _libs
+
+
+def similarity_available():
+    return get_libs() is not None
+
+
+def feature_count():
+    return int(getattr(settings, 'CASE_SIMILARITY_FEATURES', 2 ** 20))
+
+
+def index_dir():
+    return str(settings.CASE_SIMILARITY_INDEX_DIR)
+
+
+def case_text(title, description, keywords=None):
+    return '\n'.join((title or '', description or '', ' '.join(str(k) for k in keywords or [] if k)))
+
+
+def term_counts(text, features):
+    """Counter of hashed feature ids for the word unigrams and bigrams of ``text``."""
+    words = [w for w in _TOKEN_RE.findall(text.lower()) if len(w) > 1 and w not in STOP_WORDS]
+    terms = words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+    # crc32 rather than hash(): ids must agree across processes and restarts
+    return Counter(zlib.crc32(term.encode('utf-8')) % features for term in terms)
+
+
+def vectorize(text, idf=None):
+    """Return ``(indices, weights)`` for ``text``: sorted int32 ids, L2-normalized float32 weights."""
+    np, _ = get_libs()
+    counts = term_counts(text, feature_count() if idf is None else len(idf))
+    indices = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+    weights = 1.0 + np.log(np.fromiter((counts[i] for i in indices), dtype=np.float32, count=len(counts)))
+    if idf is not None:
+        weights *= idf[indices]
+    norm = np.sqrt(np.dot(weights, weights))
+    if norm:
+        weights /= norm
+    return indices, weights.astype(np.float32)
+
+
+def current_snapshot_name():
+    try:
+        with open(os.path.join(index_dir(), CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class Snapshot:
+    """A memory-mapped index build: row ``i`` of ``matrix`` is case ``case_ids[i]``."""
+
+    def __init__(self, path):
+        np, sparse = get_libs()
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+        self.name = os.path.basename(path)
+        self.case_ids = load('case_ids')  # ascending
+        self.idf = load('idf')
+        self.matrix = sparse.csr_matrix(
+            (load('weights'), load('indices'), load('indptr')),
+            shape=(len(self.case_ids), self.meta['features']),
+            copy=False,
+        )
+        # Column-major copy: the posting list (rows, weights) of every feature
+        self.col_indptr = load('col_indptr')
+        self.col_rows = load('col_rows')
+        self.col_weights = load('col_weights')
+
+    def scores(self, indices, weights):
+        """Dot products of every row with the query ``(indices, weights)``.
+
+        Reads only the query features' posting lists from the column-major
+        copy, so the cost follows how common the query's terms are, not the
+        size of the index.
+        """
+        np, _ = get_libs()
+        starts = self.col_indptr[indices].astype(np.int64)
+        lengths = self.col_indptr[indices + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(len(self.case_ids), dtype=np.float64)
+        # Flat positions of every posting: start of its list + its offset within it
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        contributions = self.col_weights[offsets] * np.repeat(weights, lengths)
+        return np.bincount(self.col_rows[offsets], weights=contributions, minlength=len(self.case_ids))
+
+    def row_of(self, case_id):
+        np, _ = get_libs()
+        i = int(np.searchsorted(self.case_ids, case_id))
+        return i if i < len(self.case_ids) and self.case_ids[i] == case_id else None
+
+    def vector(self, row):
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return self.matrix.indices[start:end], self.matrix.data[start:end]
+
+
+class SimilarityIndex:
+    """The live snapshot plus the vectors stored since it was built."""
+
+    def __init__(self):
+        self.snapshot = None
+        self.delta = {}  # case_id -> (indices, weights)
+        self._delta_seen = None
+        self._delta_matrix = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def idf(self):
+        return self.snapshot.idf if self.snapshot is not None else None
+
+    def refresh(self):
+        """Switch to a newer snapshot if one was built and load vectors stored since the last call."""
+        np, _ = get_libs()
+        with self._refresh_lock:
+            name = current_snapshot_name()
+            if name != (self.snapshot.name if self.snapshot else None):
+                self.snapshot = Snapshot(os.path.join(index_dir(), name)) if name else None
+                self.delta, self._delta_seen, self._delta_matrix = {}, None, None
+            rows = CaseSimilarityVector.objects.all()
+            if self._delta_seen is not None:
+                rows = rows.filter(updated_at__gte=self._delta_seen)
+            for case_id, indices, weights, updated_at in rows.values_list(
+                'case_id', 'indices', 'weights', 'updated_at'
+            ):
+                self.delta[case_id] = (np.frombuffer(indices, dtype=np.int32), np.frombuffer(weights, dtype=np.float32))
+                self._delta_seen = max(self._delta_seen or updated_at, updated_at)
+                self._delta_matrix = None
+        return self
+
+    def delta_matrix(self):
+        """The stored-since-build vectors as ``(case_ids, csr_matrix)``."""
+        np, sparse = get_libs()
+        if self._delta_matrix is None:
+            ids = np.fromiter(self.delta, dtype=np.int64, count=len(self.delta))
+            vectors = [self.delta[i] for i in ids]
+            indptr = np.cumsum([0] + [len(idx) for idx, _ in vectors])
+            matrix = sparse.csr_matrix(
+                (
+                    np.concatenate([w for _, w in vectors]) if vectors else np.zeros(0, np.float32),
+                    np.concatenate([idx for idx, _ in vectors]) if vectors else np.zeros(0, np.int32),
+                    indptr,
+                ),
+                shape=(len(ids), self.features),
+            )
+            self._delta_matrix = (ids, matrix)
+        return self._delta_matrix
+
+    @property
+    def features(self):
+        return self.snapshot.meta['features'] if self.snapshot is not None else feature_count()
+
+    def vector_for(self, case):
+        """The case's stored vector, or one computed from its current text."""
+        if case.pk in self.delta:
+            return self.delta[case.pk]
+        if self.snapshot is not None:
+            row = self.snapshot.row_of(case.pk)
+            if row is not None:
+                return self.snapshot.vector(row)
+        result = case.latest_analysis if case.latest_analysis_id else None
+        return vectorize(case_text(case.title, case.description, result.keywords if result else None), self.idf)
+
+    def most_similar(self, case, limit, allowed_ids=None):
+        """``[(case_id, score)]`` of the ``limit`` cases closest to ``case``, best first.
+
+        ``allowed_ids`` restricts the candidates (e.g. to one owner's cases).
+        """
+        np, _ = get_libs()
+        indices, weights = self.vector_for(case)
+        allowed = None if allowed_ids is None else np.fromiter(allowed_ids, dtype=np.int64)
+
+        delta_ids, delta_matrix = self.delta_matrix()
+        segments = []
+        if len(delta_ids):
+            query = np.zeros(self.features, dtype=np.float32)
+            query[indices] = weights
+            segments.append((delta_ids, delta_matrix.dot(query)))
+        if self.snapshot is not None and len(self.snapshot.case_ids):
+            segments.append((self.snapshot.case_ids, self.snapshot.scores(indices, weights)))
+
+        hits = []
+        for ids, scores in segments:
+            excluded = ids == case.pk
+            if ids is not delta_ids and len(delta_ids):
+                excluded |= np.isin(ids, delta_ids)  # snapshot rows replaced by a newer stored vector
+            if allowed is not None:
+                excluded |= ~np.isin(ids, allowed)
+            scores[excluded] = 0
+            top = min(limit, len(scores))
+            best = np.argpartition(-scores, top - 1)[:top]
+            hits.extend((int(ids[i]), float(scores[i])) for i in best if scores[i] > 0)
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:limit]
+
+
+def get_index():
+    """The process-wide index, refreshed against the snapshot directory and vector table."""
+    global _index
+    with _lock:
+        if _index is None:
+            _index = SimilarityIndex()
+    return _index.refresh()
+
+
+def similar_cases(case, limit=10, allowed_ids=None):
+    return get_index().most_similar(case, limit, allowed_ids)
+
+
+def record_case(case, result):
+    """Store ``case``'s vector after an analysis run. Never raises; the index is optional."""
+    if not similarity_available():
+        return
+    try:
+        indices, weights = vectorize(case_text(case.title, case.description, result.keywords), get_index().idf)
+        CaseSimilarityVector.objects.update_or_create(
+            case_id=case.pk,
+            defaults={
+                'indices': indices.tobytes(),
+                'weights': weights.tobytes(),
+                'updated_at': timezone.now(),
+            },
+        )
+    except Exception:
+        logger.exception("Could not store the similarity vector for case %s", case.pk)
+
+
+def build_snapshot(rows):
+    """Write a new snapshot from ``(case_id, title, description, keywords)`` rows and make it live.
+
+    ``rows`` must be in ascending ``case_id`` order. Returns ``(name, rows_indexed)``.
+    """
+    np, sparse = get_libs()
+    features = feature_count()
+    case_ids, indptr, all_indices, all_counts = [], [0], [], []
+    for case_id, title, description, keywords in rows:
+        counts = term_counts(case_text(title, description, keywords), features)
+        indices = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+        case_ids.append(case_id)
+        all_indices.append(indices)
+        all_counts.append(np.fromiter((counts[i] for i in indices), dtype=np.float32, count=len(counts)))
+        indptr.append(indptr[-1] + len(indices))
+
+    n = len(case_ids)
+    indices = np.concatenate(all_indices) if all_indices else np.zeros(0, np.int32)
+    weights = 1.0 + np.log(np.concatenate(all_counts)) if all_counts else np.zeros(0, np.float32)
+    df = np.bincount(indices, minlength=features)
+    idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+    weights = (weights * idf[indices]).astype(np.float32)
+    row_of = np.repeat(np.arange(n), np.diff(indptr))
+    norms = np.sqrt(np.bincount(row_of, weights=weights.astype(np.float64) ** 2, minlength=n))
+    norms[norms == 0] = 1
+    weights /= norms[row_of].astype(np.float32)
+    # One index dtype for indices and indptr so scipy wraps the mmaps without copying
+    index_dtype = np.int32 if indptr[-1] < 2 ** 31 else np.int64
+
+    root = index_dir()
+    name = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    np.save(os.path.join(path, 'case_ids.npy'), np.asarray(case_ids, dtype=np.int64))
+    np.save(os.path.join(path, 'indptr.npy'), np.asarray(indptr, dtype=index_dtype))
+    np.save(os.path.join(path, 'indices.npy'), indices.astype(index_dtype))
+    np.save(os.path.join(path, 'weights.npy'), weights)
+    np.save(os.path.join(path, 'idf.npy'), idf)
+    columns = sparse.csr_matrix((weights, indices, indptr), shape=(n, features)).tocsc()
+    np.save(os.path.join(path, 'col_indptr.npy'), columns.indptr.astype(index_dtype))
+    np.save(os.path.join(path, 'col_rows.npy'), columns.indices.astype(index_dtype))
+    np.save(os.path.join(path, 'col_weights.npy'), columns.data.astype(np.float32))
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'features': features, 'cases': n, 'built_at': timezone.now().isoformat()}, f)
+
+    previous = current_snapshot_name()
+    tmp = os.path.join(root, CURRENT_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+
+    # Keep the previous snapshot for processes still reading it; drop older ones
+    for entry in os.listdir(root):
+        if entry not in (name, previous, CURRENT_FILE) and os.path.isdir(os.path.join(root, entry)):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return name, n
@@ -0,0 +1,128 @@
+"""Single-flight execution for identical concurrent analyses.
+
+Double clicks on ``analyze`` and duplicate ``analyze_upload`` submissions
+arrive within the same second, before the first result reaches the analysis
+cache. ``do(key, fn)`` lets only the first caller for ``key`` run ``fn``;
+everyone else arriving while it runs waits and gets a copy of its result.
+
+Threads of one process wait on an in-memory event. Other processes see a
+``cache.add`` lock and poll for the result the leader leaves in the cache for
+``RESULT_TTL`` seconds (callers arriving within that window reuse it too);
+this needs a shared ``CACHE_BACKEND`` to span processes. A caller that waits
+longer than ``WAIT_TIMEOUT``, or whose leader failed, runs ``fn`` itself. Configured by ``settings.ANALYSIS_SINGLE_FLIGHT``.
+"""
+import copy
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+POLL_INTERVAL = 0.05
+
+
+class FlightStats:
+    """Thread-safe counters for the running process."""
+
+    FIELDS = ('leaders', 'deduplicated_local', 'deduplicated_shared', 'timeouts')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for name in self.FIELDS:
+                setattr(self, name, 0)
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            values = {name: getattr(self, name) for name in self.FIELDS}
+        values['deduplicated'] = values['deduplicated_local'] + values['deduplicated_shared']
+        return values
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.result = None
+
+
+stats = FlightStats()
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, 'ANALYSIS_SINGLE_FLIGHT', {}) or {}
+
+
+def do(key, fn):
+    """Return ``fn()``, sharing one execution among concurrent callers with the same ``key``."""
+    config = _config()
+    if not config.get('ENABLED', True):
+        return fn()
+    wait_timeout = config.get('WAIT_TIMEOUT', 90)
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+    if not leader:
+        if call.done.wait(wait_timeout) and call.ok:
+            stats.incr('deduplicated_local')
+            return copy.deepcopy(call.result)
+        if not call.done.is_set():
+            stats.incr('timeouts')
+        return fn()
+    try:
+        call.result = _do_shared(key, fn, config)
+        call.ok = True
+        return call.result
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+def _do_shared(key, fn, config):
+    """Run ``fn`` under a cache lock, or wait for the process that holds it."""
+    cache = caches[config.get('CACHE', 'default')]
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    lock_key, result_key = f'singleflight:{digest}:lock', f'singleflight:{digest}:result'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + config.get('WAIT_TIMEOUT', 90)
+    while not cache.add(lock_key, token, timeout=config.get('LOCK_TIMEOUT', 120)):
+        result = cache.get(result_key)
+        if result is not None:
+            stats.incr('deduplicated_shared')
+            return result
+        if time.monotonic() >= deadline:
+            stats.incr('timeouts')
+            return fn()
+        time.sleep(POLL_INTERVAL)
+    try:
+        # A leader may have finished between our last poll and taking the lock
+        result = cache.get(result_key)
+        if result is not None:
+            stats.incr('deduplicated_shared')
+            return result
+        stats.incr('leaders')
+        result = fn()
+        cache.set(result_key, result, timeout=config.get('RESULT_TTL', 10))
+        return result
+    finally:
+        # The lock may have expired and been taken over; only drop our own
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def get_stats():
+    return {'enabled': _config().get('ENABLED', True), **stats.as_dict()}
@@ -0,0 +1,104 @@
+"""Pre-aggregated case counts for the admin dashboard (``GET /api/cases/stats/``).
+
+``CaseStatsDaily`` holds one counter per (creation day, status, category,
+priority). The Case signals in ``signals.py`` move a case between counters
+as it is created, changes status (``close``, ``approve``, edits) or is
+deleted; bulk imports add theirs explicitly. Reads therefore scale with the
+number of days in range rather than the number of cases.
+
+Days are UTC calendar days of ``Case.created_at``.
+"""
+import datetime
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+
+from .models import Case, CaseStatsDaily
+
+KEY_FIELDS = ('status', 'category', 'priority')
+KEY_FIELDS_SET = frozenset(KEY_FIELDS)
+
+
+def stats_key(case):
+    """``(day, status, category, priority)`` for ``case``; None if any part is not loaded.
+
+    Reads ``__dict__`` so deferred fields (``.only()`` querysets) are never
+    fetched just to compute the key.
+    """
+    values = case.__dict__
+    created_at = values.get('created_at')
+    if created_at is None or any(name not in values for name in KEY_FIELDS):
+        return None
+    return (created_at.astimezone(datetime.timezone.utc).date(), *(values[name] for name in KEY_FIELDS))
+
+
+def apply_deltas(deltas):
+    """Add ``{key: delta}`` to the counters, creating rows as needed."""
+    # Sorted so concurrent writers lock rows in the same order
+    for key, delta in sorted((k, d) for k, d in deltas.items() if k is not None and d):
+        lookup = dict(zip(('day', *KEY_FIELDS), key))
+        with transaction.atomic():
+            if CaseStatsDaily.objects.filter(**lookup).update(count=F('count') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    CaseStatsDaily.objects.create(count=delta, **lookup)
+            except IntegrityError:
+                # Another writer created the row first
+                CaseStatsDaily.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def record_created(cases):
+    """Count cases inserted without signals (``bulk_create``)."""
+    apply_deltas(Counter(stats_key(case) for case in cases))
+
+
+def record_moved(old_key, new_key):
+    if old_key is not None and new_key is not None and old_key != new_key:
+        apply_deltas({old_key: -1, new_key: 1})
+
+
+def rebuild():
+    """Recompute every counter from the cases table. Returns the number of rows written."""
+    rows = (
+        Case.objects.order_by()
+        .annotate(day=TruncDate('created_at', tzinfo=datetime.timezone.utc))
+        .values('day', *KEY_FIELDS)
+        .annotate(count=Count('id'))
+    )
+    counters = [CaseStatsDaily(**row) for row in rows]
+    with transaction.atomic():
+        CaseStatsDaily.objects.all().delete()
+        CaseStatsDaily.objects.bulk_create(counters, batch_size=1000)
+    return len(counters)
+
+
+def summarize(since=None, until=None):
+    """Totals per status, category, priority and month for cases created in ``[since, until]``."""
+    rows = CaseStatsDaily.objects.all()
+    if since:
+        rows = rows.filter(day__gte=since)
+    if until:
+        rows = rows.filter(day__lte=until)
+
+    def totals(field):
+        return {
+            value: count
+            for value, count in rows.values_list(field).annotate(count=Sum('count')).order_by(field)
+            if count
+        }
+
+    by_month = (
+        rows.annotate(month=TruncMonth('day')).values_list('month')
+        .annotate(count=Sum('count')).order_by('month')
+    )
+    by_status = totals('status')
+    return {
+        'total': sum(by_status.values()),
+        'by_status': by_status,
+        'by_category': totals('category'),
+        'by_priority': totals('priority'),
+        'by_month': [{'month': month.strftime('%Y-%m'), 'count': count} for month, count in by_month if count],
+    }
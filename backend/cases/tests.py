@@ -0,0 +1,1023 @@
+import csv
+import datetime
+import hashlib
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+from collections import Counter
+from functools import partial
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import (
+    analysis, analysis_cache, analysis_schema, exporter, facets, importer, local_analyzer, query_plans, search,
+    similarity, singleflight, stats, throttling, views,
+)
+from .filters import apply_case_filters, visible_cases
+from .importer import CaseImporter, iter_records
+from .jobs import claim_next_job, claim_pack, enqueue_analysis, enqueue_batch, run_jobs
+from .models import (
+    AnalysisCacheEntry, AnalysisJob, Case, CaseAnalysisResult, CaseSearchDocument, CaseSimilarityVector, Comment,
+)
+
+User = get_user_model()
+
+
+def make_cases(owner, count, start=0):
+    """``count`` cases for ``owner``, each with a comment and a latest analysis."""
+    for i in range(start, start + count):
+        case = Case.objects.create(
+            case_id=f'CASE-T{i:05d}', title=f'Case {i}', description='Paid an advance for a fake job offer',
+            created_by=owner, assigned_to=owner,
+        )
+        Comment.objects.create(case=case, user=owner, content='Called the bank')
+        result = CaseAnalysisResult.objects.create(case=case, version=1, keywords=['job', 'advance'], summary='Job scam')
+        Case.objects.filter(pk=case.pk).update(latest_analysis=result)
+
+
+class CaseListQueryCountTests(TestCase):
+    """``GET /api/cases/`` costs the same number of queries however many rows it returns."""
+
+    variants = {
+        'plain': ('', 1),
+        'paged': ('?page_size=100', 1),
+        'expand': ('?expand=documents,comments,analysis', 3),
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='staff@example.com', username='staff', password='pw', is_staff=True,
+            first_name='Staff', last_name='User',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count_is_independent_of_row_count(self):
+        created = 0
+        for rows in (1, 5, 25):
+            make_cases(self.user, rows - created, start=created)
+            created = rows
+            for name, (query, queries) in self.variants.items():
+                with self.subTest(variant=name, rows=rows):
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(f'/api/cases/{query}')
+                    self.assertEqual(response.status_code, 200)
+                    results = response.data['results'] if 'results' in response.data else response.data
+                    self.assertEqual(len(results), rows)
+
+    def test_expanded_rows_carry_their_relations(self):
+        make_cases(self.user, 3)
+        response = self.client.get('/api/cases/?expand=comments,analysis')
+        for row in response.data:
+            self.assertEqual(len(row['comments']), 1)
+            self.assertEqual(row['analysis']['keywords'], ['job', 'advance'])
+
+
+@skipUnless(query_plans.is_supported(), f'no EXPLAIN checks for {connection.vendor}')
+class CaseQueryPlanTests(TestCase):
+    """The case list queries are index range scans, not full scans of cases_case."""
+
+    def test_list_queries_use_their_indexes(self):
+        user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw', first_name='Case', last_name='Owner',
+        )
+        make_cases(user, 5)
+        for name, (queryset, indexes) in query_plans.case_list_queries(user.pk).items():
+            with self.subTest(query=name):
+                plan = query_plans.explain(queryset)
+                self.assertIsNone(query_plans.plan_problem(plan, indexes), plan)
+
+    def test_case_id_search_is_case_insensitive(self):
+        user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw', first_name='Case', last_name='Owner',
+        )
+        make_cases(user, 2)
+        found = apply_case_filters(Case.objects.all(), {'case_id': ' case-t00001 '})
+        self.assertEqual(list(found.values_list('case_id', flat=True)), ['CASE-T00001'])
+
+
+class CaseSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw', first_name='Case', last_name='Owner',
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com', username='other', password='pw', first_name='Other', last_name='User',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_case(self, case_id, title, description='Paid an advance for a job', owner=None):
+        return Case.objects.create(case_id=case_id, title=title, description=description,
+                                   created_by=owner or self.user)
+
+    def search(self, query, user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        response = self.client.get('/api/cases/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_title_matches_rank_first_with_snippets(self):
+        self.add_case('CASE-BODY', 'Loan app harassment', 'The agent, Ravi Sharma, threatened my family')
+        self.add_case('CASE-TITLE', 'Sharma loan fraud')
+        self.add_case('CASE-NONE', 'Phishing call')
+        results = self.search('shar').data
+        self.assertEqual([row['case_id'] for row in results], ['CASE-TITLE', 'CASE-BODY'])
+        self.assertGreater(results[0]['search_rank'], results[1]['search_rank'])
+        self.assertIn('**Sharma**', results[0]['search_snippet'])
+        self.assertIn('Ravi **Sharma**', results[1]['search_snippet'])
+        # Every term has to match
+        self.assertEqual([row['case_id'] for row in self.search('sharma threatened').data], ['CASE-BODY'])
+
+    def test_only_visible_cases_are_returned(self):
+        self.add_case('CASE-MINE', 'Sharma loan fraud')
+        self.add_case('CASE-THEIRS', 'Sharma investment fraud', owner=self.other)
+        self.assertEqual([row['case_id'] for row in self.search('sharma').data], ['CASE-MINE'])
+        staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='pw', is_staff=True,
+            first_name='Staff', last_name='User',
+        )
+        self.assertEqual({row['case_id'] for row in self.search('sharma', staff).data}, {'CASE-MINE', 'CASE-THEIRS'})
+
+    def test_index_follows_saves_and_deletes(self):
+        case = self.add_case('CASE-EDIT', 'Sharma loan fraud')
+        case.title = 'Verma loan fraud'
+        case.save()
+        self.assertEqual(self.search('sharma').data, [])
+        self.assertEqual([row['case_id'] for row in self.search('verma').data], ['CASE-EDIT'])
+        case.delete()
+        self.assertEqual(search.search_cases(Case.objects.all(), 'verma'), [])
+        self.assertFalse(CaseSearchDocument.objects.exists())
+
+    @override_settings(CASE_SEARCH_MAX_RESULTS=2)
+    def test_results_past_the_cap_are_paged(self):
+        for i in range(5):
+            self.add_case(f'CASE-P{i}', f'Sharma fraud {i}')
+        for fts in (True, False):
+            with self.subTest(fts=fts), mock.patch.object(search, '_fts_available', return_value=fts):
+                seen, url, pages = [], '/api/cases/?q=sharma', 0
+                while url:
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    seen += [row['case_id'] for row in response.data]
+                    pages += 1
+                    link = response.headers.get('Link')
+                    url = link[1:link.index('>')] if link else None
+                self.assertEqual(pages, 3)
+                self.assertEqual(sorted(seen), [f'CASE-P{i}' for i in range(5)])
+        self.assertEqual(self.client.get('/api/cases/?q=sharma&offset=-1').status_code, 400)
+
+
+class CaseRollupTests(TestCase):
+    """``/stats/`` and ``/facets/`` agree with a fresh aggregate over the cases after every kind of write."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='staff@example.com', username='staff', password='pw', is_staff=True,
+            first_name='Staff', last_name='User',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def expected_stats(self):
+        cases = list(Case.objects.all())
+
+        def totals(field):
+            return dict(sorted(Counter(getattr(case, field) for case in cases).items()))
+
+        months = Counter(case.created_at.astimezone(datetime.timezone.utc).strftime('%Y-%m') for case in cases)
+        return {
+            'total': len(cases),
+            'by_status': totals('status'),
+            'by_category': totals('category'),
+            'by_priority': totals('priority'),
+            'by_month': [{'month': month, 'count': count} for month, count in sorted(months.items())],
+        }
+
+    def expected_facets(self):
+        cases = list(Case.objects.select_related('latest_analysis'))
+
+        def ranked(counter):
+            return [{'value': v, 'count': c} for v, c in sorted(counter.items(), key=lambda item: (-item[1], item[0]))]
+
+        keywords, sections = Counter(), Counter()
+        for case in cases:
+            result = case.latest_analysis
+            if result is not None:
+                keywords.update({facets.normalize_keyword(k) for k in result.keywords} - {''})
+                sections.update({facets.normalize_section(s) for s in result.legal_sections} - {''})
+        return {
+            'total': len(cases),
+            'keywords': ranked(keywords),
+            'legal_sections': ranked(sections),
+            'category': ranked(Counter(case.category for case in cases)),
+            'status': ranked(Counter(case.status for case in cases)),
+        }
+
+    def assert_rollups_match(self, step):
+        with self.subTest(step=step):
+            self.assertEqual(self.client.get('/api/cases/stats/').json(), self.expected_stats())
+            self.assertEqual(self.client.get('/api/cases/facets/?limit=100').json(), self.expected_facets())
+
+    def test_rollups_follow_every_write(self):
+        # Facet invalidation waits for the commit, which TestCase never does on its own
+        commit = partial(self.captureOnCommitCallbacks, execute=True)
+        self.assert_rollups_match('empty')
+        created = []
+        for title, category in (('Fake job offer', 'fraud'), ('UPI fraud call', 'cybercrime'), ('Bribe', 'corruption')):
+            with commit():
+                response = self.client.post('/api/cases/', {
+                    'title': title, 'description': f'{title}: paid an advance to an agent', 'category': category,
+                }, format='json')
+            self.assertEqual(response.status_code, 201)
+            created.append(response.data['id'])
+        self.assert_rollups_match('create')
+
+        with commit():
+            analysis.save_analysis(Case.objects.get(pk=created[0]), {
+                'keywords': ['UPI', 'Advance'], 'legal_sections': [{'section': 'IT Act 66D'}, 'IPC 420'],
+            }, {'model_name': 'test', 'prompt_version': analysis.PROMPT_VERSION})
+        self.assert_rollups_match('analysis')
+
+        with commit():
+            self.assertEqual(self.client.post(f'/api/cases/{created[0]}/close/').status_code, 200)
+            self.assertEqual(self.client.post(f'/api/cases/{created[1]}/approve/').status_code, 200)
+            response = self.client.patch(f'/api/cases/{created[2]}/', {'priority': 'high'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_rollups_match('status and priority changes')
+
+        with commit():
+            self.assertEqual(self.client.delete(f'/api/cases/{created[1]}/').status_code, 204)
+        self.assert_rollups_match('delete')
+
+        upload = BytesIO(b'title,description,category,priority\nLottery,Won a lottery,fraud,low\n'
+                         b'SIM swap,Lost money,cybercrime,high\n')
+        upload.name = 'cases.csv'
+        with commit():
+            response = self.client.post('/api/cases/bulk_import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.data['created'], 2)
+        self.assert_rollups_match('bulk import')
+
+        stats.rebuild()
+        self.assert_rollups_match('rebuild')
+
+
+@skipUnless(similarity.similarity_available(), 'similar-case search needs numpy and scipy')
+@override_settings(CASE_SIMILARITY_FEATURES=2 ** 12)
+class SimilarityIndexTests(TestCase):
+    texts = {
+        'CASE-JOB': ('Fake job offer', 'Paid an advance fee for a fake job offer from an agent'),
+        'CASE-SCAM': ('Job offer scam', 'The agent asked for an advance fee before the job offer letter'),
+        'CASE-FEE': ('Fake job offer fraud', 'Paid an advance fee for a fake job offer to an agent'),
+        'CASE-BIKE': ('Stolen bicycle', 'My bicycle was stolen from the station parking'),
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_patch = override_settings(CASE_SIMILARITY_INDEX_DIR=directory.name)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        similarity._index = None
+        self.addCleanup(setattr, similarity, '_index', None)
+        self.user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw', first_name='Case', last_name='Owner',
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com', username='other', password='pw', first_name='Other', last_name='User',
+        )
+        self.cases = {
+            case_id: Case.objects.create(case_id=case_id, title=title, description=description, created_by=self.user)
+            for case_id, (title, description) in self.texts.items()
+        }
+
+    def store_vector(self, case):
+        similarity.record_case(case, CaseAnalysisResult(keywords=[]))
+
+    def build_snapshot(self):
+        rows = Case.objects.order_by('id').values_list('id', 'title', 'description', 'latest_analysis__keywords')
+        similarity.build_snapshot(rows)
+
+    def similar(self, case_id, limit=10, allowed_ids=None):
+        hits = similarity.similar_cases(self.cases[case_id], limit, allowed_ids)
+        by_pk = {case.pk: case_id for case_id, case in self.cases.items()}
+        scores = [score for _, score in hits]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        return [by_pk[pk] for pk, _ in hits]
+
+    def test_stored_vectors_only(self):
+        for case in self.cases.values():
+            self.store_vector(case)
+        self.assertEqual(self.similar('CASE-JOB'), ['CASE-FEE', 'CASE-SCAM'])
+        self.assertEqual(self.similar('CASE-JOB', limit=1), ['CASE-FEE'])
+
+    def test_snapshot_only(self):
+        self.build_snapshot()
+        self.assertFalse(CaseSimilarityVector.objects.exists())
+        self.assertEqual(self.similar('CASE-JOB'), ['CASE-FEE', 'CASE-SCAM'])
+        self.assertEqual(self.similar('CASE-BIKE'), [])
+
+    def test_newer_stored_vector_replaces_the_snapshot_row(self):
+        self.build_snapshot()
+        scam = self.cases['CASE-SCAM']
+        scam.title, scam.description = 'Bicycle theft', 'Someone stole my bicycle near the station'
+        scam.save()
+        self.store_vector(scam)
+        self.assertEqual(self.similar('CASE-JOB'), ['CASE-FEE'])
+        # Listed once, scored on its new text
+        self.assertEqual(self.similar('CASE-BIKE'), ['CASE-SCAM'])
+
+    def test_candidates_can_be_restricted(self):
+        self.build_snapshot()
+        self.store_vector(self.cases['CASE-SCAM'])
+        allowed = [self.cases['CASE-SCAM'].pk, self.cases['CASE-BIKE'].pk]
+        self.assertEqual(self.similar('CASE-JOB', allowed_ids=allowed), ['CASE-SCAM'])
+
+    def test_endpoint_hides_other_users_cases(self):
+        self.build_snapshot()
+        Case.objects.filter(case_id='CASE-FEE').update(created_by=self.other)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f"/api/cases/{self.cases['CASE-JOB'].pk}/similar/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['case_id'] for row in response.data], ['CASE-SCAM'])
+        self.assertGreater(response.data[0]['similarity'], 0)
+
+
+class LocalAnalyzerTests(TestCase):
+    corpus = [
+        ('Zamindar demanded money to release the land records', Case.Category.CORRUPTION),
+        ('The zamindar and the patwari took money for the mutation', Case.Category.CORRUPTION),
+        ('Paid an advance for a fake job offer, the agent stopped answering', Case.Category.FRAUD),
+        ('Agent took an advance for a job abroad that never existed', Case.Category.FRAUD),
+        ('Someone hacked my email account and changed the password', Case.Category.SECURITY),
+    ]
+
+    def setUp(self):
+        local_analyzer.reset()
+        self.addCleanup(local_analyzer.reset)
+
+    def test_keywords_skip_stop_words_and_common_terms(self):
+        analyzer = local_analyzer.LocalAnalyzer(self.corpus)
+        keywords = analyzer.keywords(
+            'Complaint to the police: the agent asked for an advance for a visa the embassy never issued.'
+        )
+        # Words no past case used first; 'agent' and 'advance' are in most of them
+        self.assertEqual(keywords, ['embassy', 'issued', 'visa', 'advance', 'agent'])
+        self.assertFalse(set(keywords) & local_analyzer.STOP_WORDS)
+
+    def test_category_confidence_favours_the_trained_category(self):
+        analyzer = local_analyzer.LocalAnalyzer(self.corpus)
+        confidence = analyzer.category_confidence('The zamindar kept the land records until I paid')
+        self.assertEqual(set(confidence), {c.value for c in Case.Category})
+        self.assertAlmostEqual(sum(confidence.values()), 1.0, places=3)
+        self.assertEqual(max(confidence, key=confidence.get), Case.Category.CORRUPTION)
+        # Seed terms give an untrained analyzer sensible scores too
+        confidence = local_analyzer.LocalAnalyzer().category_confidence('Hacked account, password changed')
+        self.assertEqual(max(confidence, key=confidence.get), Case.Category.SECURITY)
+
+    @override_settings(LOCAL_ANALYZER={'CORPUS_SIZE': 2000, 'REQUEST_CORPUS_SIZE': 2, 'MAX_AGE': 3600})
+    def test_requests_only_train_on_a_slice_of_the_corpus(self):
+        user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw', first_name='Case', last_name='Owner',
+        )
+        for i, (description, category) in enumerate(self.corpus):
+            Case.objects.create(case_id=f'CASE-L{i}', title='Case', description=description, category=category,
+                                created_by=user)
+        self.assertEqual(local_analyzer.get_local_analyzer().corpus_size, 2)
+        # The workers' full build is what requests then use
+        analyzer = local_analyzer.train_local_analyzer()
+        self.assertEqual(analyzer.corpus_size, 5)
+        with self.assertNumQueries(0):
+            self.assertIs(local_analyzer.get_local_analyzer(), analyzer)
+            self.assertIs(local_analyzer.train_local_analyzer(), analyzer)
+        with mock.patch.object(local_analyzer.time, 'monotonic', return_value=time.monotonic() + 3601):
+            self.assertEqual(local_analyzer.get_local_analyzer().corpus_size, 2)
+            self.assertEqual(local_analyzer.train_local_analyzer().corpus_size, 5)
+
+
+class CaseImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw', first_name='Case', last_name='Owner',
+        )
+
+    def run_import(self, content, fmt, **kwargs):
+        return CaseImporter(self.user, **kwargs).run(iter_records(BytesIO(content.encode()), fmt))
+
+    def test_csv_is_imported_in_chunks(self):
+        rows = ['title,description,category,stolen_items']
+        rows += [f'Case {i},Paid an advance,fraud,"[""Phone {i}""]"' for i in range(5)]
+        rows[3] = 'Case 2,Paid an advance,bogus,'
+        chunks = []
+        summary = self.run_import('\n'.join(rows), 'csv', chunk_size=2, on_chunk=chunks.append)
+        self.assertEqual((summary['created'], summary['failed']), (4, 1))
+        self.assertEqual([error['line'] for error in summary['errors']], [4])
+        self.assertIn('category', summary['errors'][0]['errors'])
+        self.assertEqual([chunk['created'] for chunk in chunks], [2, 4])
+        case = Case.objects.get(title='Case 4')
+        self.assertEqual((case.category, case.stolen_items, case.created_by), ('fraud', ['Phone 4'], self.user))
+        self.assertFalse(Case.objects.filter(title='Case 2').exists())
+
+    def test_jsonl_reports_the_line_of_each_bad_record(self):
+        lines = [
+            json.dumps({'title': 'Good', 'description': 'Paid an advance'}),
+            '{not json',
+            '[1, 2]',
+            '',
+            json.dumps({'description': 'No title'}),
+            json.dumps({'title': 'Also good', 'description': 'Lost money'}),
+        ]
+        summary = self.run_import('\n'.join(lines), 'jsonl', chunk_size=10)
+        self.assertEqual((summary['created'], summary['failed']), (2, 3))
+        self.assertEqual([error['line'] for error in summary['errors']], [2, 3, 5])
+        self.assertIn('title', summary['errors'][2]['errors'])
+
+    def test_reported_errors_are_capped(self):
+        lines = [json.dumps({'title': f'Case {i}'}) for i in range(5)]
+        with mock.patch.object(importer, 'MAX_REPORTED_ERRORS', 3):
+            summary = self.run_import('\n'.join(lines), 'jsonl')
+        self.assertEqual(summary['failed'], 5)
+        self.assertEqual([error['line'] for error in summary['errors']], [1, 2, 3])
+
+    @override_settings(CASE_IMPORT_CHUNK_SIZE=2, ANALYSIS_RATE_LIMIT=2)
+    def test_analyze_staggers_jobs_across_chunks(self):
+        lines = '\n'.join(json.dumps({'title': f'Case {i}', 'description': 'Paid an advance'}) for i in range(5))
+        upload = BytesIO(lines.encode())
+        upload.name = 'cases.jsonl'
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/cases/bulk_import/', {'file': upload, 'analyze': '1'}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 5)
+        jobs = AnalysisJob.objects.order_by('run_after')
+        self.assertEqual({str(job.batch_id) for job in jobs}, {str(response.data['batch_id'])})
+        start = jobs[0].run_after
+        self.assertEqual([(job.run_after - start).total_seconds() for job in jobs], [0, 0.5, 1, 1.5, 2])
+
+
+class CaseExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw', first_name='Case', last_name='Owner',
+        )
+        make_cases(self.user, 2)
+        Case.objects.create(case_id='CASE-NEW', title='New, "unanalyzed"', description='Text', created_by=self.user)
+        other = User.objects.create_user(
+            email='other@example.com', username='other', password='pw', first_name='Other', last_name='User',
+        )
+        Case.objects.create(case_id='CASE-OTHER', title='Not mine', description='Text', created_by=other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, query):
+        response = self.client.get(f'/api/cases/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_of_selected_columns(self):
+        rows = list(csv.reader(StringIO(self.export('format=csv&columns=title,case_id,analysis_keywords'))))
+        self.assertEqual(rows[0], ['id', 'title', 'case_id', 'analysis_keywords'])
+        self.assertEqual([row[1:] for row in rows[1:]], [
+            ['Case 0', 'CASE-T00000', '["job", "advance"]'],
+            ['Case 1', 'CASE-T00001', '["job", "advance"]'],
+            ['New, "unanalyzed"', 'CASE-NEW', '[]'],
+        ])
+
+    def test_jsonl_export_matches_the_api_values(self):
+        lines = self.export('format=jsonl&status=open').splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['case_id'] for row in rows], ['CASE-T00000', 'CASE-T00001', 'CASE-NEW'])
+        self.assertEqual(list(rows[0]), list(exporter.EXPORT_COLUMNS))
+        self.assertEqual((rows[0]['analysis_summary'], rows[0]['created_by']), ('Job scam', self.user.pk))
+        self.assertEqual((rows[2]['analysis_summary'], rows[2]['analysis_source']), ('', ''))
+
+    def test_unknown_column_is_rejected(self):
+        response = self.client.get('/api/cases/export/?format=csv&columns=title,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'error': 'Unknown export column(s): password'})
+
+    def test_rows_are_read_one_page_at_a_time(self):
+        make_cases(self.user, 3, start=2)
+        columns = exporter.parse_columns('case_id')
+        with self.assertNumQueries(4):  # 2 + 2 + 2 rows, then an empty page
+            lines = list(exporter.iter_export(visible_cases(self.user), 'jsonl', columns, chunk_size=2))
+        self.assertEqual(
+            [json.loads(line)['case_id'] for line in lines],
+            ['CASE-T00000', 'CASE-T00001', 'CASE-NEW', 'CASE-T00002', 'CASE-T00003', 'CASE-T00004'],
+        )
+
+
+class AnalysisJobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pw', first_name='Case', last_name='Owner',
+        )
+        self.case = Case.objects.create(case_id='CASE-JOB1', title='Job', description='Text', created_by=self.user)
+        # The command installs SIGINT/SIGTERM handlers in the main thread
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, sig, signal.getsignal(sig))
+
+    def test_a_job_is_claimed_once(self):
+        job = enqueue_analysis(self.case, user=self.user, state='Maharashtra', ignored='x')
+        self.assertEqual(job.options, {'state': 'Maharashtra'})
+        claimed = claim_next_job('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual((claimed.state, claimed.attempts, claimed.locked_by), (AnalysisJob.State.RUNNING, 1, 'worker-1'))
+        self.assertIsNone(claim_next_job('worker-2'))
+
+    def test_job_status_endpoint(self):
+        job = enqueue_analysis(self.case, user=self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/cases/jobs/{job.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['state'], AnalysisJob.State.QUEUED)
+
+    def test_analyze_can_be_queued(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/cases/{self.case.pk}/analyze/'
+        requests = {
+            'query': lambda data: client.post(f'{url}?async=1', data, format='json'),
+            'prefer': lambda data: client.post(url, data, format='json', HTTP_PREFER='wait=5, respond-async'),
+        }
+        with mock.patch.object(views, 'generate_analysis') as generate:
+            for name, post in requests.items():
+                with self.subTest(name):
+                    response = post({'state': 'Maharashtra', 'language': 'Hindi'})
+                    self.assertEqual(response.status_code, 202)
+                    job = AnalysisJob.objects.get(pk=response.data['job_id'])
+                    self.assertEqual((job.case_id, job.created_by_id, job.state),
+                                     (self.case.pk, self.user.pk, AnalysisJob.State.QUEUED))
+                    self.assertEqual(job.options['state'], 'Maharashtra')
+                    self.assertEqual(job.options['language'], 'Hindi')
+                    self.assertTrue(response['Location'].endswith(f'/api/cases/jobs/{job.pk}/'))
+                    self.assertEqual(response['Location'], response.data['status_url'])
+                    self.assertEqual(response['Preference-Applied'], 'respond-async')
+                    self.assertEqual(client.get(response['Location']).data['state'], AnalysisJob.State.QUEUED)
+        generate.assert_not_called()
+        self.assertEqual(AnalysisJob.objects.count(), 2)
+
+    def run_workers(self, **patches):
+        command = 'cases.management.commands.run_analysis_workers'
+        with mock.patch(f'{command}.fail_expired_jobs'), \
+                mock.patch(f'{command}.claim_next_job', **patches) as claim:
+            call_command('run_analysis_workers', '--once', '--workers', '2', '--poll-interval', '0',
+                         stdout=StringIO(), stderr=StringIO())
+        return claim
+
+    def test_once_exits_when_the_queue_is_empty(self):
+        claim = self.run_workers(return_value=None)
+        self.assertEqual(claim.call_count, 2)
+
+    def test_once_fails_instead_of_retrying_on_error(self):
+        with self.assertRaisesMessage(CommandError, 'database is unavailable'):
+            self.run_workers(side_effect=RuntimeError('database is unavailable'))
+
+    def test_rate_limited_pack_falls_back_to_single_jobs(self):
+        cache.clear()
+        analysis_cache._backend = None
+        self.addCleanup(setattr, analysis_cache, '_backend', None)
+        cases = [self.case] + [
+            Case.objects.create(case_id=f'CASE-JOB{i}', title='Job', description=f'Text {i}', created_by=self.user)
+            for i in (2, 3)
+        ]
+        enqueue_batch(cases, user=self.user)
+        pack = claim_pack(claim_next_job('worker-1'), 'worker-1')
+        self.assertEqual(len(pack), 3)
+        model = mock.Mock()
+        with mock.patch.object(analysis.gemini, 'sdk_available', return_value=True), \
+                mock.patch.object(analysis.gemini, 'get_model', return_value=model), \
+                mock.patch.object(throttling, 'acquire_model_slot', return_value=False), \
+                mock.patch('cases.jobs.run_job') as run_job:
+            run_jobs(pack)
+        model.generate_content.assert_not_called()
+        self.assertEqual([call.args[0].pk for call in run_job.call_args_list], [job.pk for job in pack])
+        self.assertFalse(AnalysisJob.objects.filter(state=AnalysisJob.State.DONE).exists())
+        self.assertFalse(CaseAnalysisResult.objects.exists())
+
+
+class AnalysisCacheTests(TestCase):
+    inputs = {
+        'title': 'Fake job offer', 'description': 'Paid  an advance\nfor a job', 'accused_name': '',
+        'state': 'Maharashtra', 'city': 'Pune', 'pincode': '411001', 'language': 'English', 'files_summary': [],
+    }
+
+    def setUp(self):
+        cache.clear()
+        analysis_cache.stats.reset()
+        analysis_cache._backend = None
+        self.addCleanup(setattr, analysis_cache, '_backend', None)
+
+    def key(self, **changes):
+        return analysis_cache.analysis_cache_key('model', 'v1', **{**self.inputs, **changes})
+
+    def test_key_ignores_whitespace_and_location_case(self):
+        self.assertEqual(self.key(), self.key(description='Paid an advance for a job', state='MAHARASHTRA '))
+        self.assertNotEqual(self.key(), self.key(description='Paid an advance'))
+        self.assertNotEqual(self.key(), analysis_cache.analysis_cache_key('model', 'v2', **self.inputs))
+
+    def test_hit_skips_the_model(self):
+        key = analysis_cache.analysis_cache_key(
+            analysis.GEMINI_MODEL, analysis.PROMPT_VERSION, **{**self.inputs, 'files_summary': None},
+        )
+        analysis_cache.store(key, {'summary': 'cached'})
+        with mock.patch.object(analysis, '_run_analysis') as run:
+            result = analysis.generate_analysis(
+                self.inputs['title'], '', self.inputs['description'], 'India', 'Maharashtra', 'Pune', '411001',
+                None, 'English',
+            )
+        run.assert_not_called()
+        self.assertEqual(result, {'summary': 'cached'})
+        self.assertEqual(analysis_cache.get_stats()['hits'], 1)
+
+    def test_django_backend_clear_keeps_other_keys(self):
+        backend = analysis_cache.DjangoCacheBackend(ttl=60, max_entries=10)
+        cache.set('cases:circuit:gemini', 'open')
+        backend.set('k', {'summary': 'x'})
+        self.assertEqual(backend.get('k'), {'summary': 'x'})
+        backend.clear()
+        self.assertIsNone(backend.get('k'))
+        self.assertEqual(cache.get('cases:circuit:gemini'), 'open')
+
+    def test_file_backend_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = analysis_cache.FileCacheBackend(ttl=60, max_entries=2, location=location)
+            for age, key in ((20, 'a'), (10, 'b')):
+                backend.set(key, {'key': key})
+                stamp = time.time() - age
+                os.utime(backend._path(key), (stamp, stamp))
+            backend.set('c', {'key': 'c'})
+            self.assertIsNone(backend.get('a'))
+            self.assertEqual(backend.get('b'), {'key': 'b'})
+            self.assertEqual(backend.get('c'), {'key': 'c'})
+
+    def test_db_backend_evicts_least_recently_used(self):
+        backend = analysis_cache.DatabaseCacheBackend(ttl=60, max_entries=2)
+        backend.set('a', {'key': 'a'})
+        backend.set('b', {'key': 'b'})
+        backend.get('a')
+        backend.set('c', {'key': 'c'})
+        self.assertEqual(set(AnalysisCacheEntry.objects.values_list('key', flat=True)), {'a', 'c'})
+
+    @override_settings(ANALYSIS_CACHE={'ENABLED': False})
+    def test_disabled_cache_stores_nothing(self):
+        analysis_cache.store('k', {'summary': 'x'})
+        self.assertIsNone(analysis_cache.get_cached('k'))
+        self.assertEqual(analysis_cache.get_stats()['stores'], 0)
+
+
+@override_settings(ANALYSIS_RATE_LIMIT=1, ANALYSIS_PROVIDER_RPM=0)
+class ModelRateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        analysis_cache._backend = None
+        self.addCleanup(setattr, analysis_cache, '_backend', None)
+        throttling._bucket = None
+        self.addCleanup(setattr, throttling, '_bucket', None)
+        self.model = mock.Mock()
+        self.model.generate_content.return_value = mock.Mock(text='{"summary": "Job scam"}', usage_metadata=None)
+        self.clock = [1000.0]
+        for target, name, kwargs in (
+            (analysis.gemini, 'sdk_available', {'return_value': True}),
+            (analysis.gemini, 'get_model', {'return_value': self.model}),
+            (throttling.time, 'monotonic', {'side_effect': lambda: self.clock[0]}),
+        ):
+            patcher = mock.patch.object(target, name, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Another call has just taken the only slot of this second
+        self.assertTrue(throttling.acquire_model_slot())
+
+    def sleep(self, seconds):
+        self.clock[0] += seconds
+
+    def analyze(self, **kwargs):
+        return analysis.generate_analysis(
+            'Fake job offer', '', 'Paid an advance', 'India', 'Maharashtra', 'Pune', '411001', [], 'English', **kwargs,
+        )
+
+    def test_request_gets_the_fallback_without_waiting(self):
+        with mock.patch.object(throttling.time, 'sleep', side_effect=self.sleep) as sleep:
+            result = self.analyze()
+        sleep.assert_not_called()
+        self.model.generate_content.assert_not_called()
+        self.assertEqual(result['fallback_reason'], 'rate_limited')
+
+    def test_worker_waits_for_a_slot(self):
+        with mock.patch.object(throttling.time, 'sleep', side_effect=self.sleep) as sleep:
+            result = self.analyze(wait_for_slot=True)
+        self.assertAlmostEqual(sum(call.args[0] for call in sleep.call_args_list), 1.0)
+        self.model.generate_content.assert_called_once()
+        self.assertEqual(result['summary'], 'Job scam')
+
+
+class _WatchedEvent(threading.Event):
+    """An Event that tells the test when someone starts waiting on it."""
+
+    def __init__(self, waiting):
+        super().__init__()
+        self.waiting = waiting
+
+    def wait(self, timeout=None):
+        self.waiting.set()
+        return super().wait(timeout)
+
+
+class _WatchedCall(singleflight._Call):
+    waiting = None
+
+    def __init__(self):
+        super().__init__()
+        self.done = _WatchedEvent(self.waiting)
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        analysis_cache._backend = None
+        self.addCleanup(setattr, analysis_cache, '_backend', None)
+        singleflight.stats.reset()
+        # Set once a second caller waits on the first one's in-process flight
+        self.waiting = threading.Event()
+        for target, name, value in ((singleflight, '_Call', _WatchedCall), (_WatchedCall, 'waiting', self.waiting)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def in_threads(self, *targets):
+        results = [None] * len(targets)
+
+        def run(i):
+            results[i] = targets[i]()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(targets))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return results
+
+    def test_identical_concurrent_analyses_call_the_model_once(self):
+        model = mock.Mock()
+
+        def generate_content(prompt):
+            # Answer only once the second request is waiting for this one
+            self.assertTrue(self.waiting.wait(5))
+            return mock.Mock(text='{"summary": "Job scam"}', usage_metadata=None)
+
+        model.generate_content.side_effect = generate_content
+
+        def analyze():
+            return analysis.generate_analysis(
+                'Fake job offer', '', 'Paid an advance', 'India', 'Maharashtra', 'Pune', '411001', [], 'English',
+            )
+
+        with mock.patch.object(analysis.gemini, 'sdk_available', return_value=True), \
+                mock.patch.object(analysis.gemini, 'get_model', return_value=model):
+            first, second = self.in_threads(analyze, analyze)
+        model.generate_content.assert_called_once()
+        self.assertEqual(first['summary'], 'Job scam')
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(singleflight.get_stats()['leaders'], 1)
+        self.assertEqual(singleflight.get_stats()['deduplicated_local'], 1)
+
+    @override_settings(ANALYSIS_SINGLE_FLIGHT={'WAIT_TIMEOUT': 0.01})
+    def test_local_waiter_runs_fn_itself_after_the_timeout(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'leader'
+
+        def follower():
+            self.assertTrue(started.wait(5))
+            try:
+                return singleflight.do('key', lambda: 'follower')
+            finally:
+                release.set()
+
+        leader, followed = self.in_threads(lambda: singleflight.do('key', slow), follower)
+        self.assertEqual((leader, followed), ('leader', 'follower'))
+        self.assertEqual(singleflight.get_stats()['timeouts'], 1)
+
+    def test_result_is_shared_across_processes_through_the_cache(self):
+        self.assertEqual(singleflight.do('key', lambda: {'summary': 'first'}), {'summary': 'first'})
+        fn = mock.Mock()
+        self.assertEqual(singleflight.do('key', fn), {'summary': 'first'})
+        fn.assert_not_called()
+        self.assertEqual(singleflight.get_stats()['deduplicated_shared'], 1)
+
+    @override_settings(ANALYSIS_SINGLE_FLIGHT={'WAIT_TIMEOUT': 1})
+    def test_shared_waiter_polls_then_gives_up(self):
+        digest = hashlib.sha256(b'key').hexdigest()
+        cache.add(f'singleflight:{digest}:lock', 'other-process')
+        clock = [1000.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with mock.patch.object(singleflight.time, 'monotonic', side_effect=lambda: clock[0]), \
+                mock.patch.object(singleflight.time, 'sleep', side_effect=sleep) as slept:
+            self.assertEqual(singleflight.do('key', lambda: 'own'), 'own')
+            self.assertGreaterEqual(clock[0], 1001.0)  # waited the whole WAIT_TIMEOUT
+            # The other process finishes while this one polls
+            slept.reset_mock()
+            slept.side_effect = lambda seconds: cache.set(f'singleflight:{digest}:result', 'shared')
+            self.assertEqual(singleflight.do('key', lambda: 'own'), 'shared')
+            slept.assert_called_once()
+        self.assertEqual(singleflight.get_stats()['timeouts'], 1)
+        self.assertEqual(singleflight.get_stats()['deduplicated_shared'], 1)
+
+
+class ThrottlingStateTests(TestCase):
+    """Circuit breaker and shared quota transitions, driven by a fake clock."""
+
+    def setUp(self):
+        cache.clear()
+        self.clock = [6000030.0]  # 30s into a quota window
+        for name, kwargs in (
+            ('time', {'side_effect': lambda: self.clock[0]}),
+            ('monotonic', {'side_effect': lambda: self.clock[0]}),
+            ('sleep', {'side_effect': self.sleep}),
+        ):
+            patcher = mock.patch.object(throttling.time, name, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # No jitter: backoffs take their upper bound
+        patcher = mock.patch.object(throttling.random, 'uniform', side_effect=lambda low, high: high)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = throttling.CircuitBreaker('test', cache, failure_threshold=2, reset_timeout=10)
+
+    def sleep(self, seconds):
+        self.clock[0] += seconds
+
+    def test_breaker_opens_half_opens_and_closes(self):
+        breaker = self.breaker
+        self.assertTrue(breaker.allow())
+        breaker.record_failure('boom')
+        self.assertEqual((breaker.state(), breaker.retry_in()), (breaker.CLOSED, 0.0))
+        breaker.record_failure('boom')
+        self.assertEqual((breaker.state(), breaker.retry_in()), (breaker.OPEN, 10.0))
+        self.assertFalse(breaker.allow())
+        self.sleep(10)
+        self.assertEqual(breaker.state(), breaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # one trial call at a time
+        # A failed trial reopens the circuit for twice as long
+        breaker.record_failure('still down')
+        self.assertEqual((breaker.state(), breaker.retry_in()), (breaker.OPEN, 20.0))
+        self.assertEqual(breaker.snapshot()['trips'], 2)
+        self.sleep(20)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.snapshot(), {
+            'state': breaker.CLOSED, 'consecutive_failures': 0, 'trips': 0, 'opened_at': None,
+            'retry_in': 0.0, 'last_error': '',
+        })
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+    def test_rate_limit_trips_at_once_for_the_provider_delay(self):
+        self.breaker.record_failure('429 quota exceeded', retry_after=45, trip=True)
+        self.assertEqual(self.breaker.state(), self.breaker.OPEN)
+        self.assertEqual(self.breaker.retry_in(), 45.0)
+        # A call that was already in flight only extends the wait
+        self.breaker.record_failure('429', retry_after=60, trip=True)
+        self.assertEqual(self.breaker.retry_in(), 60.0)
+        self.assertEqual(self.breaker.snapshot()['trips'], 1)
+
+    def test_release_gives_back_the_trial_slot(self):
+        self.breaker.record_failure('429', trip=True)
+        self.sleep(10)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.release()
+        self.assertEqual(self.breaker.state(), self.breaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+    def test_shared_quota_counts_calls_per_window(self):
+        quota = throttling.SharedQuota(2, cache)
+        self.assertEqual(quota.try_acquire(), 0.0)
+        self.assertEqual(quota.try_acquire(), 0.0)
+        self.assertEqual(quota.try_acquire(), 31.0)  # 30s to the next window, plus jitter
+        self.assertFalse(quota.acquire(timeout=5))
+        self.assertEqual(self.clock[0], 6000035.0)
+        self.assertTrue(quota.acquire())
+        self.assertEqual(self.clock[0], 6000061.0)
+        self.assertEqual(quota.used(), 1)
+
+
+class NormalizeAnalysisTests(TestCase):
+    location = ('India', 'Maharashtra', 'Pune', '411001')
+
+    def normalize(self, data):
+        repairs = []
+        return analysis.normalize_analysis(data, *self.location, repairs=repairs), repairs
+
+    def test_unusable_list_items_are_dropped(self):
+        result, repairs = self.normalize({
+            'legal_sections': [None, {'section': 'IPC 420'}, ['nested']],
+            'evidence_priority': [None, ['x'], 'Bank statement'],
+            'sanction_recommendations': [None, 'text', {'description': 'Fine', 'confidence': 0.5}],
+        })
+        json.dumps(result)  # must stay serializable for the Response and the JSONField
+        self.assertEqual(result['legal_sections'], [{'section': 'IPC 420', 'description': '', 'citation': ''}])
+        self.assertEqual(result['evidence_priority'], [{'item': 'Bank statement', 'rationale': '', 'priority': ''}])
+        self.assertEqual(
+            result['sanction_recommendations'], [{'code': '', 'name': '', 'description': 'Fine', 'confidence': 0.5}],
+        )
+        self.assertTrue({'legal_sections', 'evidence_priority', 'sanction_recommendations'} <= set(repairs))
+
+    def test_clean_reply_is_kept_as_is(self):
+        reply, _ = self.normalize({'summary': 'Job scam', 'keywords': ['job']})
+        result, repairs = self.normalize(reply)
+        self.assertEqual(result, reply)
+        self.assertEqual(repairs, [])
+
+    def test_only_invalid_items_are_rebuilt(self):
+        valid = {'section': 'IPC 420', 'description': 'Cheating', 'citation': ''}
+        result, repairs = self.normalize({'legal_sections': [valid, {**valid, 'citation': None}, 'IPC 406', valid]})
+        sections = result['legal_sections']
+        self.assertIs(sections[0], valid)
+        self.assertIs(sections[3], valid)
+        self.assertEqual(sections[1], valid)
+        self.assertEqual(sections[2], {'section': 'IPC 406', 'description': '', 'citation': ''})
+        self.assertIn('legal_sections', repairs)
+
+    def test_every_category_is_scored(self):
+        result, repairs = self.normalize({'category_confidence': {'Identity Theft': '88%', 'unknown': 0.4}})
+        self.assertEqual(set(result['category_confidence']), set(Case.Category.values))
+        self.assertAlmostEqual(result['category_confidence']['identity_theft'], 0.88)
+        self.assertIn('category_confidence', repairs)
+
+    def test_input_is_not_modified(self):
+        data = {'keywords': 'job, advance', 'sentiment': '-3', 'fallback_reason': 'timeout', 'city': None}
+        before = json.dumps(data, sort_keys=True)
+        result, repairs = self.normalize(data)
+        self.assertEqual(json.dumps(data, sort_keys=True), before)
+        self.assertEqual(result['keywords'], ['job', 'advance'])
+        self.assertEqual(result['sentiment'], -1.0)
+        self.assertEqual(result['fallback_reason'], 'timeout')
+        self.assertEqual((result['country'], result['city']), ('India', 'Pune'))
+        self.assertEqual(repairs.count('keywords'), 1)
+        self.assertNotIn('city', repairs)
+
+    def test_missing_data(self):
+        self.assertEqual(analysis.normalize_analysis(None, *self.location), {'raw': '', 'error': 'No analysis data'})
+
+    def test_prompt_asks_for_every_scored_category(self):
+        prompt = analysis.build_prompt('Case', 'None', *self.location, 'English')
+        for category in analysis_schema.ANALYSIS_SCHEMA['category_confidence'].keys:
+            with self.subTest(category=category):
+                self.assertIn(f'"{category}": 0.0', prompt)
+                self.assertIn(category, prompt.split('3) Category confidence', 1)[1].split('\n', 1)[0])
+
+
+class AnalysisSourceMigrationTests(TransactionTestCase):
+    """Upgrading keeps model results from before 0020 labelled ``ai``."""
+
+    def migrate(self, *targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(list(targets) or executor.loader.graph.leaf_nodes())
+        return executor.loader.project_state(list(targets) or None).apps
+
+    def test_migrated_and_fallback_results_keep_their_source(self):
+        apps = self.migrate(('cases', '0010_caseanalysisresult'))
+        owner = apps.get_model('users', 'User').objects.create(email='owner@example.com', username='owner')
+        HistoricalCase = apps.get_model('cases', 'Case')
+        analyzed = HistoricalCase.objects.create(
+            case_id='CASE-OLD1', title='Old', description='Analyzed before results', created_by_id=owner.pk,
+            analyzed_at=timezone.now(), analysis_summary='Model summary', analysis_keywords=['upi'],
+        )
+        apps = self.migrate(('cases', '0019_casesimilarityvector'))
+        fallback = apps.get_model('cases', 'Case').objects.create(
+            case_id='CASE-NEW1', title='New', description='Analyzed offline', created_by_id=owner.pk,
+        )
+        # What the offline fallback wrote before 0020: no model name, a prompt version
+        apps.get_model('cases', 'CaseAnalysisResult').objects.create(
+            case_id=fallback.pk, version=1, summary='Local summary', prompt_version='2025-11-25',
+        )
+        self.migrate()
+
+        self.assertEqual(Case.objects.get(pk=analyzed.pk).latest_analysis.summary, 'Model summary')
+        sources = dict(CaseAnalysisResult.objects.values_list('case_id', 'analysis_source'))
+        self.assertEqual(sources, {analyzed.pk: 'ai', fallback.pk: 'local'})
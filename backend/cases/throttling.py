@@ -0,0 +1,283 @@
+"""Rate limiting and a circuit breaker for outbound model calls.
+
+Every Gemini request made by ``cases.analysis`` first takes a token from a
+per-process bucket refilled at ``settings.ANALYSIS_RATE_LIMIT`` requests per
+second, so a batch spread over several worker threads stays under the
+provider's quota instead of tripping 429s. With ``ANALYSIS_PROVIDER_RPM`` set
+it also counts against a per-minute quota shared by every process through
+the cache.
+
+The circuit breaker (``get_circuit_breaker``) keeps its state in the cache as
+well. It opens after a rate-limit error or ``FAILURE_THRESHOLD`` consecutive
+failures; while open, callers skip the model entirely. After an exponential
+backoff with jitter (or the provider's own retry delay, if longer) a single
+trial call is let through: success closes the circuit, failure reopens it for
+twice as long. Sharing across processes needs a shared ``CACHE_BACKEND``; with
+the default in-process cache each process has its own breaker and quota.
+"""
+import datetime
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available; return the seconds to wait otherwise (0 on success)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Block until a token is available. Returns False if ``timeout`` seconds pass first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_model_bucket():
+    """Return the process-wide bucket for model calls, or None when limiting is off."""
+    global _bucket
+    rate = float(getattr(settings, 'ANALYSIS_RATE_LIMIT', 0) or 0)
+    if rate <= 0:
+        return None
+    if _bucket is None or _bucket.rate != rate:
+        with _bucket_lock:
+            if _bucket is None or _bucket.rate != rate:
+                _bucket = TokenBucket(rate)
+    return _bucket
+
+
+class SharedQuota:
+    """At most ``limit`` calls per ``period`` seconds across every process sharing ``cache``.
+
+    Calls are counted in fixed windows with ``cache.incr``, which is atomic
+    on the shared backends (Redis, Memcached, database).
+    """
+
+    def __init__(self, limit, cache, period=60, key='model-quota'):
+        self.limit = int(limit)
+        self.cache = cache
+        self.period = period
+        self.key = key
+
+    def _window_key(self, window):
+        return f'{self.key}:{window}'
+
+    def try_acquire(self):
+        """Count a call if the window has room; return the seconds to wait otherwise (0 on success)."""
+        now = time.time()
+        window = int(now // self.period)
+        key = self._window_key(window)
+        self.cache.add(key, 0, timeout=self.period * 2)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            self.cache.add(key, 1, timeout=self.period * 2)
+            count = 1
+        if count <= self.limit:
+            return 0.0
+        # Jitter so waiting workers do not all retry on the window boundary
+        return (window + 1) * self.period - now + random.uniform(0, 1)
+
+    def used(self):
+        return self.cache.get(self._window_key(int(time.time() // self.period)), 0)
+
+    def acquire(self, timeout=None):
+        """Block until the window has room. Returns False if ``timeout`` seconds pass first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+def get_provider_quota():
+    """Return the cache-shared per-minute quota for model calls, or None when it is off."""
+    limit = int(getattr(settings, 'ANALYSIS_PROVIDER_RPM', 0) or 0)
+    if limit <= 0:
+        return None
+    return SharedQuota(limit, caches[_circuit_config().get('CACHE', 'default')])
+
+
+def acquire_model_slot(timeout=None):
+    """Wait for permission to call the model; False if it did not come within ``timeout``."""
+    bucket = get_model_bucket()
+    quota = get_provider_quota()
+    if bucket is None and quota is None:
+        return True
+    if timeout is None:
+        timeout = getattr(settings, 'ANALYSIS_RATE_LIMIT_TIMEOUT', 30)
+    deadline = time.monotonic() + timeout
+    if bucket is not None and not bucket.acquire(timeout=timeout):
+        return False
+    return quota is None or quota.acquire(timeout=max(0.0, deadline - time.monotonic()))
+
+
+_RETRY_DELAY_RES = (
+    re.compile(r'retry in ([0-9.]+)\s*s', re.IGNORECASE),
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*([0-9]+)'),
+)
+
+
+def retry_delay(error):
+    """Seconds the provider asked us to wait in ``error``, or None."""
+    delay = getattr(error, 'retry_delay', None)
+    if isinstance(delay, (int, float)):
+        return float(delay)
+    msg = str(error) if error else ''
+    for pattern in _RETRY_DELAY_RES:
+        match = pattern.search(msg)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker whose state lives in a (shared) cache.
+
+    Updates are read-modify-write, so concurrent failures in different
+    processes may be counted once; that only delays opening by a call or two.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, cache, failure_threshold=5, reset_timeout=30, max_reset_timeout=600,
+                 probe_timeout=60):
+        self.key = f'circuit:{name}'
+        self.probe_key = f'circuit:{name}:probe'
+        self.cache = cache
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe_timeout = probe_timeout
+
+    def _load(self):
+        return self.cache.get(self.key) or {
+            'failures': 0, 'trips': 0, 'opened_at': None, 'open_until': None, 'last_error': '',
+        }
+
+    @classmethod
+    def _state(cls, data, now):
+        if data['open_until'] is None:
+            return cls.CLOSED
+        return cls.OPEN if now < data['open_until'] else cls.HALF_OPEN
+
+    def state(self):
+        return self._state(self._load(), time.time())
+
+    def allow(self):
+        """True if a call may go out now. In half-open state only one caller gets True."""
+        state = self.state()
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        return self.cache.add(self.probe_key, 1, timeout=self.probe_timeout)
+
+    def release(self):
+        """Give back a half-open trial slot that was not used (the call never went out)."""
+        self.cache.delete(self.probe_key)
+
+    def record_success(self):
+        data = self._load()
+        if data['failures'] or data['open_until'] is not None:
+            self.cache.delete(self.key)
+        self.cache.delete(self.probe_key)
+
+    def record_failure(self, error='', retry_after=None, trip=False):
+        """Count a failed call. ``trip`` (e.g. a 429) opens the circuit at once."""
+        now = time.time()
+        data = self._load()
+        state = self._state(data, now)
+        data['last_error'] = str(error)[:200]
+        if state == self.OPEN:
+            # A call that went out before the circuit opened
+            if retry_after:
+                data['open_until'] = max(data['open_until'], now + retry_after)
+        else:
+            data['failures'] += 1
+            if trip or state == self.HALF_OPEN or data['failures'] >= self.failure_threshold:
+                data['trips'] += 1
+                delay = min(self.max_reset_timeout, self.reset_timeout * 2 ** (data['trips'] - 1))
+                delay = delay / 2 + random.uniform(0, delay / 2)  # "equal jitter"
+                data.update(failures=0, opened_at=now, open_until=now + max(delay, retry_after or 0))
+        self.cache.set(self.key, data, timeout=None)
+        self.cache.delete(self.probe_key)
+
+    def retry_in(self):
+        """Seconds until the circuit lets a trial call through (0 unless open)."""
+        data = self._load()
+        return max(0.0, data['open_until'] - time.time()) if data['open_until'] is not None else 0.0
+
+    def snapshot(self):
+        data = self._load()
+        now = time.time()
+        return {
+            'state': self._state(data, now),
+            'consecutive_failures': data['failures'],
+            'trips': data['trips'],
+            'opened_at': (
+                datetime.datetime.fromtimestamp(data['opened_at'], datetime.timezone.utc).isoformat()
+                if data['opened_at'] else None
+            ),
+            'retry_in': round(max(0.0, data['open_until'] - now), 1) if data['open_until'] is not None else 0.0,
+            'last_error': data['last_error'],
+        }
+
+
+def _circuit_config():
+    return getattr(settings, 'ANALYSIS_CIRCUIT', {})
+
+
+def get_circuit_breaker():
+    """The breaker guarding Gemini calls, configured from ``settings.ANALYSIS_CIRCUIT``."""
+    config = _circuit_config()
+    return CircuitBreaker(
+        'gemini',
+        caches[config.get('CACHE', 'default')],
+        failure_threshold=config.get('FAILURE_THRESHOLD', 5),
+        reset_timeout=config.get('RESET_TIMEOUT', 30),
+        max_reset_timeout=config.get('MAX_RESET_TIMEOUT', 600),
+    )
@@ -3,6 +3,8 @@ from rest_framework.routers import DefaultRouter
 from . import views
 
 router = DefaultRouter()
+# Register jobs before the catch-all case routes so 'jobs/' is not read as a case pk
+router.register(r'jobs', views.AnalysisJobViewSet, basename='analysis-job')
 router.register(r'', views.CaseViewSet, basename='case')
 
 urlpatterns = [
@@ -2,19 +2,31 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime
+from .models import Case, Comment, Document, AnalysisJob
+from .serializers import (
+    CaseSerializer, CaseListSerializer, DocumentSerializer, CommentSerializer, AnalysisJobSerializer,
+    CaseAnalysisResultSerializer,
+)
+from core import gemini
+from . import analysis_cache, similarity, singleflight, stats, throttling
+from .analysis import (
+    ANALYSIS_LANGUAGES, INDIAN_STATES, generate_analysis, is_api_key_missing, save_analysis, save_local_analysis,
+)
+from .jobs import enqueue_analysis, enqueue_batch, estimate_eta
+from .importer import FORMATS as IMPORT_FORMATS, CaseImporter, detect_format, iter_records
+from .exporter import FORMATS as EXPORT_FORMATS, CSVExportRenderer, JSONLExportRenderer, iter_export, parse_columns
+from .filters import apply_case_filters, visible_cases
+from .search import search_cases
+from .facets import DEFAULT_LIMIT as FACET_LIMIT, MAX_LIMIT as MAX_FACET_LIMIT, cached_facets
+from .pagination import CaseCursorPagination
 from django.conf import settings
-import json
-from .models import Case, Document, Analysis, Comment
-from .serializers import CaseSerializer, DocumentSerializer, CommentSerializer
-from django.utils.module_loading import import_string
-from django.db import transaction
-import threading
-
-# Optional import of IntegrationSetting (DB-stored config) without hard failure
-try:
-    from chat.models import IntegrationSetting
-except Exception:  # pragma: no cover - optional dependency during migrations
-    IntegrationSetting = None
+from django.db.models import Count, Prefetch, Q
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -23,443 +35,74 @@ class IsOwnerOrAdmin(permissions.BasePermission):
 class CaseViewSet(viewsets.ModelViewSet):
     serializer_class = CaseSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    pagination_class = CaseCursorPagination
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CaseListSerializer
+        return CaseSerializer
 
     def get_queryset(self):
-        queryset = Case.objects.all()
-        if not self.request.user.is_staff:
-            queryset = queryset.filter(created_by=self.request.user)
-        
-        status = self.request.query_params.get('status', None)
-        category = self.request.query_params.get('category', None)
-        case_id = self.request.query_params.get('case_id', None)
-        
-        if status:
-            queryset = queryset.filter(status=status)
-        if category:
-            queryset = queryset.filter(category=category)
-        if case_id:
-            queryset = queryset.filter(case_id__iexact=case_id)
-            
+        queryset = apply_case_filters(visible_cases(self.request.user), self.request.query_params)
+
+        if self.action == 'list':
+            # Only fetch the columns/relations named by ?fields= / ?expand=
+            queryset = CaseListSerializer.optimize_queryset(queryset, self.request)
+        else:
+            # Load every relation CaseSerializer touches up front so the full
+            # payload costs a fixed number of queries.
+            queryset = queryset.select_related('created_by', 'assigned_to', 'latest_analysis').prefetch_related(
+                'documents',
+                Prefetch('comments', queryset=Comment.objects.select_related('user')),
+            )
         return queryset.order_by('-created_at')
 
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+
+        # Full-text search: best matches first, each with its rank and a
+        # highlighted snippet. CASE_SEARCH_MAX_RESULTS per page; a full page
+        # links to the next one (?offset=) in the Link header.
+        try:
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            offset = -1
+        if offset < 0:
+            return Response({'error': 'offset must be a non-negative integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = getattr(settings, 'CASE_SEARCH_MAX_RESULTS', 100)
+        queryset = self.get_queryset()
+        hits = search_cases(queryset, query, limit=limit, offset=offset)
+        headers = {}
+        if len(hits) == limit:
+            next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        cases = queryset.in_bulk([hit.case_id for hit in hits])
+        hits = [hit for hit in hits if hit.case_id in cases]  # deleted since the search ran
+        data = self.get_serializer([cases[hit.case_id] for hit in hits], many=True).data
+        for item, hit in zip(data, hits):
+            item['search_rank'] = hit.rank
+            item['search_snippet'] = hit.snippet
+        return Response(data, headers=headers)
+
     def perform_create(self, serializer):
         # Generate case ID
         import uuid
         case_id = f"CASE-{uuid.uuid4().hex[:8].upper()}"
         case = serializer.save(created_by=self.request.user, case_id=case_id)
+        options = {
+            'country': (self.request.data.get('country') or '').strip(),
+            'state': (self.request.data.get('state') or '').strip(),
+            'city': (self.request.data.get('city') or '').strip(),
+            'pincode': (self.request.data.get('pincode') or '').strip(),
+            'language': (self.request.data.get('language') or 'English').strip(),
+        }
 
-        # Auto-analyze asynchronously to avoid blocking create response
-        country = (self.request.data.get('country') or '').strip()
-        state = (self.request.data.get('state') or '').strip()
-        city = (self.request.data.get('city') or '').strip()
-        pincode = (self.request.data.get('pincode') or '').strip()
-
-        def do_background_analysis(case_pk, country, state, city, pincode):
-            from django.db import close_old_connections
-            close_old_connections()
-            try:
-                c = Case.objects.get(pk=case_pk)
-                analysis_data = self._generate_analysis(
-                    title=c.title,
-                    accused_name='',
-                    description=c.description,
-                    country=country,
-                    state=state,
-                    city=city,
-                    pincode=pincode,
-                    files_summary=[],
-                )
-                if isinstance(analysis_data, dict) and not (
-                    'error' in analysis_data and 'raw' not in analysis_data and analysis_data['error'] == 'Gemini API key not configured'
-                ):
-                    self._apply_analysis_to_case(c, analysis_data if isinstance(analysis_data, dict) else {})
-                    if 'keywords' in analysis_data:
-                        Analysis.objects.update_or_create(
-                            case=c,
-                            defaults={
-                                'keywords': analysis_data.get('keywords', []),
-                                'sentiment': analysis_data.get('sentiment'),
-                                'category_confidence': analysis_data.get('category_confidence', {}),
-                                'summary': analysis_data.get('summary', '')
-                            }
-                        )
-            except Exception:
-                pass
-            finally:
-                close_old_connections()
-
-        def schedule():
-            t = threading.Thread(target=do_background_analysis, args=(case.pk, country, state, city, pincode), daemon=True)
-            t.start()
-
-        transaction.on_commit(schedule)
-
-    # -------- Helper methods for analysis (generation, normalization, persistence) --------
-    def _normalize_analysis(self, analysis_data, country, state, city, pincode):
-        if analysis_data is None:
-            return {'raw': '', 'error': 'No analysis data'}
-
-        if isinstance(analysis_data, dict) and 'raw' not in analysis_data:
-            analysis_data.setdefault('country', country)
-            analysis_data.setdefault('state', state)
-            analysis_data.setdefault('city', city)
-            analysis_data.setdefault('pincode', pincode)
-            analysis_data.setdefault('language', '')
-            analysis_data.setdefault('keywords', [])
-            # Coerce sentiment to float within [-1, 1]
-            try:
-                s = float(analysis_data.get('sentiment', 0))
-                analysis_data['sentiment'] = max(-1.0, min(1.0, s))
-            except Exception:
-                analysis_data['sentiment'] = 0.0
-            cc = analysis_data.get('category_confidence') or {}
-            for k in ['general', 'fraud', 'security', 'compliance', 'financial']:
-                try:
-                    v = float(cc.get(k, 0))
-                except Exception:
-                    v = 0.0
-                cc[k] = max(0.0, min(1.0, v))
-            analysis_data['category_confidence'] = cc
-            analysis_data.setdefault('summary', '')
-            # Legal sections - ensure list of objects
-            ls = analysis_data.get('legal_sections') or []
-            if not isinstance(ls, list):
-                ls = []
-            norm_ls = []
-            for item in ls:
-                if isinstance(item, dict):
-                    norm_ls.append({
-                        'section': str(item.get('section', '')),
-                        'description': str(item.get('description', '')),
-                        'citation': str(item.get('citation', '')) if item.get('citation') is not None else ''
-                    })
-                else:
-                    norm_ls.append({'section': str(item), 'description': '', 'citation': ''})
-            analysis_data['legal_sections'] = norm_ls
-            # Sanctions - ensure list with clamped confidence
-            sanc = analysis_data.get('sanction_recommendations') or []
-            if not isinstance(sanc, list):
-                sanc = []
-            norm_sanc = []
-            for item in sanc:
-                if isinstance(item, dict):
-                    try:
-                        conf = float(item.get('confidence', 0))
-                    except Exception:
-                        conf = 0.0
-                    norm_sanc.append({
-                        'code': str(item.get('code', '')),
-                        'name': str(item.get('name', '')),
-                        'description': str(item.get('description', '')),
-                        'confidence': max(0.0, min(1.0, conf))
-                    })
-            analysis_data['sanction_recommendations'] = norm_sanc
-            # Filing viability
-            fv = analysis_data.get('filing_viability') or {}
-            analysis_data['filing_viability'] = {
-                'viable': bool(fv.get('viable', False)),
-                'rationale': str(fv.get('rationale', '')),
-                'missing_evidence': fv.get('missing_evidence', []) if isinstance(fv.get('missing_evidence', []), list) else [],
-                'recommended_actions': fv.get('recommended_actions', []) if isinstance(fv.get('recommended_actions', []), list) else []
-            }
-            # Filing authorities - normalize list structure
-            fa = analysis_data.get('filing_authorities') or []
-            if not isinstance(fa, list):
-                fa = []
-            norm_fa = []
-            for item in fa:
-                if isinstance(item, dict):
-                    nums = item.get('phone_numbers', [])
-                    if not isinstance(nums, list):
-                        nums = [str(nums)] if nums else []
-                    nums = [str(n) for n in nums]
-                    norm_fa.append({
-                        'authority_type': str(item.get('authority_type', '')),
-                        'name': str(item.get('name', '')),
-                        'address': str(item.get('address', '')),
-                        'phone_numbers': nums,
-                        'online_portal': str(item.get('online_portal', '')),
-                        'jurisdiction': str(item.get('jurisdiction', '')),
-                        'how_to_file': str(item.get('how_to_file', '')),
-                        'notes': str(item.get('notes', '')),
-                    })
-            analysis_data['filing_authorities'] = norm_fa
-            # Future-oriented fields
-            ns = analysis_data.get('next_steps') or []
-            if not isinstance(ns, list):
-                ns = []
-            analysis_data['next_steps'] = [str(x) for x in ns][:15]
-            ep = analysis_data.get('evidence_priority') or []
-            if not isinstance(ep, list):
-                ep = []
-            # Expect items either strings or dicts {item, rationale}
-            norm_ep = []
-            for item in ep:
-                if isinstance(item, dict):
-                    norm_ep.append({
-                        'item': str(item.get('item', '')),
-                        'rationale': str(item.get('rationale', '')),
-                        'priority': str(item.get('priority', '')),
-                    })
-                else:
-                    norm_ep.append({'item': str(item), 'rationale': '', 'priority': ''})
-            analysis_data['evidence_priority'] = norm_ep[:20]
-            analysis_data['timeline_estimate'] = str(analysis_data.get('timeline_estimate', ''))[:200]
-        return analysis_data
-
-    def _apply_analysis_to_case(self, case, analysis_data):
-        if not isinstance(analysis_data, dict):
-            return
-        case.analysis_country = str(analysis_data.get('country', '') or '')
-        case.analysis_state = str(analysis_data.get('state', '') or '')
-        case.analysis_city = str(analysis_data.get('city', '') or '')
-        case.analysis_pincode = str(analysis_data.get('pincode', '') or '')
-        case.analysis_language = str(analysis_data.get('language', '') or '')
-        case.analysis_keywords = analysis_data.get('keywords', []) or []
-        case.analysis_sentiment = analysis_data.get('sentiment', 0.0)
-        case.analysis_category_confidence = analysis_data.get('category_confidence', {}) or {}
-        case.analysis_summary = analysis_data.get('summary', '') or ''
-        case.analysis_legal_sections = analysis_data.get('legal_sections', []) or []
-        case.analysis_sanction_recommendations = analysis_data.get('sanction_recommendations', []) or []
-        case.analysis_filing_viability = analysis_data.get('filing_viability', {}) or {}
-        case.analysis_filing_authorities = analysis_data.get('filing_authorities', []) or []
-        case.analysis_next_steps = analysis_data.get('next_steps', []) or []
-        case.analysis_evidence_priority = analysis_data.get('evidence_priority', []) or []
-        case.analysis_timeline_estimate = analysis_data.get('timeline_estimate', '') or ''
-        case.analyzed_at = timezone.now()
-        case.save(update_fields=[
-            'analysis_country', 'analysis_state', 'analysis_city', 'analysis_pincode',
-            'analysis_language', 'analysis_keywords', 'analysis_sentiment', 'analysis_category_confidence', 'analysis_summary',
-            'analysis_legal_sections', 'analysis_sanction_recommendations', 'analysis_filing_viability',
-            'analysis_filing_authorities', 'analysis_next_steps', 'analysis_evidence_priority', 'analysis_timeline_estimate', 'analyzed_at', 'updated_at'
-        ])
-
-    def _get_gemini_api_key(self):
-        try:
-            if IntegrationSetting is not None:
-                s = IntegrationSetting.objects.filter(name='GEMINI_API_KEY').first()
-                if s and s.value:
-                    return s.value
-        except Exception:
-            pass
-        return getattr(settings, 'GEMINI_API_KEY', None)
-
-    def _generate_analysis(self, title, accused_name, description, country, state, city, pincode, files_summary, language, enforce_india=True):
-        # Lazy import Gemini client and fallback if missing
-        try:
-            import google.generativeai as genai
-            has_gemini = True
-        except Exception:
-            has_gemini = False
-
-        # Fallback builder (also used for rate limits and other AI errors)
-        def build_fallback(reason: str):
-            import re
-            from collections import Counter
-
-            def top_keywords(text, n=7):
-                words = re.findall(r"[A-Za-z]{4,}", text or '')
-                common = [w.lower() for w in words]
-                counts = Counter(common)
-                return [w for w, _ in counts.most_common(n)]
-
-            base_text = f"{title} {description}"
-            kws = top_keywords(base_text)
-            summary = (description[:280] + '…') if len(description or '') > 280 else (description or '')
-            analysis_data = {
-                'country': country,
-                'state': state,
-                'city': city,
-                'pincode': pincode,
-                'language': language,
-                'keywords': kws,
-                'sentiment': 0.0,
-                'category_confidence': {
-                    'general': 0.6 if description else 0.0,
-                    'fraud': 0.2,
-                    'security': 0.1,
-                    'compliance': 0.1,
-                    'financial': 0.2,
-                },
-                'summary': summary or 'No description provided.',
-                'legal_sections': [],
-                'sanction_recommendations': [],
-                'filing_viability': {
-                    'viable': False,
-                    'rationale': f'Fallback used ({reason}). Provide more evidence and retry once AI availability improves.',
-                    'missing_evidence': ['supporting documents', 'witness statements'],
-                    'recommended_actions': ['compile documents', 'note chronology of events']
-                },
-                'filing_authorities': [],
-                'next_steps': ['Gather all available evidence', 'Prepare a chronological event log', 'Consult legal counsel for refinement'],
-                'evidence_priority': [
-                    {'item': 'Primary digital evidence', 'rationale': 'Directly supports core allegation', 'priority': 'high'},
-                    {'item': 'Witness statements', 'rationale': 'Corroborates incident timeline', 'priority': 'medium'}
-                ],
-                'timeline_estimate': 'Initial preparation 1-2 weeks; filing thereafter'
-            }
-            if (country or '').strip().lower() == 'india':
-                analysis_data['legal_sections'] = [
-                    {'section': 'IT Act, 2000', 'description': 'General provisions related to cyber offences', 'citation': ''}
-                ]
-                analysis_data['filing_authorities'] = [
-                    {
-                        'authority_type': 'Cyber Crime Portal',
-                        'name': 'National Cyber Crime Reporting Portal',
-                        'address': '',
-                        'phone_numbers': ['1930', '112'],
-                        'online_portal': 'https://cybercrime.gov.in',
-                        'jurisdiction': 'Pan-India',
-                        'how_to_file': 'File a complaint on the portal; attach evidence.',
-                        'notes': 'Fallback data shown while AI is unavailable.'
-                    }
-                ]
-            # Include a hint about fallback reason without breaking existing UI
-            analysis_data['fallback_reason'] = reason
-            return self._normalize_analysis(analysis_data, country, state, city, pincode)
-
-        if not has_gemini:
-            return build_fallback('no_ai_module')
-
-        # Resolve API key
-        api_key = self._get_gemini_api_key()
-        if not api_key:
-            return {'error': 'Gemini API key not configured'}
-
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
-
-        # Build case text
-        case_text = f"""
-        Title: {title}
-        Description: {description}
-        Country/Jurisdiction: {country or 'Not specified'}
-        State/Region: {state or 'Not specified'}
-        City: {city or 'Not specified'}
-        PIN/Postal Code: {pincode or 'Not specified'}
-        """
-        if accused_name:
-            case_text += f"\nAccused: {accused_name}"
-
-        files_context = "\n".join(files_summary) if files_summary else "No files attached"
-
-        # Enforce India-only analysis if requested
-        if enforce_india and (country or '').strip().lower() != 'india':
-            return {'error': 'Only India jurisdiction supported for AI analysis currently.'}
-
-        prompt = f"""
-        You are an expert legal advocate and case advisor specializing in Indian law (IPC, CrPC, IT Act, POCSO, SC/ST Act, DV Act, etc.). 
- COMPREHENSIVE CASE ANALYSIS REPORT - Provide detailed guidance on ALL these aspects:
-1 JUSTICE: Case validity, cognizable offense?, legal remedy, expected outcome, victim rights
-2 POLICE ACTION: Jurisdiction, FIR vs NCR, what to tell police, police obligations, if refused
-3 FIR FILING: Can file?, sections apply, where/how/when to file, sample draft
-4 PROTECTION: Safety steps, legal protection, court orders, emergency contacts
-5 LEGAL GUIDANCE: Applicable laws, procedure flow, rights, do/donts, lawyer timing
-6 COMPENSATION: Schemes CrPC 357A, application process, amount, timeline
-7 CASE STRENGTH: Current strength, evidence priority, missing evidence
-Analysis Requirements (All in {language or 'English'}):
-        1) Extract top 5-7 keywords relevant to the legal case
-        2) Provide sentiment score in [-1.0, 1.0] (severity assessment)
-        3) Category confidence for: general, fraud, security, compliance, financial (values in [0,1])
-        4) Write a clear 2-3 sentence summary as an advocate would present it
-        5) Legal sections (statutes/acts) applicable in the given country relevant to the facts
-          6) Sanction recommendations (section/code, description, confidence) based on the country’s legal framework
-          7) Filing viability assessment: whether evidence is sufficient to file a case now; list missing evidence if any; and recommended next actions
-          8) Filing authorities for the specified location (where to file). If country is India, include appropriate authority with helpline and official portal:
-              - Police Station (local jurisdiction)
-              - State Cyber Crime Cell and the national portal https://cybercrime.gov.in
-              - Emergency helpline 112; financial cyber fraud helpline 1930
-              For other countries, provide equivalent authorities and official portals. Do NOT fabricate specific addresses. If exact address is unknown, leave it blank and provide steps to find the nearest office.
-                    9) Provide an ordered list of 5-10 next_steps (concise actionable directives) each in target language.
-                    10) Provide evidence_priority list (each item with item, rationale, priority high|medium|low).
-                    11) Provide a concise timeline_estimate string describing expected phases (investigation, filing, preliminary hearing) with rough durations.
-
-        Case Details:
-        {case_text}
-
-        Files Provided:
-        {files_context}
-
-        Strict JSON output only (no markdown, no comments). Use this schema:
-        {{
-            "country": "{country}",
-            "state": "{state}",
-            "city": "{city}",
-            "pincode": "{pincode}",
-            "language": "{language}",
-            "keywords": ["keyword1", "keyword2", "keyword3"],
-            "sentiment": 0.0,
-            "category_confidence": {{
-                "general": 0.0,
-                "fraud": 0.0,
-                "security": 0.0,
-                "compliance": 0.0,
-                "financial": 0.0
-            }},
-            "summary": "Clear incident summary as an advocate would present it",
-            "legal_sections": [
-                {{ "section": "Act/Code §number", "description": "what it covers and why it applies", "citation": "if applicable" }}
-            ],
-            "sanction_recommendations": [
-                {{ "code": "section or charge code", "name": "offence name", "description": "why this charge applies", "confidence": 0.0 }}
-            ],
-            "filing_viability": {{
-                "viable": false,
-                "rationale": "advocate's assessment of case strength",
-                "missing_evidence": ["specific document A", "witness statement B", "digital evidence C"],
-                "recommended_actions": ["File FIR at local police station within 24 hours", "Preserve all digital evidence immediately", "Get medical examination if applicable", "Notify bank/financial institution", "Document all losses with receipts"]
-            }},
-            "filing_authorities": [
-                {{
-                    "authority_type": "Police Station | Cyber Crime Cell | Magistrate Court | Other",
-                    "name": "official name if known",
-                    "address": "leave blank if unknown",
-                    "phone_numbers": ["112", "1930"],
-                    "online_portal": "https://...",
-                    "jurisdiction": "area covered",
-                    "how_to_file": "steps to file",
-                    "notes": "caveats"
-                }}
-            ],
-            "next_steps": ["Action step 1", "Action step 2"],
-            "evidence_priority": [{{"item": "Evidence item", "rationale": "Why important", "priority": "high"}}],
-            "timeline_estimate": "Investigation 2 weeks; filing 1 week; preliminary hearing 1-2 months"
-        }}
-        """
-
-        try:
-            response = model.generate_content(prompt)
-            response_text = getattr(response, 'text', None) or str(response)
-            response_text = response_text.strip()
-        except Exception as e:
-            msg = str(e) if e else ''
-            if '429' in msg or 'Resource exhausted' in msg or 'rate' in msg.lower() or 'quota' in msg.lower():
-                return build_fallback('rate_limited')
-            # Network or API errors: graceful fallback as well
-            return build_fallback('ai_error')
-        if response_text.startswith('```json'):
-            response_text = response_text[len('```json'):]
-        if response_text.startswith('```'):
-            response_text = response_text[len('```'):]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        analysis_data = None
-        try:
-            analysis_data = json.loads(response_text)
-        except Exception:
-            try:
-                start = response_text.find('{')
-                end = response_text.rfind('}')
-                if start != -1 and end != -1 and end > start:
-                    analysis_data = json.loads(response_text[start:end+1])
-            except Exception:
-                pass
-        if analysis_data is None:
-            analysis_data = {'raw': response_text, 'error': 'Response was not structured JSON'}
-        return self._normalize_analysis(analysis_data, country, state, city, pincode)
+        # Local analysis now, so the response already has keywords and a summary;
+        # the queued model run (run_analysis_workers) replaces it when it finishes
+        save_local_analysis(case, **options)
+        enqueue_analysis(case, user=self.request.user, **options)
 
     @action(detail=True, methods=['post'])
     def upload_document(self, request, pk=None):
@@ -481,6 +124,13 @@ Analysis Requirements (All in {language or 'English'}):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def _wants_async(self, request):
+        """Opt-in async mode: ?async=1 or a `Prefer: respond-async` header."""
+        if request.query_params.get('async', '').lower() in ('1', 'true', 'yes'):
+            return True
+        prefer = request.headers.get('Prefer', '')
+        return 'respond-async' in [p.strip().lower() for p in prefer.split(',')]
+
     @action(detail=True, methods=['post'])
     def analyze(self, request, pk=None):
         case = self.get_object()
@@ -494,19 +144,38 @@ Analysis Requirements (All in {language or 'English'}):
         files_summary = [f"Case document: {d.file.name}" for d in case.documents.all()]
 
         language = request.data.get('language', 'English').strip()
-        # Indian states list for validation
-        indian_states = {
-            'andhra pradesh','arunachal pradesh','assam','bihar','chhattisgarh','goa','gujarat','haryana','himachal pradesh','jharkhand','karnataka','kerala','madhya pradesh','maharashtra','manipur','meghalaya','mizoram','nagaland','odisha','punjab','rajasthan','sikkim','tamil nadu','telangana','tripura','uttar pradesh','uttarakhand','west bengal','andaman and nicobar islands','chandigarh','dadra and nagar haveli and daman and diu','delhi','jammu and kashmir','ladakh','lakshadweep','puducherry'
-        }
-        if state and state.lower() not in indian_states:
+        if state and state.lower() not in INDIAN_STATES:
             return Response({'error': 'Invalid Indian state provided.'}, status=status.HTTP_400_BAD_REQUEST)
-        allowed_languages = {'English','Hindi','Bengali','Tamil','Telugu','Marathi','Gujarati','Kannada','Malayalam','Punjabi'}
-        if language not in allowed_languages:
-            return Response({'error': 'Unsupported language. Choose from: ' + ', '.join(sorted(allowed_languages))}, status=status.HTTP_400_BAD_REQUEST)
+        if language not in ANALYSIS_LANGUAGES:
+            return Response({'error': 'Unsupported language. Choose from: ' + ', '.join(sorted(ANALYSIS_LANGUAGES))}, status=status.HTTP_400_BAD_REQUEST)
         # Force country to India for now
         country = 'India'
 
-        analysis_data = self._generate_analysis(
+        if self._wants_async(request):
+            job = enqueue_analysis(
+                case,
+                user=request.user,
+                country=country,
+                state=state,
+                city=city,
+                pincode=pincode,
+                language=language,
+                files_summary=files_summary,
+            )
+            status_url = request.build_absolute_uri(reverse('analysis-job-detail', args=[job.pk]))
+            return Response(
+                {
+                    'job_id': job.pk,
+                    'state': job.state,
+                    'status_url': status_url,
+                    'eta_seconds': estimate_eta(job),
+                },
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': status_url, 'Preference-Applied': 'respond-async'},
+            )
+
+        meta = {}
+        analysis_data = generate_analysis(
             title=case.title,
             accused_name='',
             description=case.description,
@@ -517,36 +186,185 @@ Analysis Requirements (All in {language or 'English'}):
             files_summary=files_summary,
             language=language,
             enforce_india=True,
+            meta=meta,
         )
 
-        if isinstance(analysis_data, dict) and 'error' in analysis_data and 'raw' not in analysis_data and analysis_data['error'] == 'Gemini API key not configured':
+        if is_api_key_missing(analysis_data):
             return Response(analysis_data, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-        # Persist to Case
-        self._apply_analysis_to_case(case, analysis_data if isinstance(analysis_data, dict) else {})
-
-        # Also sync legacy Analysis one-to-one for backward compatibility if simple fields present
-        if isinstance(analysis_data, dict) and 'keywords' in analysis_data:
-            Analysis.objects.update_or_create(
-                case=case,
-                defaults={
-                    'keywords': analysis_data.get('keywords', []),
-                    'sentiment': analysis_data.get('sentiment'),
-                    'category_confidence': analysis_data.get('category_confidence', {}),
-                    'summary': analysis_data.get('summary', '')
-                }
-            )
+        # Persist as a new CaseAnalysisResult
+        save_analysis(case, analysis_data, meta)
 
         # Return the updated case payload
         return Response(self.get_serializer(case).data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Cases whose text is closest to this one (TF-IDF cosine), best first, each with ``similarity``."""
+        case = self.get_object()
+        if not similarity.similarity_available():
+            return Response({'error': 'Similar-case search needs numpy and scipy installed.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        try:
+            limit = min(50, max(1, int(request.query_params.get('k', 10))))
+        except ValueError:
+            return Response({'error': 'k must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        visible = visible_cases(request.user)
+        # Staff may see every case; everyone else only their own
+        allowed_ids = None if request.user.is_staff else list(visible.values_list('pk', flat=True))
+        hits = similarity.similar_cases(case, limit, allowed_ids)
+        cases = CaseListSerializer.optimize_queryset(visible, request).in_bulk([case_id for case_id, _ in hits])
+        hits = [(case_id, score) for case_id, score in hits if case_id in cases]
+        data = CaseListSerializer(
+            [cases[case_id] for case_id, _ in hits], many=True, context=self.get_serializer_context()
+        ).data
+        for item, (_, score) in zip(data, hits):
+            item['similarity'] = round(score, 4)
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def analyses(self, request, pk=None):
+        """Every analysis run for the case, newest first."""
+        case = self.get_object()
+        results = case.analysis_results.order_by('-version')
+        return Response(CaseAnalysisResultSerializer(results, many=True).data)
+
+    @action(detail=False, methods=['post'])
+    def analyze_batch(self, request):
+        """Queue analysis for many cases at once.
+
+        Body: ``case_ids`` (primary keys or ``CASE-...`` ids) plus the same
+        ``state``/``city``/``pincode``/``language`` options as ``analyze``.
+        Workers run the jobs under ``ANALYSIS_RATE_LIMIT`` and pack short cases
+        into shared requests; poll ``status_url`` for per-case progress.
+        """
+        case_ids = request.data.get('case_ids')
+        if not isinstance(case_ids, list) or not case_ids:
+            return Response({'error': 'case_ids must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        max_cases = getattr(settings, 'ANALYSIS_BATCH_MAX_CASES', 500)
+        if len(case_ids) > max_cases:
+            return Response({'error': f'At most {max_cases} cases per batch.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        state = (request.data.get('state') or '').strip()
+        language = (request.data.get('language') or 'English').strip()
+        if state and state.lower() not in INDIAN_STATES:
+            return Response({'error': 'Invalid Indian state provided.'}, status=status.HTTP_400_BAD_REQUEST)
+        if language not in ANALYSIS_LANGUAGES:
+            return Response({'error': 'Unsupported language. Choose from: ' + ', '.join(sorted(ANALYSIS_LANGUAGES))}, status=status.HTTP_400_BAD_REQUEST)
+
+        pks = {int(v) for v in case_ids if str(v).isdigit()}
+        codes = {str(v).strip().upper() for v in case_ids if not str(v).isdigit()}
+        cases = list(
+            visible_cases(request.user)
+            .filter(Q(pk__in=pks) | Q(case_id__in=codes))
+            .only('id', 'case_id')
+            .prefetch_related(Prefetch('documents', queryset=Document.objects.only('id', 'case_id', 'file')))
+            .order_by('id')
+        )
+        found = {c.pk for c in cases} | {c.case_id for c in cases}
+        not_found = [v for v in case_ids if (int(v) if str(v).isdigit() else str(v).strip().upper()) not in found]
+        if not cases:
+            return Response({'error': 'No matching cases found.', 'not_found': not_found}, status=status.HTTP_404_NOT_FOUND)
+
+        batch_id, jobs = enqueue_batch(
+            cases,
+            user=request.user,
+            files_by_case={c.pk: [f"Case document: {d.file.name}" for d in c.documents.all()] for c in cases},
+            country='India',
+            state=state,
+            city=(request.data.get('city') or '').strip(),
+            pincode=(request.data.get('pincode') or '').strip(),
+            language=language,
+        )
+        status_url = request.build_absolute_uri(reverse('analysis-job-batch', args=[batch_id]))
+        return Response(
+            {
+                'batch_id': batch_id,
+                'status_url': status_url,
+                'jobs': [{'case': j.case_id, 'case_id': j.case.case_id, 'job_id': j.pk, 'state': j.state} for j in jobs],
+                'not_found': not_found,
+            },
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': status_url},
+        )
+
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        """Create many cases from an uploaded CSV or JSONL ``file``.
+
+        Optional fields: ``format`` (``csv``/``jsonl``, default from the file
+        name), ``analyze`` to queue analysis for the imported cases, and the
+        ``state``/``city``/``pincode``/``language`` options used for it.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the cases as a "file" field.'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = (request.data.get('format') or detect_format(upload.name)).lower()
+        if fmt not in IMPORT_FORMATS:
+            return Response({'error': f"Unsupported format. Use one of: {', '.join(IMPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        analyze = str(request.data.get('analyze', '')).lower() in ('1', 'true', 'yes')
+        state = (request.data.get('state') or '').strip()
+        language = (request.data.get('language') or 'English').strip()
+        if analyze:
+            if state and state.lower() not in INDIAN_STATES:
+                return Response({'error': 'Invalid Indian state provided.'}, status=status.HTTP_400_BAD_REQUEST)
+            if language not in ANALYSIS_LANGUAGES:
+                return Response({'error': 'Unsupported language. Choose from: ' + ', '.join(sorted(ANALYSIS_LANGUAGES))}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = CaseImporter(
+            request.user,
+            chunk_size=getattr(settings, 'CASE_IMPORT_CHUNK_SIZE', 500),
+            analyze=analyze,
+            analysis_options={
+                'country': 'India',
+                'state': state,
+                'city': (request.data.get('city') or '').strip(),
+                'pincode': (request.data.get('pincode') or '').strip(),
+                'language': language,
+            },
+        )
+        summary = importer.run(iter_records(upload, fmt))
+        if summary['batch_id']:
+            summary['status_url'] = request.build_absolute_uri(reverse('analysis-job-batch', args=[summary['batch_id']]))
+        code = status.HTTP_201_CREATED if summary['created'] else status.HTTP_400_BAD_REQUEST
+        return Response(summary, status=code)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=[CSVExportRenderer, JSONLExportRenderer, *api_settings.DEFAULT_RENDERER_CLASSES],
+    )
+    def export(self, request):
+        """Stream every visible case as ``?format=csv`` (default) or ``?format=jsonl``.
+
+        Takes the list filters (``status``, ``category``, ``case_id``) and an
+        optional ``columns=a,b`` selection; analysis columns are only joined
+        when selected.
+        """
+        fmt = request.accepted_renderer.format if request.accepted_renderer.format in EXPORT_FORMATS else 'csv'
+        try:
+            columns = parse_columns(request.query_params.get('columns'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = apply_case_filters(visible_cases(request.user), request.query_params)
+        response = StreamingHttpResponse(
+            iter_export(queryset, fmt, columns),
+            content_type='text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8',
+        )
+        stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+        response['Content-Disposition'] = f'attachment; filename="cases-{stamp}.{fmt}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
     @action(detail=True, methods=['post'])
     def close(self, request, pk=None):
         case = self.get_object()
         case.status = Case.Status.CLOSED
         case.closed_at = timezone.now()
-        case.save()
-        
+        case.save(update_fields=['status', 'closed_at', 'updated_at'])
+
         serializer = self.get_serializer(case)
         return Response(serializer.data)
 
@@ -587,6 +405,95 @@ Analysis Requirements (All in {language or 'English'}):
             pass
         return response
 
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Counts per keyword, legal section, category and status over the visible cases.
+
+        Takes the list filters plus ``since`` (ISO date or datetime, on
+        ``created_at``) and ``limit`` (keywords/sections returned).
+        """
+        params = request.query_params
+        filters = {name: params.get(name) for name in ('status', 'category', 'case_id', 'keyword', 'legal_section')}
+        queryset = apply_case_filters(visible_cases(request.user), filters)
+
+        since = (params.get('since') or '').strip()
+        if since:
+            try:
+                since_at = parse_datetime(since)
+                if since_at is None:
+                    since_date = parse_date(since)
+                    since_at = since_date and datetime.combine(since_date, datetime.min.time())
+            except ValueError:
+                since_at = None
+            if since_at is None:
+                return Response({'error': 'since must be an ISO date or datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since_at):
+                since_at = timezone.make_aware(since_at)
+            queryset = queryset.filter(created_at__gte=since_at)
+            filters['since'] = since_at.isoformat()
+
+        try:
+            limit = min(MAX_FACET_LIMIT, max(1, int(params.get('limit', FACET_LIMIT))))
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        scope = 'all' if request.user.is_staff else f'user:{request.user.pk}'
+        return Response(cached_facets(queryset, scope, filters, limit))
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def stats(self, request):
+        """Admin-only: case counts per status, category, priority and month.
+
+        Served from the CaseStatsDaily rollup; ``since``/``until`` (ISO dates,
+        inclusive) limit it to cases created in that range.
+        """
+        bounds = {}
+        for name in ('since', 'until'):
+            value = (request.query_params.get(name) or '').strip()
+            if not value:
+                continue
+            try:
+                bounds[name] = parse_date(value)
+            except ValueError:
+                bounds[name] = None
+            if bounds[name] is None:
+                return Response({'error': f'{name} must be an ISO date (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats.summarize(**bounds))
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def analysis_metrics(self, request):
+        """Admin-only: this process's analysis cache hit/miss and single-flight dedup counters."""
+        return Response({'cache': analysis_cache.get_stats(), 'single_flight': singleflight.get_stats()})
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def ai_health(self, request):
+        """Admin-only: Gemini availability, circuit breaker state and rate-limit usage.
+
+        ``status`` is ``ok``, ``degraded`` (circuit open or half-open: analyses
+        come from the local analyzer) or ``unavailable`` (no SDK or API key).
+        """
+        circuit = throttling.get_circuit_breaker().snapshot()
+        quota = throttling.get_provider_quota()
+        sdk = gemini.sdk_available()
+        api_key = bool(gemini.get_api_key())
+        if not (sdk and api_key):
+            health = 'unavailable'
+        elif circuit['state'] != throttling.CircuitBreaker.CLOSED:
+            health = 'degraded'
+        else:
+            health = 'ok'
+        return Response({
+            'status': health,
+            'sdk_available': sdk,
+            'api_key_configured': api_key,
+            'circuit': circuit,
+            'rate_limit': {
+                'per_process_rps': float(getattr(settings, 'ANALYSIS_RATE_LIMIT', 0) or 0),
+                'provider_rpm': quota.limit if quota else 0,
+                'provider_used_this_minute': quota.used() if quota else None,
+            },
+        })
+
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def analyze_upload(self, request):
         """
@@ -623,16 +530,12 @@ Analysis Requirements (All in {language or 'English'}):
         country = 'India'  # Force India for this public endpoint variant as per requirement
         state = request.data.get('state', '').strip()
         # Validation similar to detail analyze
-        indian_states = {
-            'andhra pradesh','arunachal pradesh','assam','bihar','chhattisgarh','goa','gujarat','haryana','himachal pradesh','jharkhand','karnataka','kerala','madhya pradesh','maharashtra','manipur','meghalaya','mizoram','nagaland','odisha','punjab','rajasthan','sikkim','tamil nadu','telangana','tripura','uttar pradesh','uttarakhand','west bengal','andaman and nicobar islands','chandigarh','dadra and nagar haveli and daman and diu','delhi','jammu and kashmir','ladakh','lakshadweep','puducherry'
-        }
-        if state and state.lower() not in indian_states:
+        if state and state.lower() not in INDIAN_STATES:
             return Response({'error': 'Invalid Indian state provided.'}, status=status.HTTP_400_BAD_REQUEST)
-        allowed_languages = {'English','Hindi','Bengali','Tamil','Telugu','Marathi','Gujarati','Kannada','Malayalam','Punjabi'}
-        if language not in allowed_languages:
-            return Response({'error': 'Unsupported language. Choose from: ' + ', '.join(sorted(allowed_languages))}, status=status.HTTP_400_BAD_REQUEST)
+        if language not in ANALYSIS_LANGUAGES:
+            return Response({'error': 'Unsupported language. Choose from: ' + ', '.join(sorted(ANALYSIS_LANGUAGES))}, status=status.HTTP_400_BAD_REQUEST)
 
-        analysis_data = self._generate_analysis(
+        analysis_data = generate_analysis(
             title=title,
             accused_name=accused_name,
             description=description,
@@ -645,7 +548,7 @@ Analysis Requirements (All in {language or 'English'}):
             enforce_india=True,
         )
 
-        if isinstance(analysis_data, dict) and 'error' in analysis_data and 'raw' not in analysis_data and analysis_data['error'] == 'Gemini API key not configured':
+        if is_api_key_missing(analysis_data):
             return Response(analysis_data, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         return Response(analysis_data, status=status.HTTP_200_OK)
@@ -654,3 +557,42 @@ Analysis Requirements (All in {language or 'English'}):
         # Use the detail action `analyze` to run and save analysis onto a specific Case.
 
 
+class AnalysisJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Poll the state of queued case analyses: GET /api/cases/jobs/{id}/"""
+    serializer_class = AnalysisJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CaseCursorPagination
+
+    def get_queryset(self):
+        queryset = AnalysisJob.objects.select_related('case')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(case__created_by=self.request.user)
+        case = self.request.query_params.get('case')
+        if case:
+            queryset = queryset.filter(case_id=case)
+        batch = self.request.query_params.get('batch')
+        if batch:
+            queryset = queryset.filter(batch_id=batch)
+        return queryset.order_by('-created_at')
+
+    @action(detail=False, methods=['get'], url_path=r'batches/(?P<batch_id>[0-9a-f-]{36})', url_name='batch')
+    def batch(self, request, batch_id=None):
+        """Progress of an analyze_batch call: state counts plus one entry per case."""
+        jobs = self.get_queryset().filter(batch_id=batch_id).order_by('id')
+        counts = {state: 0 for state in AnalysisJob.State.values}
+        counts.update(dict(jobs.order_by().values_list('state').annotate(n=Count('id'))))
+        if not any(counts.values()):
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'batch_id': batch_id,
+            'total': sum(counts.values()),
+            'counts': counts,
+            'finished': counts[AnalysisJob.State.QUEUED] == 0 and counts[AnalysisJob.State.RUNNING] == 0,
+            'jobs': self.get_serializer(jobs, many=True).data,
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        data = self.get_serializer(job).data
+        data['eta_seconds'] = estimate_eta(job)
+        return Response(data)
@@ -0,0 +1,169 @@
+"""Bounded conversation context for chat prompts.
+
+Only the last ``MAX_TURNS`` turns are replayed verbatim. Messages that fall
+out of that window are folded into ``ChatSession.summary``, a rolling,
+extractive summary that is updated incrementally (each message is folded
+once, tracked by ``summary_upto``). Each folded message becomes one line
+holding its lead sentences; structured (JSON) assistant replies are reduced
+to their prose fields and markdown is dropped. When the summary grows past
+``SUMMARY_MAX_CHARS`` its oldest lines are dropped whole and counted in a
+leading "[N earlier messages omitted]" line. The rendered context is then
+held to ``MAX_CHARS`` characters and roughly ``MAX_TOKENS`` tokens.
+
+Configure with ``settings.CHAT_CONTEXT``.
+"""
+import json
+import re
+
+from django.conf import settings
+
+from .models import ChatMessage, ChatSession
+
+DEFAULTS = {
+    'MAX_TURNS': 10,             # user + assistant pairs replayed verbatim
+    'MAX_CHARS': 12000,          # hard cap on the rendered history
+    'MAX_TOKENS': 3000,          # estimated at ~4 characters per token
+    'SUMMARY_MAX_CHARS': 2000,   # oldest summary lines are dropped beyond this
+    'SUMMARY_LINE_CHARS': 200,   # each folded message contributes one short line
+    'FOLD_BATCH': 100,           # old messages loaded per fold query
+}
+
+# Fields of a JSON reply that hold its prose, in order of preference
+PROSE_KEYS = ('summary', 'response', 'answer', 'message', 'text', 'content', 'rationale')
+
+_FENCE_RE = re.compile(r'```[a-z]*', re.I)
+_MARKDOWN_RE = re.compile(r'^\s*(?:#+|[-*•>]|\d+[.)])\s+|[*_`]{1,3}', re.M)
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_OMITTED_RE = re.compile(r'^\[(\d+) earlier messages omitted\]$')
+
+
+def _config():
+    return {**DEFAULTS, **(getattr(settings, 'CHAT_CONTEXT', None) or {})}
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _speaker(message):
+    return 'User' if message.is_user else 'Assistant'
+
+
+def _line(message):
+    return f"{_speaker(message)}: {' '.join((message.content or '').split())}"
+
+
+def _structured_prose(content):
+    """The prose of a JSON reply, or None when ``content`` is not JSON."""
+    if content[:1] not in ('{', '['):
+        return None
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    if isinstance(data, list):
+        return f'(structured reply with {len(data)} items)'
+    if not isinstance(data, dict):
+        return str(data)
+    for key in PROSE_KEYS:
+        value = data.get(key)
+        if isinstance(value, str) and value.strip():
+            return value
+    texts = [value for value in data.values() if isinstance(value, str) and value.strip()]
+    return ' '.join(texts) or f"(structured reply: {', '.join(map(str, list(data)[:6]))})"
+
+
+def condense(message, limit):
+    """One summary line for ``message``: its lead sentences, at most ``limit`` characters."""
+    content = _FENCE_RE.sub('', message.content or '').strip()
+    prose = _structured_prose(content)
+    text = ' '.join((prose if prose is not None else _MARKDOWN_RE.sub('', content)).split())
+    if len(text) > limit:
+        lead = ''
+        for sentence in _SENTENCE_RE.split(text):
+            if len(lead) + len(sentence) + 1 > limit:
+                break
+            lead = f'{lead} {sentence}'.strip()
+        text = lead or text[:limit].rsplit(' ', 1)[0] + '…'
+    return f'{_speaker(message)}: {text}'
+
+
+def _split_summary(summary):
+    """``(omitted_count, lines)`` of a stored summary."""
+    lines = [line for line in (summary or '').split('\n') if line]
+    match = _OMITTED_RE.match(lines[0]) if lines else None
+    if match:
+        return int(match.group(1)), lines[1:]
+    return 0, lines
+
+
+def _join_summary(omitted, lines, limit):
+    """Drop the oldest whole lines until the summary fits in ``limit`` characters."""
+    total = sum(len(line) + 1 for line in lines)
+    start = 0
+    while start < len(lines) and total > limit:
+        total -= len(lines[start]) + 1
+        start += 1
+    omitted += start
+    header = [f'[{omitted} earlier messages omitted]'] if omitted else []
+    return '\n'.join(header + lines[start:])
+
+
+def _fold(session, window_start_id, conf):
+    """Fold unsummarized messages older than the verbatim window into the summary."""
+    older = list(
+        ChatMessage.objects.filter(session=session, id__gt=session.summary_upto, id__lt=window_start_id)
+        .only('id', 'is_user', 'content')
+        .order_by('id')[:conf['FOLD_BATCH']]
+    )
+    if not older:
+        return 0
+    omitted, lines = _split_summary(session.summary)
+    lines += [condense(m, conf['SUMMARY_LINE_CHARS']) for m in older]
+    session.summary = _join_summary(omitted, lines, conf['SUMMARY_MAX_CHARS'])
+    session.summary_upto = older[-1].id
+    ChatSession.objects.filter(pk=session.pk).update(summary=session.summary, summary_upto=session.summary_upto)
+    return len(older)
+
+
+def build_context(session, exclude_id=None):
+    """Return the conversation context to embed in the next prompt."""
+    conf = _config()
+    max_messages = conf['MAX_TURNS'] * 2
+    qs = ChatMessage.objects.filter(session=session, id__gt=session.summary_upto)
+    if exclude_id is not None:
+        qs = qs.exclude(id=exclude_id)
+    # One extra row tells us whether anything older still needs folding
+    recent = list(qs.only('id', 'is_user', 'content').order_by('-id')[:max_messages + 1])
+    recent.reverse()
+    if len(recent) > max_messages:
+        # With MAX_TURNS = 0 nothing is replayed and everything up to the newest message is folded
+        window_start_id = recent[1].id if max_messages else recent[0].id + 1
+        recent = recent[1:]
+        # Fold in batches until caught up, so no message is skipped by the summary
+        while _fold(session, window_start_id, conf) == conf['FOLD_BATCH']:
+            pass
+
+    # Enforce the character/token budget, newest messages first
+    budget = min(conf['MAX_CHARS'], conf['MAX_TOKENS'] * 4)
+    summary = session.summary
+    if len(summary) > budget // 4:
+        summary = _join_summary(*_split_summary(summary), budget // 4)
+    remaining = budget - len(summary)
+    lines = []
+    for message in reversed(recent):
+        line = _line(message)
+        if len(line) > remaining:
+            if not lines:
+                lines.append(line[:max(remaining, 0)])
+            break
+        lines.append(line)
+        remaining -= len(line) + 1
+    lines.reverse()
+
+    parts = []
+    if summary:
+        parts.append(f"Summary of earlier conversation:\n{summary}")
+    if lines:
+        parts.append('\n'.join(lines))
+    return '\n\n'.join(parts)
@@ -0,0 +1,91 @@
+"""Cached read access to IntegrationSetting values.
+
+Settings such as GEMINI_API_KEY are read on every analysis and chat message
+but change rarely, so values are kept in a per-process cache and, when
+``settings.INTEGRATION_SETTINGS_CACHE`` names a cache alias, in that shared
+cache too. ``chat.signals`` invalidates both on save/delete. Other processes
+without a shared cache pick up changes once ``INTEGRATION_SETTINGS_TTL``
+seconds have passed.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+_MISSING = '__missing__'
+_lock = threading.Lock()
+_local = {}  # name -> (value or _MISSING, expires_at)
+
+
+def _ttl():
+    return getattr(settings, 'INTEGRATION_SETTINGS_TTL', 300)
+
+
+def _shared():
+    alias = getattr(settings, 'INTEGRATION_SETTINGS_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _shared_key(name):
+    return f"integration_setting:{name}"
+
+
+def get_many(names):
+    """Return ``{name: value}`` for ``names``; unset names map to None.
+
+    Costs at most one query for all names missing from the caches.
+    """
+    now = time.monotonic()
+    result = {}
+    missing = []
+    with _lock:
+        for name in names:
+            hit = _local.get(name)
+            if hit is not None and hit[1] > now:
+                result[name] = hit[0]
+            else:
+                missing.append(name)
+
+    # Only values fetched now are stamped: a local hit keeps its expiry
+    fetched = {}
+    shared = _shared()
+    if missing and shared is not None:
+        found = shared.get_many([_shared_key(n) for n in missing])
+        for name in list(missing):
+            if _shared_key(name) in found:
+                fetched[name] = found[_shared_key(name)]
+                missing.remove(name)
+
+    if missing:
+        from .models import IntegrationSetting
+
+        rows = dict(IntegrationSetting.objects.filter(name__in=missing).values_list('name', 'value'))
+        loaded = {name: rows.get(name) or _MISSING for name in missing}
+        fetched.update(loaded)
+        if shared is not None:
+            shared.set_many({_shared_key(n): v for n, v in loaded.items()}, _ttl())
+
+    result.update(fetched)
+    with _lock:
+        expires = time.monotonic() + _ttl()
+        for name, value in fetched.items():
+            _local[name] = (value, expires)
+    return {name: (None if value == _MISSING else value) for name, value in result.items()}
+
+
+def get_setting(name, default=None):
+    """Return the stored value of ``name`` or ``default`` when unset/blank."""
+    value = get_many([name])[name]
+    return value if value else default
+
+
+def invalidate(name=None):
+    """Drop ``name`` (or every setting) from the local and shared caches."""
+    with _lock:
+        names = [name] if name else list(_local)
+        for n in names:
+            _local.pop(n, None)
+    shared = _shared()
+    if shared is not None:
+        shared.delete_many([_shared_key(n) for n in names])
@@ -3,6 +3,9 @@ from django.conf import settings
 
 class ChatSession(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Rolling summary of turns that fell out of the prompt window (see chat.context)
+    summary = models.TextField(blank=True)
+    summary_upto = models.BigIntegerField(default=0)  # id of the last message folded into summary
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ChatMessageCursorPagination(CursorPagination):
+    """Newest messages first; follow ``next`` to load older ones."""
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
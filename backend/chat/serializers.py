@@ -17,13 +17,30 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         read_only_fields = ('is_user', 'created_at')
 
 class ChatSessionSerializer(serializers.ModelSerializer):
-    messages = ChatMessageSerializer(many=True, read_only=True)
+    """Session metadata only; messages are paged from the messages endpoint.
+
+    ``message_count``, ``last_message_preview`` and ``last_message_at`` come
+    from annotations added in the views (a freshly created session has none).
+    """
+    message_count = serializers.SerializerMethodField()
+    last_message_preview = serializers.SerializerMethodField()
+    last_message_at = serializers.SerializerMethodField()
 
     class Meta:
         model = ChatSession
-        fields = ('id', 'created_at', 'updated_at', 'messages')
+        fields = ('id', 'created_at', 'updated_at', 'message_count', 'last_message_preview', 'last_message_at')
         read_only_fields = ('created_at', 'updated_at')
 
+    def get_message_count(self, obj):
+        return getattr(obj, 'message_count', 0)
+
+    def get_last_message_preview(self, obj):
+        return getattr(obj, 'last_message_preview', None) or ''
+
+    def get_last_message_at(self, obj):
+        value = getattr(obj, 'last_message_at', None)
+        return serializers.DateTimeField().to_representation(value) if value else None
+
 
 class IntegrationSettingSerializer(serializers.ModelSerializer):
     class Meta:
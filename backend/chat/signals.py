@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import gemini
+from . import integrations
+from .models import IntegrationSetting
+
+
+@receiver(post_save, sender=IntegrationSetting)
+@receiver(post_delete, sender=IntegrationSetting)
+def invalidate_integration_setting(sender, instance, **kwargs):
+    integrations.invalidate(instance.name)
+    if instance.name == 'GEMINI_API_KEY':
+        # Models configured with the old key must not be reused
+        gemini.invalidate()
@@ -0,0 +1,128 @@
+"""Server-Sent Events streaming for chat replies.
+
+``POST /api/chat/sessions/{id}/messages/`` streams when the client sends
+``Accept: text/event-stream`` (or ``?stream=1``). Events, in order:
+
+* ``user_message`` - the saved user message
+* ``token``        - ``{"text": ...}`` for each chunk the model produces
+* ``done``         - ``{"ai_message": ...}`` once the full reply is saved
+* ``error``        - ``{"error": ...}`` if generation fails part way
+
+Under ASGI (``core/asgi.py``) the body is an async iterator, so an open
+stream holds no worker thread while it waits for the next chunk; under
+WSGI a plain generator is used.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from .models import ChatMessage
+from .serializers import ChatMessageSerializer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF content negotiation accept ``text/event-stream`` requests."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only reached for error responses; streams bypass rendering
+        return sse('error', data).encode(self.charset)
+
+
+def wants_event_stream(request):
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def strip_code_fences(text):
+    """Strip markdown code fences the model sometimes wraps replies in."""
+    text = (text or '').strip()
+    if text.startswith('```json'):
+        text = text[7:]
+    if text.startswith('```'):
+        text = text[3:]
+    if text.endswith('```'):
+        text = text[:-3]
+    return text.strip()
+
+
+def _chunk_text(chunk):
+    try:
+        return getattr(chunk, 'text', '') or ''
+    except Exception:  # blocked/empty candidates raise on .text
+        return ''
+
+
+def _save_reply(session, parts):
+    ai_message = ChatMessage.objects.create(
+        session=session, is_user=False, content=strip_code_fences(''.join(parts))
+    )
+    return ChatMessageSerializer(ai_message).data
+
+
+def _sync_events(session, user_message_data, model, prompt):
+    yield sse('user_message', user_message_data)
+    parts = []
+    try:
+        for chunk in model.generate_content(prompt, stream=True):
+            text = _chunk_text(chunk)
+            if text:
+                parts.append(text)
+                yield sse('token', {'text': text})
+    except Exception as e:
+        yield sse('error', {'error': str(e)})
+        return
+    yield sse('done', {'ai_message': _save_reply(session, parts)})
+
+
+async def _async_events(session, user_message_data, model, prompt):
+    yield sse('user_message', user_message_data)
+    parts = []
+    try:
+        if hasattr(model, 'generate_content_async'):
+            response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                text = _chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield sse('token', {'text': text})
+        else:
+            # Older SDKs only stream synchronously: pull each chunk in a thread
+            stream = await sync_to_async(model.generate_content, thread_sensitive=False)(prompt, stream=True)
+            chunks = iter(stream)
+            while True:
+                chunk = await sync_to_async(next, thread_sensitive=False)(chunks, None)
+                if chunk is None:
+                    break
+                text = _chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield sse('token', {'text': text})
+    except Exception as e:
+        yield sse('error', {'error': str(e)})
+        return
+    ai_message_data = await sync_to_async(_save_reply)(session, parts)
+    yield sse('done', {'ai_message': ai_message_data})
+
+
+def stream_reply(request, session, user_message, model, prompt):
+    """Return a StreamingHttpResponse that relays the model reply as SSE."""
+    user_message_data = ChatMessageSerializer(user_message).data
+    if isinstance(request._request, ASGIRequest):
+        events = _async_events(session, user_message_data, model, prompt)
+    else:
+        events = _sync_events(session, user_message_data, model, prompt)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+    return response
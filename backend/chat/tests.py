@@ -0,0 +1,339 @@
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core import gemini
+from . import integrations, views
+from .context import build_context, condense
+from .models import ChatMessage, ChatSession, IntegrationSetting
+from .serializers import ChatMessageSerializer
+from .streaming import _async_events
+
+
+class IntegrationSettingCacheTests(TestCase):
+    def setUp(self):
+        integrations.invalidate()
+        cache.clear()
+        self.setting = IntegrationSetting.objects.create(name='GEMINI_API_KEY', value='key-1')
+
+    def test_warm_cache_issues_no_queries(self):
+        self.assertEqual(integrations.get_setting('GEMINI_API_KEY'), 'key-1')
+        self.assertIsNone(integrations.get_setting('UNSET_KEY'))
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertEqual(integrations.get_setting('GEMINI_API_KEY'), 'key-1')
+                self.assertEqual(integrations.get_setting('UNSET_KEY', 'default'), 'default')
+
+    def test_get_many_loads_every_name_in_one_query(self):
+        IntegrationSetting.objects.create(name='OTHER_KEY', value='other')
+        with self.assertNumQueries(1):
+            values = integrations.get_many(['GEMINI_API_KEY', 'OTHER_KEY', 'UNSET_KEY'])
+        self.assertEqual(values, {'GEMINI_API_KEY': 'key-1', 'OTHER_KEY': 'other', 'UNSET_KEY': None})
+        with self.assertNumQueries(0):
+            integrations.get_many(['OTHER_KEY', 'GEMINI_API_KEY'])
+
+    def test_save_invalidates(self):
+        integrations.get_setting('GEMINI_API_KEY')
+        self.setting.value = 'key-2'
+        self.setting.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(integrations.get_setting('GEMINI_API_KEY'), 'key-2')
+        with self.assertNumQueries(0):
+            integrations.get_setting('GEMINI_API_KEY')
+
+    def test_delete_invalidates(self):
+        integrations.get_setting('GEMINI_API_KEY')
+        self.setting.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(integrations.get_setting('GEMINI_API_KEY', 'env-key'), 'env-key')
+
+    @override_settings(INTEGRATION_SETTINGS_TTL=300)
+    def test_warm_entry_is_reread_after_the_ttl(self):
+        clock = mock.patch.object(integrations.time, 'monotonic')
+        now = clock.start()
+        self.addCleanup(clock.stop)
+        now.return_value = 1000.0
+        integrations.get_setting('GEMINI_API_KEY')
+        # Changed by another process: no signal reaches this one
+        IntegrationSetting.objects.filter(pk=self.setting.pk).update(value='key-2')
+        now.return_value = 1200.0
+        with self.assertNumQueries(0):
+            self.assertEqual(integrations.get_setting('GEMINI_API_KEY'), 'key-1')
+        # Reading it did not extend the entry past 1300
+        now.return_value = 1301.0
+        with self.assertNumQueries(1):
+            self.assertEqual(integrations.get_setting('GEMINI_API_KEY'), 'key-2')
+
+    @override_settings(INTEGRATION_SETTINGS_CACHE='default')
+    def test_shared_cache_serves_other_processes(self):
+        integrations.get_setting('GEMINI_API_KEY')
+        with integrations._lock:
+            integrations._local.clear()  # as seen from a fresh process
+        with self.assertNumQueries(0):
+            self.assertEqual(integrations.get_setting('GEMINI_API_KEY'), 'key-1')
+        self.setting.value = 'key-2'
+        self.setting.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(integrations.get_setting('GEMINI_API_KEY'), 'key-2')
+
+
+class GeminiClientTests(TestCase):
+    def setUp(self):
+        integrations.invalidate()
+        cache.clear()
+        gemini.invalidate()
+        self.addCleanup(gemini.invalidate)
+        self.sdk = mock.Mock()
+        self.sdk.GenerativeModel.side_effect = lambda name: mock.Mock(model_name=name)
+        patcher = mock.patch.object(gemini, '_sdk', self.sdk)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.setting = IntegrationSetting.objects.create(name='GEMINI_API_KEY', value='key-1')
+
+    def test_model_is_built_once_per_key_and_name(self):
+        model = gemini.get_model()
+        self.assertIs(gemini.get_model(), model)
+        self.assertIs(gemini.get_model(gemini.DEFAULT_MODEL, api_key='key-1'), model)
+        other = gemini.get_model('gemini-1.5-pro')
+        self.assertIsNot(other, model)
+        self.assertIs(gemini.get_model('gemini-1.5-pro'), other)
+        self.assertEqual(self.sdk.GenerativeModel.call_count, 2)
+        self.sdk.configure.assert_called_once_with(api_key='key-1')
+
+    def test_changing_the_key_rebuilds_the_model(self):
+        model = gemini.get_model()
+        self.setting.value = 'key-2'
+        self.setting.save()
+        rebuilt = gemini.get_model()
+        self.assertIsNot(rebuilt, model)
+        self.assertIs(gemini.get_model(), rebuilt)
+        # Switching back must reconfigure the SDK, not reuse the model built under key-1
+        self.setting.value = 'key-1'
+        self.setting.save()
+        self.assertIsNot(gemini.get_model(), model)
+        self.assertEqual(self.sdk.configure.call_args_list, [
+            mock.call(api_key='key-1'), mock.call(api_key='key-2'), mock.call(api_key='key-1'),
+        ])
+
+    def test_saving_another_setting_keeps_the_model(self):
+        model = gemini.get_model()
+        IntegrationSetting.objects.create(name='OTHER_KEY', value='other')
+        self.assertIs(gemini.get_model(), model)
+        self.sdk.configure.assert_called_once()
+
+    def test_deleting_the_key_falls_back_to_settings(self):
+        gemini.get_model()
+        self.setting.delete()
+        with override_settings(GEMINI_API_KEY=None):
+            self.assertIsNone(gemini.get_model())
+        with override_settings(GEMINI_API_KEY='env-key'):
+            self.assertEqual(gemini.get_model().model_name, gemini.DEFAULT_MODEL)
+        self.assertEqual(self.sdk.configure.call_args, mock.call(api_key='env-key'))
+
+
+ASSISTANT_REPLY = json.dumps({
+    'summary': 'This looks like an advance-fee job scam. Report it on cybercrime.gov.in within a day.',
+    'legal_sections': [{'section': 'IPC 420', 'description': 'Cheating'}],
+    'next_steps': ['Call 1930', 'Freeze the account'],
+})
+
+
+@override_settings(CHAT_CONTEXT={'MAX_TURNS': 3, 'SUMMARY_MAX_CHARS': 600, 'SUMMARY_LINE_CHARS': 120})
+class ChatContextTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email='chat@example.com', username='chat', password='pw', first_name='Chat', last_name='User',
+        )
+        self.session = ChatSession.objects.create(user=user)
+
+    def add_turns(self, count, start=0):
+        for i in range(start, start + count):
+            ChatMessage.objects.create(
+                session=self.session, is_user=True,
+                content=f'Question {i}: I paid an advance for a job that never started. ' * 4,
+            )
+            ChatMessage.objects.create(session=self.session, is_user=False, content=ASSISTANT_REPLY)
+
+    def test_condense_keeps_lead_sentences_of_json_replies(self):
+        line = condense(ChatMessage(is_user=False, content=f'```json\n{ASSISTANT_REPLY}\n```'), 80)
+        self.assertEqual(line, 'Assistant: This looks like an advance-fee job scam.')
+        line = condense(ChatMessage(is_user=True, content='## Facts\n- **Paid** 5000 rupees\n- Got no job'), 200)
+        self.assertEqual(line, 'User: Facts Paid 5000 rupees Got no job')
+
+    def test_summary_is_cut_at_message_boundaries(self):
+        for start in range(0, 25, 5):  # 50 messages, folded as the conversation goes on
+            self.add_turns(5, start)
+            self.session.refresh_from_db()
+            build_context(self.session)
+        self.session.refresh_from_db()
+        lines = self.session.summary.split('\n')
+        self.assertRegex(lines[0], r'^\[\d+ earlier messages omitted\]$')
+        for line in lines[1:]:
+            self.assertTrue(line.startswith(('User: Question', 'Assistant: This looks like')), line)
+            self.assertNotIn('{', line)
+        self.assertLessEqual(len('\n'.join(lines[1:])), 600)
+        omitted = int(lines[0][1:].split()[0])
+        self.assertEqual(omitted + len(lines) - 1, 50 - 6)
+
+    def test_context_replays_recent_turns_verbatim(self):
+        self.add_turns(10)
+        context = build_context(self.session)
+        summary, recent = context.split('\n\n')
+        self.assertTrue(summary.startswith('Summary of earlier conversation:'))
+        self.assertEqual(len(recent.split('\n')), 6)
+        self.assertIn('Question 9', recent)
+        self.assertNotIn('Question 9', summary)
+
+    def test_context_fetches_a_bounded_number_of_rows(self):
+        self.add_turns(40)
+        build_context(self.session)
+        self.session.refresh_from_db()
+        with self.assertNumQueries(1):
+            build_context(self.session)
+
+    def test_backlog_larger_than_a_fold_batch_is_folded_without_a_gap(self):
+        self.add_turns(10)
+        conf = {'MAX_TURNS': 1, 'SUMMARY_MAX_CHARS': 100000, 'SUMMARY_LINE_CHARS': 40, 'FOLD_BATCH': 3}
+        with override_settings(CHAT_CONTEXT=conf):
+            build_context(self.session)
+        self.session.refresh_from_db()
+        lines = self.session.summary.split('\n')
+        self.assertEqual(len(lines), 18)
+        self.assertEqual([line.split(':')[1] for line in lines if line.startswith('User:')], [
+            f' Question {i}' for i in range(9)
+        ])
+        recent = list(ChatMessage.objects.filter(session=self.session).order_by('-id')[:2])
+        self.assertEqual(self.session.summary_upto, recent[-1].id - 1)
+
+    @override_settings(CHAT_CONTEXT={'MAX_TURNS': 0, 'SUMMARY_LINE_CHARS': 120})
+    def test_zero_turns_replays_nothing_and_folds_everything_else(self):
+        self.add_turns(3)
+        question = ChatMessage.objects.create(session=self.session, is_user=True, content='What now?')
+        context = build_context(self.session, exclude_id=question.id)
+        self.assertTrue(context.startswith('Summary of earlier conversation:\n'))
+        self.assertEqual(len(context.split('\n')), 1 + 6)
+        self.assertNotIn('What now?', context)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary_upto, question.id - 1)
+        self.assertEqual(build_context(ChatSession.objects.create(user=self.session.user)), '')
+
+
+class _Chunk:
+    def __init__(self, text):
+        self._text = text
+
+    @property
+    def text(self):
+        if self._text is None:
+            raise ValueError('response was blocked')
+        return self._text
+
+
+class _StreamingModel:
+    """Yields ``chunks`` (None for a blocked chunk); an Exception in them is raised at that point."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def _chunks(self):
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield _Chunk(chunk)
+
+    def generate_content(self, prompt, stream=False):
+        assert stream
+        return self._chunks()
+
+
+class _AsyncStreamingModel(_StreamingModel):
+    async def generate_content_async(self, prompt, stream=False):
+        assert stream
+
+        async def chunks():
+            for chunk in self._chunks():
+                yield chunk
+
+        return chunks()
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class ChatStreamingTests(TestCase):
+    reply = ['```json\n{"summary": ', None, '"Report it on ', 'cybercrime.gov.in"}\n```']
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='chat@example.com', username='chat', password='pw', first_name='Chat', last_name='User',
+        )
+        self.session = ChatSession.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, model):
+        with mock.patch.object(views.gemini, 'get_api_key', return_value='key'), \
+                mock.patch.object(views.gemini, 'get_model', return_value=model):
+            response = self.client.post(
+                f'/api/chat/sessions/{self.session.pk}/messages/', {'content': 'I lost money to a job scam'},
+                format='json', HTTP_ACCEPT='text/event-stream',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return parse_events(b''.join(response.streaming_content).decode())
+
+    def stream_async(self, model):
+        user_message = ChatMessage.objects.create(session=self.session, is_user=True, content='Hello')
+        data = ChatMessageSerializer(user_message).data
+
+        async def collect():
+            return ''.join([event async for event in _async_events(self.session, data, model, 'prompt')])
+
+        return parse_events(async_to_sync(collect)())
+
+    def assert_reply_streamed(self, events):
+        self.assertEqual([event for event, _ in events], ['user_message', 'token', 'token', 'token', 'done'])
+        self.assertEqual(''.join(data['text'] for event, data in events if event == 'token'), ''.join(
+            chunk for chunk in self.reply if chunk
+        ))
+        replies = ChatMessage.objects.filter(session=self.session, is_user=False)
+        self.assertEqual(len(replies), 1)
+        self.assertEqual(replies[0].content, '{"summary": "Report it on cybercrime.gov.in"}')
+        self.assertEqual(events[-1][1]['ai_message']['id'], replies[0].pk)
+
+    def assert_error_saves_nothing(self, events):
+        self.assertEqual([event for event, _ in events], ['user_message', 'token', 'error'])
+        self.assertEqual(events[-1][1], {'error': 'quota exceeded'})
+        self.assertFalse(ChatMessage.objects.filter(session=self.session, is_user=False).exists())
+
+    def test_sync_stream(self):
+        events = self.post(_StreamingModel(self.reply))
+        self.assertEqual(events[0][1]['content'], 'I lost money to a job scam')
+        self.assert_reply_streamed(events)
+
+    def test_sync_stream_error(self):
+        self.assert_error_saves_nothing(self.post(_StreamingModel(['Report it', RuntimeError('quota exceeded')])))
+
+    def test_async_stream(self):
+        for model in (_AsyncStreamingModel(self.reply), _StreamingModel(self.reply)):
+            with self.subTest(model=type(model).__name__):
+                ChatMessage.objects.all().delete()
+                self.assert_reply_streamed(self.stream_async(model))
+
+    def test_async_stream_error(self):
+        for model_class in (_AsyncStreamingModel, _StreamingModel):
+            with self.subTest(model=model_class.__name__):
+                ChatMessage.objects.all().delete()
+                self.assert_error_saves_nothing(
+                    self.stream_async(model_class(['Report it', RuntimeError('quota exceeded')]))
+                )
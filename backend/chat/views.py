@@ -2,17 +2,32 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
-from django.conf import settings
+from rest_framework.settings import api_settings
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Substr
+from core import gemini
 from .models import ChatSession, ChatMessage, ChatAttachment, IntegrationSetting
 from .serializers import ChatSessionSerializer, ChatMessageSerializer, IntegrationSettingSerializer
+from .context import build_context
+from .pagination import ChatMessageCursorPagination
+from .streaming import EventStreamRenderer, stream_reply, strip_code_fences, wants_event_stream
 import json
 
+def sessions_with_stats(user):
+    """User's sessions annotated with message count and last-message preview."""
+    last = ChatMessage.objects.filter(session=OuterRef('pk')).order_by('-created_at', '-id')
+    return ChatSession.objects.filter(user=user).annotate(
+        message_count=Count('messages'),
+        last_message_preview=Substr(Subquery(last.values('content')[:1]), 1, 120),
+        last_message_at=Subquery(last.values('created_at')[:1]),
+    )
+
 class ChatSessionListCreate(generics.ListCreateAPIView):
     serializer_class = ChatSessionSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return ChatSession.objects.filter(user=self.request.user)
+        return sessions_with_stats(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -22,11 +37,29 @@ class ChatSessionDetail(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return ChatSession.objects.filter(user=self.request.user)
+        return sessions_with_stats(self.request.user)
 
-class ChatMessageCreate(generics.CreateAPIView):
+class ChatMessageListCreate(generics.ListCreateAPIView):
+    """GET pages through a session's messages; POST sends a new one."""
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ChatMessageCursorPagination
+    # text/event-stream lets clients ask for the streamed (SSE) reply
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+    def get_queryset(self):
+        return ChatMessage.objects.filter(
+            session_id=self.kwargs['session_id'],
+            session__user=self.request.user,
+        ).prefetch_related('attachments')
+
+    def list(self, request, *args, **kwargs):
+        if not ChatSession.objects.filter(id=self.kwargs['session_id'], user=request.user).exists():
+            return Response(
+                {"error": "Chat session not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return super().list(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         try:
@@ -78,38 +111,18 @@ class ChatMessageCreate(generics.CreateAPIView):
                 )
                 attachments_summary.append(f"Audio file: {file.name}")
 
-        # Resolve GEMINI API key: prefer DB stored IntegrationSetting, otherwise fallback to settings
-        def get_gemini_api_key():
-            try:
-                s = IntegrationSetting.objects.filter(name='GEMINI_API_KEY').first()
-                if s and s.value:
-                    return s.value
-            except Exception:
-                pass
-            return getattr(settings, 'GEMINI_API_KEY', None)
-
-        api_key = get_gemini_api_key()
+        # Shared Gemini client: key lookup, SDK import and configure happen once per process
+        api_key = gemini.get_api_key()
         if not api_key:
             return Response({'error': 'Gemini API key not configured'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-        # Lazy import Gemini client to avoid protobuf import-time errors
         try:
-            import google.generativeai as genai
+            model = gemini.get_model(gemini.DEFAULT_MODEL, api_key=api_key)
         except Exception as e:
             return Response({'error': 'AI integration not available: %s' % str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
 
-        # Configure Gemini
-        genai.configure(api_key=api_key)
-        # Use a current available model
-        model = genai.GenerativeModel('gemini-2.0-flash')
-
-        # Get chat history for context (exclude the message we just saved)
-        history_qs = ChatMessage.objects.filter(session=session).order_by('created_at')
-        history = history_qs.exclude(id=user_message.id)
-        context = "\n".join([
-            f"{'User' if msg.is_user else 'Assistant'}: {msg.content}"
-            for msg in history
-        ])
+        # Bounded history: last turns verbatim plus a rolling summary of older ones
+        context = build_context(session, exclude_id=user_message.id)
 
         # Build attachments context
         attachments_context = "\n".join(attachments_summary) if attachments_summary else ""
@@ -131,6 +144,9 @@ class ChatMessageCreate(generics.CreateAPIView):
         and give legal or investigative guidance as appropriate for a case analysis system.
         """
 
+        if wants_event_stream(request):
+            return stream_reply(request, session, user_message, model, prompt)
+
         try:
             response = model.generate_content(prompt)
 
@@ -138,14 +154,7 @@ class ChatMessageCreate(generics.CreateAPIView):
             response_text = getattr(response, 'text', None) or str(response)
 
             # Strip markdown code fences if present
-            response_text = response_text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
+            response_text = strip_code_fences(response_text)
 
             # Save AI reply
             ai_message = ChatMessage.objects.create(session=session, is_user=False, content=response_text)
@@ -0,0 +1,90 @@
+"""Process-wide Gemini client shared by the cases and chat apps.
+
+``google.generativeai`` keeps one transport per ``configure()`` call and each
+``GenerativeModel`` creates its client on first use, so building them on every
+request re-imports the SDK, re-reads the API key and opens a new connection.
+This module does that work once per process and hands out a cached model per
+``(api_key, model_name)``. ``chat.signals`` calls ``invalidate()`` when the
+stored key changes.
+
+The SDK is still imported lazily to avoid protobuf import-time errors during
+migrations and management commands.
+"""
+import threading
+
+from django.conf import settings
+
+DEFAULT_MODEL = 'gemini-2.0-flash'
+
+_lock = threading.RLock()
+_UNSET = object()
+_sdk = _UNSET
+_configured_key = None
+_models = {}
+
+
+def get_sdk():
+    """Return the imported ``google.generativeai`` module or None if unavailable."""
+    global _sdk
+    if _sdk is _UNSET:
+        with _lock:
+            if _sdk is _UNSET:
+                try:
+                    import google.generativeai as genai
+                except Exception:
+                    genai = None
+                _sdk = genai
+    return _sdk
+
+
+def sdk_available():
+    return get_sdk() is not None
+
+
+def get_api_key():
+    """Return the Gemini API key: the DB IntegrationSetting, else settings.
+
+    The DB value comes from the cached ``chat.integrations`` accessor, so this
+    does not hit the database once warm.
+    """
+    try:
+        from chat import integrations
+
+        value = integrations.get_setting('GEMINI_API_KEY')
+        if value:
+            return value
+    except Exception:
+        pass
+    return getattr(settings, 'GEMINI_API_KEY', None)
+
+
+def get_model(model_name=DEFAULT_MODEL, api_key=None):
+    """Return a configured, reusable ``GenerativeModel``.
+
+    Returns None when no API key is configured and raises ImportError when the
+    SDK is not installed.
+    """
+    genai = get_sdk()
+    if genai is None:
+        raise ImportError('google.generativeai is not installed')
+    key = api_key or get_api_key()
+    if not key:
+        return None
+    global _configured_key
+    with _lock:
+        model = _models.get((key, model_name))
+        if model is None:
+            if _configured_key != key:
+                genai.configure(api_key=key)
+                _configured_key = key
+            model = genai.GenerativeModel(model_name)
+            _models[(key, model_name)] = model
+    return model
+
+
+def invalidate():
+    """Forget the configured models, e.g. after the admin changes the key."""
+    global _configured_key
+    with _lock:
+        _configured_key = None
+        _models.clear()
@@ -67,6 +67,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+# ASGI entry point (e.g. `uvicorn core.asgi:application`); needed for streamed chat replies at scale
+ASGI_APPLICATION = 'core.asgi.application'
 
 # Database
 # Read DB env vars with sensible defaults so local `.env` or environment
@@ -179,5 +181,88 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Cache (in-process by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# cache such as Redis or the DB cache table when running several workers)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'case-analysis'),
+    }
+}
+
 # Gemini API settings
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
\ No newline at end of file
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+# Chat prompt history window (see chat/context.py)
+CHAT_CONTEXT = {
+    'MAX_TURNS': int(os.getenv('CHAT_CONTEXT_MAX_TURNS', 10)),
+    'MAX_CHARS': int(os.getenv('CHAT_CONTEXT_MAX_CHARS', 12000)),
+    'MAX_TOKENS': int(os.getenv('CHAT_CONTEXT_MAX_TOKENS', 3000)),
+}
+
+# IntegrationSetting values are cached per process for this many seconds;
+# name a cache alias to also share them between processes
+INTEGRATION_SETTINGS_TTL = int(os.getenv('INTEGRATION_SETTINGS_TTL', 300))
+INTEGRATION_SETTINGS_CACHE = os.getenv('INTEGRATION_SETTINGS_CACHE') or None
+
+# Background analysis workers (see `manage.py run_analysis_workers`)
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 2))
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_JOB_MAX_ATTEMPTS', 3))
+ANALYSIS_JOB_LEASE_SECONDS = int(os.getenv('ANALYSIS_JOB_LEASE_SECONDS', 300))
+ANALYSIS_JOB_RETRY_DELAY = int(os.getenv('ANALYSIS_JOB_RETRY_DELAY', 30))
+# Gemini requests per second per process (0 disables) and how long a call may wait for a slot
+ANALYSIS_RATE_LIMIT = float(os.getenv('ANALYSIS_RATE_LIMIT', 1))
+ANALYSIS_RATE_LIMIT_TIMEOUT = int(os.getenv('ANALYSIS_RATE_LIMIT_TIMEOUT', 30))
+# Provider quota in requests per minute, shared by all processes through the cache (0 disables)
+ANALYSIS_PROVIDER_RPM = int(os.getenv('ANALYSIS_PROVIDER_RPM', 0))
+# Identical analyses running at the same time share one model call (see cases/singleflight.py):
+# waiters give up after WAIT_TIMEOUT seconds, the result is kept RESULT_TTL seconds for other processes
+ANALYSIS_SINGLE_FLIGHT = {
+    'ENABLED': os.getenv('ANALYSIS_SINGLE_FLIGHT_ENABLED', 'True') == 'True',
+    'CACHE': os.getenv('ANALYSIS_SINGLE_FLIGHT_CACHE', 'default'),
+    'LOCK_TIMEOUT': int(os.getenv('ANALYSIS_SINGLE_FLIGHT_LOCK_TIMEOUT', 120)),
+    'WAIT_TIMEOUT': int(os.getenv('ANALYSIS_SINGLE_FLIGHT_WAIT_TIMEOUT', 90)),
+    'RESULT_TTL': int(os.getenv('ANALYSIS_SINGLE_FLIGHT_RESULT_TTL', 10)),
+}
+# Circuit breaker around Gemini calls (see cases/throttling.py): opens on a 429 or after
+# FAILURE_THRESHOLD consecutive errors, for RESET_TIMEOUT seconds doubling up to MAX_RESET_TIMEOUT
+ANALYSIS_CIRCUIT = {
+    'FAILURE_THRESHOLD': int(os.getenv('ANALYSIS_CIRCUIT_FAILURE_THRESHOLD', 5)),
+    'RESET_TIMEOUT': int(os.getenv('ANALYSIS_CIRCUIT_RESET_TIMEOUT', 30)),
+    'MAX_RESET_TIMEOUT': int(os.getenv('ANALYSIS_CIRCUIT_MAX_RESET_TIMEOUT', 600)),
+    'CACHE': os.getenv('ANALYSIS_CIRCUIT_CACHE', 'default'),
+}
+# analyze_batch: cases per call, and how many short cases (by title + description length) share one prompt
+ANALYSIS_BATCH_MAX_CASES = int(os.getenv('ANALYSIS_BATCH_MAX_CASES', 500))
+ANALYSIS_PACK_MAX_CASES = int(os.getenv('ANALYSIS_PACK_MAX_CASES', 5))
+ANALYSIS_PACK_MAX_CHARS = int(os.getenv('ANALYSIS_PACK_MAX_CHARS', 1500))
+# Rows validated and inserted per bulk_create by the case importer
+CASE_IMPORT_CHUNK_SIZE = int(os.getenv('CASE_IMPORT_CHUNK_SIZE', 500))
+# Most ranked results returned by GET /api/cases/?q=
+CASE_SEARCH_MAX_RESULTS = int(os.getenv('CASE_SEARCH_MAX_RESULTS', 100))
+# GET /api/cases/facets/ payloads are cached this long (seconds) in this cache
+# alias; analysis writes and case changes invalidate them sooner
+CASE_FACETS_CACHE = os.getenv('CASE_FACETS_CACHE', 'default')
+CASE_FACETS_CACHE_TTL = int(os.getenv('CASE_FACETS_CACHE_TTL', 300))
+# Similar-case index (see cases/similarity.py): snapshot directory written by
+# build_similarity_index and the number of hashed TF-IDF features
+CASE_SIMILARITY_INDEX_DIR = os.getenv('CASE_SIMILARITY_INDEX_DIR') or BASE_DIR / 'similarity_index'
+CASE_SIMILARITY_FEATURES = int(os.getenv('CASE_SIMILARITY_FEATURES', 2 ** 20))
+
+# Offline analyzer used when Gemini is unavailable (see cases/local_analyzer.py):
+# the analysis workers train it on the CORPUS_SIZE most recent cases, request
+# paths on the REQUEST_CORPUS_SIZE most recent; retrained every MAX_AGE seconds
+LOCAL_ANALYZER = {
+    'CORPUS_SIZE': int(os.getenv('LOCAL_ANALYZER_CORPUS_SIZE', 2000)),
+    'REQUEST_CORPUS_SIZE': int(os.getenv('LOCAL_ANALYZER_REQUEST_CORPUS_SIZE', 200)),
+    'MAX_AGE': int(os.getenv('LOCAL_ANALYZER_MAX_AGE', 3600)),
+}
+
+# Analysis result cache (backend: django | file | db; see cases/analysis_cache.py)
+ANALYSIS_CACHE = {
+    'ENABLED': os.getenv('ANALYSIS_CACHE_ENABLED', 'True') == 'True',
+    'BACKEND': os.getenv('ANALYSIS_CACHE_BACKEND', 'django'),
+    'LOCATION': os.getenv('ANALYSIS_CACHE_LOCATION') or None,
+    'TTL': int(os.getenv('ANALYSIS_CACHE_TTL', 7 * 24 * 3600)),
+    'MAX_ENTRIES': int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 5000)),
+}
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: schema-driven analysis normalizer vs the hand-written one it replaced.
+
+The corpus is the sample Gemini reply from ``mock_analysis.py`` completed with
+the remaining prompt fields, plus variants with the defects seen in real
+replies: numbers as strings, percentages, a lone string where a list belongs,
+missing fields, extra keys, capitalised category labels and so on. With
+``--from-db`` the stored analysis results and ``db`` cache entries are added.
+
+    python scripts/bench_normalizer.py [--from-db] [--repeat 2000]
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (PROJECT_ROOT, os.path.dirname(os.path.abspath(__file__))):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from cases.analysis import normalize_analysis  # noqa: E402
+from mock_analysis import MOCK_ANALYSIS  # noqa: E402
+
+LOCATION = ('India', 'Maharashtra', 'Pune', '411001')
+
+
+def legacy_normalize(analysis_data, country, state, city, pincode):
+    """``normalize_analysis`` as it was before the schema (kept verbatim for comparison)."""
+    if analysis_data is None:
+        return {'raw': '', 'error': 'No analysis data'}
+
+    if isinstance(analysis_data, dict) and 'raw' not in analysis_data:
+        analysis_data.setdefault('country', country)
+        analysis_data.setdefault('state', state)
+        analysis_data.setdefault('city', city)
+        analysis_data.setdefault('pincode', pincode)
+        analysis_data.setdefault('language', '')
+        analysis_data.setdefault('keywords', [])
+        # Coerce sentiment to float within [-1, 1]
+        try:
+            s = float(analysis_data.get('sentiment', 0))
+            analysis_data['sentiment'] = max(-1.0, min(1.0, s))
+        except Exception:
+            analysis_data['sentiment'] = 0.0
+        cc = analysis_data.get('category_confidence') or {}
+        for k in ['general', 'fraud', 'security', 'compliance', 'financial']:
+            try:
+                v = float(cc.get(k, 0))
+            except Exception:
+                v = 0.0
+            cc[k] = max(0.0, min(1.0, v))
+        analysis_data['category_confidence'] = cc
+        analysis_data.setdefault('summary', '')
+        # Legal sections - ensure list of objects
+        ls = analysis_data.get('legal_sections') or []
+        if not isinstance(ls, list):
+            ls = []
+        norm_ls = []
+        for item in ls:
+            if isinstance(item, dict):
+                norm_ls.append({
+                    'section': str(item.get('section', '')),
+                    'description': str(item.get('description', '')),
+                    'citation': str(item.get('citation', '')) if item.get('citation') is not None else ''
+                })
+            else:
+                norm_ls.append({'section': str(item), 'description': '', 'citation': ''})
+        analysis_data['legal_sections'] = norm_ls
+        # Sanctions - ensure list with clamped confidence
+        sanc = analysis_data.get('sanction_recommendations') or []
+        if not isinstance(sanc, list):
+            sanc = []
+        norm_sanc = []
+        for item in sanc:
+            if isinstance(item, dict):
+                try:
+                    conf = float(item.get('confidence', 0))
+                except Exception:
+                    conf = 0.0
+                norm_sanc.append({
+                    'code': str(item.get('code', '')),
+                    'name': str(item.get('name', '')),
+                    'description': str(item.get('description', '')),
+                    'confidence': max(0.0, min(1.0, conf))
+                })
+        analysis_data['sanction_recommendations'] = norm_sanc
+        # Filing viability
+        fv = analysis_data.get('filing_viability') or {}
+        analysis_data['filing_viability'] = {
+            'viable': bool(fv.get('viable', False)),
+            'rationale': str(fv.get('rationale', '')),
+            'missing_evidence': fv.get('missing_evidence', []) if isinstance(fv.get('missing_evidence', []), list) else [],
+            'recommended_actions': fv.get('recommended_actions', []) if isinstance(fv.get('recommended_actions', []), list) else []
+        }
+        # Filing authorities - normalize list structure
+        fa = analysis_data.get('filing_authorities') or []
+        if not isinstance(fa, list):
+            fa = []
+        norm_fa = []
+        for item in fa:
+            if isinstance(item, dict):
+                nums = item.get('phone_numbers', [])
+                if not isinstance(nums, list):
+                    nums = [str(nums)] if nums else []
+                nums = [str(n) for n in nums]
+                norm_fa.append({
+                    'authority_type': str(item.get('authority_type', '')),
+                    'name': str(item.get('name', '')),
+                    'address': str(item.get('address', '')),
+                    'phone_numbers': nums,
+                    'online_portal': str(item.get('online_portal', '')),
+                    'jurisdiction': str(item.get('jurisdiction', '')),
+                    'how_to_file': str(item.get('how_to_file', '')),
+                    'notes': str(item.get('notes', '')),
+                })
+        analysis_data['filing_authorities'] = norm_fa
+        # Future-oriented fields
+        ns = analysis_data.get('next_steps') or []
+        if not isinstance(ns, list):
+            ns = []
+        analysis_data['next_steps'] = [str(x) for x in ns][:15]
+        ep = analysis_data.get('evidence_priority') or []
+        if not isinstance(ep, list):
+            ep = []
+        # Expect items either strings or dicts {item, rationale}
+        norm_ep = []
+        for item in ep:
+            if isinstance(item, dict):
+                norm_ep.append({
+                    'item': str(item.get('item', '')),
+                    'rationale': str(item.get('rationale', '')),
+                    'priority': str(item.get('priority', '')),
+                })
+            else:
+                norm_ep.append({'item': str(item), 'rationale': '', 'priority': ''})
+        analysis_data['evidence_priority'] = norm_ep[:20]
+        analysis_data['timeline_estimate'] = str(analysis_data.get('timeline_estimate', ''))[:200]
+    return analysis_data
+
+
+# The sample reply completed with the fields the current prompt asks for
+FULL_REPLY = {
+    **MOCK_ANALYSIS,
+    'legal_sections': [
+        {'section': 'IPC 420', 'description': 'Cheating and dishonestly inducing delivery of property', 'citation': 'IPC s.420'},
+        {'section': 'IT Act 66D', 'description': 'Cheating by personation using a computer resource', 'citation': 'IT Act 2000 s.66D'},
+        {'section': 'IPC 406', 'description': 'Criminal breach of trust', 'citation': ''},
+    ],
+    'sanction_recommendations': [
+        {'code': 'IPC 420', 'name': 'Cheating', 'description': 'Up to 7 years and fine', 'confidence': 0.9},
+        {'code': 'IT Act 66D', 'name': 'Personation', 'description': 'Up to 3 years and fine', 'confidence': 0.75},
+    ],
+    'filing_viability': {
+        'viable': True,
+        'rationale': 'Payment records and advertisements establish the inducement and loss.',
+        'missing_evidence': ['bank statement', 'screenshots of the platform'],
+        'recommended_actions': ['file on cybercrime.gov.in', 'request a bank freeze'],
+    },
+    'filing_authorities': [{
+        'authority_type': 'Cyber Crime Portal',
+        'name': 'National Cyber Crime Reporting Portal',
+        'address': '',
+        'phone_numbers': ['1930', '112'],
+        'online_portal': 'https://cybercrime.gov.in',
+        'jurisdiction': 'Pan-India',
+        'how_to_file': 'Register a complaint and attach payment proofs.',
+        'notes': '',
+    }],
+    'next_steps': [
+        'Call 1930 within 24 hours', 'File a complaint on the portal', 'Ask the bank to freeze the beneficiary account',
+        'Preserve chats and adverts', 'Visit the local police station with printouts',
+    ],
+    'evidence_priority': [
+        {'item': 'Bank transaction records', 'rationale': 'Proves the loss', 'priority': 'high'},
+        {'item': 'Advertisement screenshots', 'rationale': 'Shows the inducement', 'priority': 'high'},
+        {'item': 'Chat logs', 'rationale': 'Links the accused', 'priority': 'medium'},
+    ],
+    'timeline_estimate': 'Complaint 1 day; investigation 1-3 months; charge sheet within 90 days',
+}
+
+
+def _defects(reply, rng):
+    """A copy of ``reply`` with a few of the defects model replies show."""
+    reply = copy.deepcopy(reply)
+    mutations = [
+        lambda r: r.update(sentiment=str(r['sentiment'])),
+        lambda r: r.update(sentiment=-1.7),
+        lambda r: r['category_confidence'].update({'Fraud': '0.9', 'identity theft': 0.4}),
+        lambda r: r['category_confidence'].update(financial='88%'),
+        lambda r: r.update(keywords=', '.join(r['keywords'])),
+        lambda r: r['legal_sections'].append('IPC 120B'),
+        lambda r: r['sanction_recommendations'][0].update(confidence='high'),
+        lambda r: r['filing_viability'].update(viable='false'),
+        lambda r: r['filing_authorities'][0].update(phone_numbers='1930'),
+        lambda r: r['evidence_priority'].append('Witness statements'),
+        lambda r: r.update(next_steps=r['next_steps'] * 4),
+        lambda r: r.update(timeline_estimate='Several phases. ' * 20),
+        lambda r: r.pop('summary'),
+        lambda r: r.update(extra_notes='model commentary'),
+        lambda r: r['legal_sections'][0].update(citation=None),
+    ]
+    for mutate in rng.sample(mutations, rng.randint(1, 4)):
+        mutate(reply)
+    return reply
+
+
+def build_corpus(size, from_db=False, seed=7):
+    rng = random.Random(seed)
+    clean = size // 4
+    corpus = [copy.deepcopy(FULL_REPLY) for _ in range(clean)]
+    corpus += [_defects(FULL_REPLY, rng) for _ in range(size - clean)]
+    if from_db:
+        from cases.analysis import RESULT_FIELDS
+        from cases.models import AnalysisCacheEntry, CaseAnalysisResult
+
+        corpus += [
+            dict(zip(RESULT_FIELDS, row))
+            for row in CaseAnalysisResult.objects.values_list(*RESULT_FIELDS).order_by('-id')[:size]
+        ]
+        corpus += [p for p in AnalysisCacheEntry.objects.values_list('payload', flat=True)[:size] if isinstance(p, dict)]
+    return corpus
+
+
+def bench(functions, corpus, repeat, chunk=20):
+    """Microseconds per payload for each function.
+
+    The corpus is timed in chunks of ``chunk`` payloads; each chunk counts
+    with its best of ``repeat`` rounds. The functions take turns on every
+    chunk, so a slow spell on the machine hits them alike, and every call
+    gets its own deep copy (the legacy function mutates).
+    """
+    chunks = [corpus[i:i + chunk] for i in range(0, len(corpus), chunk)]
+    best = [[float('inf')] * len(chunks) for _ in functions]
+    for _ in range(repeat):
+        for c, payloads in enumerate(chunks):
+            for i, fn in enumerate(functions):
+                batch = copy.deepcopy(payloads)
+                started = time.perf_counter()
+                for payload in batch:
+                    fn(payload, *LOCATION)
+                best[i][c] = min(best[i][c], time.perf_counter() - started)
+    return [sum(seconds) / len(corpus) * 1e6 for seconds in best]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=400, help='payloads in the synthetic corpus')
+    parser.add_argument('--repeat', type=int, default=30, help='timing rounds (best is reported)')
+    parser.add_argument('--from-db', action='store_true', help='add stored results and cache entries')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.size, args.from_db)
+    legacy_ok = []
+    legacy_errors = 0
+    for payload in corpus:
+        try:
+            legacy_normalize(copy.deepcopy(payload), *LOCATION)
+            legacy_ok.append(payload)
+        except Exception:
+            legacy_errors += 1
+
+    repairs = Counter()
+    for payload in corpus:
+        fields = []
+        normalize_analysis(payload, *LOCATION, repairs=fields)
+        repairs.update(fields)
+
+    # Time both on the payloads the legacy function survives, and on the clean replies alone
+    functions = (legacy_normalize, normalize_analysis)
+    legacy_us, schema_us = bench(functions, legacy_ok, args.repeat)
+    clean_legacy_us, clean_schema_us = bench(functions, [p for p in legacy_ok if p == FULL_REPLY], args.repeat)
+    print(json.dumps({
+        'payloads': len(corpus),
+        'legacy_raised': legacy_errors,
+        'legacy_us_per_payload': round(legacy_us, 2),
+        'schema_us_per_payload': round(schema_us, 2),
+        'speedup': round(legacy_us / schema_us, 2),
+        'clean_reply_speedup': round(clean_legacy_us / clean_schema_us, 2),
+        'repaired_fields': dict(repairs.most_common()),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -34,7 +34,14 @@ MOCK_ANALYSIS = {
         "fraud": 0.98,
         "security": 0.45,
         "compliance": 0.60,
-        "financial": 0.88
+        "financial": 0.88,
+        "cybercrime": 0.92,
+        "identity_theft": 0.20,
+        "intellectual_property": 0.0,
+        "corruption": 0.05,
+        "money_laundering": 0.35,
+        "data_breach": 0.10,
+        "regulatory": 0.55
     },
     "summary": "High-priority financial fraud case involving a fake online stock trading platform that defrauded complainant Neha Verma of ₹75,000. Accused Rohit Mehta operated the fraudulent website, attracted victims through social media marketing, and disappeared after collecting payments. Immediate actions required: freeze suspected bank accounts, file fraud complaint with cyber crime unit, issue lookout notice for accused, contact social media platforms to remove fraudulent ads, and notify RBI/SEBI of unauthorized investment solicitation."
 }
@@ -79,7 +86,7 @@ def print_analysis():
     for cat, conf in sorted(categories.items(), key=lambda x: x[1], reverse=True):
         bar_width = int(conf * 30)
         bar = "█" * bar_width + "░" * (30 - bar_width)
-        print(f"   {cat.capitalize():12} {conf*100:5.1f}% [{bar}]")
+        print(f"   {cat.capitalize():22} {conf*100:5.1f}% [{bar}]")
     print()
     
     # Summary